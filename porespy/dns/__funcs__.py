@@ -1,5 +1,4 @@
 import numpy as np
-import openpnm as op
 from porespy.filters import trim_nonpercolating_paths
 import collections
 
@@ -46,6 +45,7 @@ def tortuosity(im, axis, return_im=False, **kwargs):
               'and volume fraction filled:',
               abs(porosity_orig-porosity_true)*100, '%')
     # cubic network generation
+    import openpnm as op
     net = op.network.CubicTemplate(template=im, spacing=1)
     # adding phase
     water = op.phases.Water(network=net)
@@ -17,7 +17,8 @@ from porespy.tools import get_border, extend_slice, extract_subsection
 from porespy.tools import _create_alias_map
 from porespy.tools import ps_disk, ps_ball
 from porespy import settings
-from porespy.tools import get_tqdm
+from porespy.tools import get_tqdm, get_precision
+from porespy.tools.__utils__ import _set_num_threads
 tqdm = get_tqdm()
 
 
@@ -257,10 +258,11 @@ def snow_partitioning(im, dt=None, r_max=4, sigma=0.4, return_all=False,
         print("Peforming Distance Transform")
         if np.any(im_shape == 1):
             ax = np.where(im_shape == 1)[0][0]
-            dt = edt(im.squeeze())
+            dt = edt(im.squeeze(), parallel=settings.ncores)
             dt = np.expand_dims(dt, ax)
         else:
-            dt = edt(im)
+            dt = edt(im, parallel=settings.ncores)
+    dt = dt.astype(get_precision(), copy=False)
 
     tup.im = im
     tup.dt = dt
@@ -459,7 +461,7 @@ def find_peaks(dt, r_max=4, footprint=None, **kwargs):
             raise Exception("only 2-d and 3-d images are supported")
     parallel = kwargs.pop('parallel', False)
     cores = kwargs.pop('cores', None)
-    divs = kwargs.pop('cores', 2)
+    divs = kwargs.pop('divs', 2)
     if parallel:
         overlap = max(footprint(r_max).shape)
         peaks = chunked_func(func=find_peaks, overlap=overlap,
@@ -618,7 +620,7 @@ def trim_nearby_peaks(peaks, dt):
     crds = np.vstack(crds).astype(int)  # Convert to numpy array of ints
     # Get distance between each peak as a distance map
     tree = sptl.cKDTree(data=crds)
-    temp = tree.query(x=crds, k=2)
+    temp = tree.query(x=crds, k=2, workers=settings.ncores)
     nearest_neighbor = temp[1][:, 1]
     dist_to_neighbor = temp[0][:, 1]
     del temp, tree  # Free-up memory
@@ -1274,7 +1276,8 @@ def porosimetry(im, sizes=25, inlets=None, access_limited=True, mode='hybrid',
             " unexpected behavior."
         ))
 
-    dt = edt(im > 0)
+    dt = edt(im > 0, parallel=settings.ncores)
+    dtype = get_precision()
 
     if inlets is None:
         inlets = get_border(im.shape, mode="faces")
@@ -1299,7 +1302,7 @@ def porosimetry(im, sizes=25, inlets=None, access_limited=True, mode='hybrid',
         impad = np.pad(im, mode="symmetric", pad_width=pw)
         inlets = np.pad(inlets, mode="symmetric", pad_width=pw)
         # sizes = np.unique(np.around(sizes, decimals=0).astype(int))[-1::-1]
-        imresults = np.zeros(np.shape(impad))
+        imresults = np.zeros(np.shape(impad), dtype=dtype)
         for r in tqdm(sizes, **settings.tqdm):
             if parallel:
                 imtemp = chunked_func(func=spim.binary_erosion,
@@ -1327,16 +1330,16 @@ def porosimetry(im, sizes=25, inlets=None, access_limited=True, mode='hybrid',
                 imresults[(imresults == 0) * imtemp] = r
         imresults = extract_subsection(imresults, shape=im.shape)
     elif mode == "dt":
-        imresults = np.zeros(np.shape(im))
+        imresults = np.zeros(np.shape(im), dtype=dtype)
         for r in tqdm(sizes, **settings.tqdm):
             imtemp = dt >= r
             if access_limited:
                 imtemp = trim_disconnected_blobs(imtemp, inlets)
             if np.any(imtemp):
-                imtemp = edt(~imtemp) < r
+                imtemp = edt(~imtemp, parallel=settings.ncores) < r
                 imresults[(imresults == 0) * imtemp] = r
     elif mode == "hybrid":
-        imresults = np.zeros(np.shape(im))
+        imresults = np.zeros(np.shape(im), dtype=dtype)
         for r in tqdm(sizes, **settings.tqdm):
             imtemp = dt >= r
             if access_limited:
@@ -1629,9 +1632,11 @@ def chunked_func(func,
         applying to all directions, while a list of scalars is interpreted
         as applying to each individual direction.
     cores : scalar
-        The number of cores which should be used.  By default, all cores will
-        be used, or as many are needed for the given number of chunks, which
-        ever is smaller.
+        The number of cores which should be used.  By default
+        ``settings.ncores`` are used, or as many are needed for the given
+        number of chunks, which ever is smaller.  While the chunks are being
+        processed ``settings.ncores`` is temporarily set to 1 so that ``func``
+        does not spawn threads of its own and oversubscribe the machine.
     im_arg : string
         The keyword used by ``func`` for the image to be operated on.  By
         default this function will look for ``image``, ``input``, and ``im``
@@ -1683,12 +1688,17 @@ def chunked_func(func,
 
     @dask.delayed
     def apply_func(func, **kwargs):
-        # Apply function on sub-slice of overall image
+        # Apply function on sub-slice of overall image, limiting numba to
+        # the number of cores given to each dask worker thread
+        _set_num_threads(settings.ncores)
         return func(**kwargs)
 
     # Import the array_split methods
     from array_split import shape_split, ARRAY_BOUNDS
 
+    if cores is None:
+        cores = settings.ncores
+
     # Determine the value for im_arg
     if type(im_arg) == str:
         im_arg = [im_arg]
@@ -1725,7 +1735,8 @@ def chunked_func(func,
     # Have dask actually compute the function on each subsection in parallel
     # with ProgressBar():
         # ims = dask.compute(res, num_workers=cores)[0]
-    ims = dask.compute(res, num_workers=cores)[0]
+    with settings.override(ncores=1):
+        ims = dask.compute(res, num_workers=cores)[0]
     # Finally, put the pieces back together into a single master image, im2
     im2 = np.zeros_like(im, dtype=im.dtype)
     for i, s in enumerate(slices):
@@ -1804,8 +1815,8 @@ def snow_partitioning_parallel(im,
 
     num_workers: int or None
         Number of cores that will be used to parallel process all domains.
-        If None then all cores will be used but user can specify any integer
-        values to control the memory usage.
+        If None then ``settings.ncores`` will be used but user can specify any
+        integer values to control the memory usage.
 
     crop: bool
         If True the image shape is cropped to fit specified division.
@@ -1854,21 +1865,21 @@ def snow_partitioning_parallel(im,
     print('=' * 80)
     print('Calculating overlap thickness')
     if overlap == 'dt':
-        dt = edt((im > 0), parallel=0)
+        dt = edt((im > 0), parallel=settings.ncores)
         overlap = dt.max()
     elif overlap == 'ws':
         rev = spim.interpolation.zoom(im, zoom=zoom_factor, order=0)
         rev = rev > 0
-        dt = edt(rev, parallel=0)
+        dt = edt(rev, parallel=settings.ncores)
         rev_snow = snow_partitioning(rev, dt=dt, r_max=r_max, sigma=sigma)
         labels, counts = np.unique(rev_snow, return_counts=True)
         node = np.where(counts == counts[1:].max())[0][0]
         slices = spim.find_objects(rev_snow)
         overlap = max(rev_snow[slices[node - 1]].shape) / (zoom_factor * 2.0)
-        dt = edt((im > 0), parallel=0)
+        dt = edt((im > 0), parallel=settings.ncores)
     else:
         overlap = overlap / 2.0
-        dt = edt((im > 0), parallel=0)
+        dt = edt((im > 0), parallel=settings.ncores)
     print('Overlap Thickness: ' + str(int(2.0 * overlap)) + ' voxels')
     # --------------------------------------------------------------------------
     # Get overlap and trim depth of all image dimension
@@ -1884,18 +1895,20 @@ def snow_partitioning_parallel(im,
     # Applying snow to image chunks
     im = da.from_array(dt, chunks=chunk_shape)
     im = da.overlap.overlap(im, depth=depth, boundary='none')
-    im = im.map_blocks(chunked_snow, r_max=r_max, sigma=sigma)
+    im = im.map_blocks(_chunked_snow_task, r_max=r_max, sigma=sigma)
     im = da.overlap.trim_internal(im, trim_depth, boundary='none')
     if mode == 'serial':
         num_workers = 1
     elif mode == 'parallel':
-        num_workers = num_workers
+        if num_workers is None:
+            num_workers = settings.ncores
     else:
         raise Exception('Mode of operation can either be parallel or serial')
     with ProgressBar():
         # print('-' * 80)
         print('Applying snow to image chunks')
-        regions = im.compute(num_workers=num_workers)
+        with settings.override(ncores=1):
+            regions = im.compute(num_workers=num_workers)
     # --------------------------------------------------------------------------
     # Relabelling watershed chunks
     # print('-' * 80)
@@ -1961,6 +1974,15 @@ def chunked_snow(im, r_max=5, sigma=0.4):
     return regions * (im > 0)
 
 
+def _chunked_snow_task(im, r_max, sigma):
+    r"""
+    Applies ``chunked_snow`` within a dask worker thread, limiting numba to
+    the number of cores given to each worker
+    """
+    _set_num_threads(settings.ncores)
+    return chunked_snow(im, r_max=r_max, sigma=sigma)
+
+
 def pad(im, pad_width=1, constant_value=0):
     r"""
     Pad the image with a constant values and width.
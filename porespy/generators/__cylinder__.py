@@ -1,5 +1,6 @@
 import numpy as np
 from edt import edt
+from porespy import settings
 
 
 def cylindrical_plug(shape, r=None, axis=2):
@@ -30,7 +31,7 @@ def cylindrical_plug(shape, r=None, axis=2):
         axes = np.array(list(set([0, 1, 2]).difference(set([axis]))), dtype=int)
         im2d = np.ones(shape=shape[axes])
         im2d[int(shape[axes[0]]/2), int(shape[axes[1]]/2)] = 0
-        dt = edt(im2d)
+        dt = edt(im2d, parallel=settings.ncores)
         if r is None:
             r = int(min(shape[axes])/2)
         circ = dt < r
@@ -41,7 +42,7 @@ def cylindrical_plug(shape, r=None, axis=2):
     if len(shape) == 2:
         im2d = np.ones(shape=shape)
         im2d[int(shape[0]/2), int(shape[1]/2)] = 0
-        dt = edt(im2d)
+        dt = edt(im2d, parallel=settings.ncores)
         if r is None:
             r = int(min(shape[axes])/2)
         cyl = dt <= r
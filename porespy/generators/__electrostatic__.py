@@ -39,12 +39,12 @@ def pseudo_electrostatic_packing(im, r, sites=None,
         Original image overlayed with the inserted spheres.
 
     """
-    dt_im = edt(im)
+    dt_im = edt(im, parallel=settings.ncores)
     if sites is None:
         dt2 = spim.gaussian_filter(dt_im, sigma=0.5)
         strel = ps.tools.ps_round(r, ndim=im.ndim, smooth=True)
         sites = (spim.maximum_filter(dt2, footprint=strel) == dt2)*im
-    dt = edt(sites == 0)
+    dt = edt(sites == 0, parallel=settings.ncores)
     sites = (sites == 0)*(dt_im >= (r-protrusion))
     with tqdm(range(max_iter), **settings.tqdm) as pbar:
         r = r + clearance
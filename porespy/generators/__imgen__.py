@@ -6,6 +6,7 @@ from skimage.morphology import disk, ball
 import scipy.spatial as sptl
 import scipy.ndimage as spim
 from porespy.tools import norm_to_uniform, ps_ball, ps_disk, get_border
+from porespy.tools import insert_spheres, insert_cylinders
 from porespy import settings
 from typing import List
 from numpy import array
@@ -195,7 +196,7 @@ def RSA(im_or_shape: array,
     # Dilate existing objects by strel to remove pixels near them
     # from consideration for sphere placement
     print("Dilating foreground features by sphere radius")
-    dt = edt(im == 0)
+    dt = edt(im == 0, parallel=settings.ncores)
     options_im = dt >= radius
     # ------------------------------------------------------------------------
     # Begin inserting the spheres
@@ -451,7 +452,7 @@ def voronoi_edges(shape: List[int], radius: int, ncells: int, flat_faces: bool =
         if np.all(pts >= 0) and np.all(pts < im.shape):
             line_pts = line_segment(pts[0], pts[1])
             im[tuple(line_pts)] = True
-    im = edt(~im) > radius
+    im = edt(~im, parallel=settings.ncores) > radius
     return im
 
 
@@ -604,13 +605,11 @@ def lattice_spheres(shape: List[int],
         im[offset[0]::spacing[0],
            offset[1]+int(spacing[1]/2)::spacing[1],
            offset[2]+int(spacing[2]/2)::spacing[2]] = True
-    # TODO: The following might be faster to use np.where to find points
-    #  then directly insert spheres at each location using the numba jit
-    #  versions of insert_spheres
-    if smooth:
-        im = ~(edt(~im) < r)
-    else:
-        im = ~(edt(~im) <= r)
+    # Insert solid spheres at each lattice point
+    centers = np.vstack(np.where(im)).T
+    im = np.ones_like(im)
+    im = insert_spheres(im, centers=centers, radii=r, values=False,
+                        smooth=smooth)
     return im
 
 
@@ -665,7 +664,7 @@ def overlapping_spheres(shape: List[int],
 
     # Helper functions for calculating porosity: phi = g(f(N))
     def f(N):
-        return edt(im > N / bulk_vol) < radius
+        return edt(im > N / bulk_vol, parallel=settings.ncores) < radius
 
     def g(im):
         r"""Returns fraction of 0s, given a binary image"""
@@ -763,7 +762,7 @@ def perlin_noise(shape: List[int], porosity=None, octaves: int = 3,
         raise Exception("Image size must be factor of res**octaves")
 
     # Generate noise
-    noise = np.zeros(shape)
+    noise = np.zeros(shape, dtype=ps.tools.get_precision())
     frequency = 1
     amplitude = 1
     for _ in tqdm(range(octaves), **settings.tqdm):
@@ -918,7 +917,7 @@ def blobs(shape: List[int], porosity: float = 0.5, blobiness: int = 1,
     if np.size(shape) == 1:
         shape = np.full((3, ), int(shape))
     sigma = np.mean(shape) / (40 * blobiness)
-    im = np.random.random(shape)
+    im = np.random.random(shape).astype(ps.tools.get_precision(), copy=False)
     if parallel:
         # TODO: The determination of the overlap should be done rigorously
         im = ps.filters.chunked_func(func=spim.gaussian_filter,
@@ -995,6 +994,7 @@ def _cylinders(shape: List[int],
         raise Exception('theta_max must be betwen 0 and 90')
     # Create empty image for inserting into
     im = np.zeros(shape, dtype=bool)
+    ends = []
     n = 0
     L = min(H, R)
     # Disable tqdm if called from another tqdm to prevent double pbars
@@ -1015,12 +1015,13 @@ def _cylinders(shape: List[int],
             upper = ~np.any(np.vstack(crds).T >= shape + L, axis=1)
             valid = upper * lower
             if np.any(valid):
-                im[crds[0][valid] - L, crds[1][valid] - L, crds[2][valid] - L] = 1
+                ends.append([X0 - L, X1 - L])
                 n += 1
                 pbar.update()
-    im = np.array(im, dtype=bool)
-    dt = edt(~im) < radius
-    return ~dt
+    # Rasterize all the fibers in a single pass
+    ends = np.array(ends).reshape(-1, 2, 3)
+    im = insert_cylinders(im, xyz0=ends[:, 0], xyz1=ends[:, 1], r=radius)
+    return ~im
 
 
 def cylinders(shape: List[int],
@@ -9,6 +9,7 @@ import skimage.measure as ms
 from porespy.tools import sanitize_filename
 from porespy.networks import generate_voxel_image
 from porespy.filters import reduce_peaks
+from porespy import settings
 from pyevtk.hl import imageToVTK
 from skimage.morphology import ball
 from edt import edt
@@ -159,6 +160,7 @@ def openpnm_to_im(
     throat_shape="cylinder",
     max_dim=None,
     rtol=0.1,
+    chunks=None,
 ):
     r"""
     Generates voxel image from an OpenPNM network object.
@@ -182,6 +184,11 @@ def openpnm_to_im(
         further increasing the number of voxels in each dimension by 25% would
         improve the predicted porosity of the image by less that ``rtol``
 
+    chunks : int or tuple of ints
+        If given, the image is returned as a ``dask`` array with chunks of
+        this shape, and each chunk is only voxelized when it is computed.  The
+        default is ``None``, which returns a numpy array.
+
     Returns
     -------
     im : ND-array
@@ -195,6 +202,8 @@ def openpnm_to_im(
     (2) If max_dim is not provided, the method calculates it such that the
     further increasing it doesn't change porosity by much.
 
+    See ``porespy.networks.generate_voxel_image`` for details.
+
     """
     return generate_voxel_image(
         network,
@@ -202,6 +211,7 @@ def openpnm_to_im(
         throat_shape=throat_shape,
         max_dim=max_dim,
         rtol=rtol,
+        chunks=chunks,
     )
 
 
@@ -501,7 +511,7 @@ def spheres_to_comsol(filename, im=None, centers=None, radii=None):
     if im is not None:
         if im.ndim != 3:
             raise Exception('Image must be 3D.')
-        dt = edt(im > 0)
+        dt = edt(im > 0, parallel=settings.ncores)
         dt2 = nd.gaussian_filter(dt, sigma=0.1)
         peaks = (im > 0)*(nd.maximum_filter(dt2, footprint=ball(3)) == dt)
         peaks = reduce_peaks(peaks)
@@ -0,0 +1,130 @@
+import numpy as np
+import scipy.fft as sp_ft
+from collections import namedtuple
+from porespy import settings
+from porespy.tools import get_precision
+from .__funcs__ import _radial_profile
+
+
+def correlation_functions(im, functions=['S2'], phases=None,
+                          directional=False):
+    r"""
+    Calculates several correlation functions of an image at once, sharing the
+    fourier transforms between them
+
+    Parameters
+    ----------
+    im : ND-array
+        A boolean image of the void space, or a multiphase image with each
+        phase indicated by a different integer value.
+    functions : list of strings
+        The correlation functions to compute.  Options are:
+
+        'S2'
+            The two-point correlation of each phase, which is the probability
+            that two points a given distance apart both lie in the phase.
+        'Fsv'
+            The surface-void correlation of each phase, between its surface
+            and the phase itself.
+        'Fss'
+            The surface-surface correlation of each phase.
+        'cross'
+            The two-point cross-correlation between each pair of phases,
+            which is the probability that one point lies in the first phase
+            and the other point in the second.
+
+        The default is ``['S2']``.
+    phases : list of scalars
+        The values in ``im`` indicating each phase of interest.  The default is
+        ``[True]`` for a boolean image, otherwise all values found in ``im``.
+    directional : bool
+        If ``True`` then each function is found along each axis separately and
+        has one row per axis.  The default is ``False``, which averages over
+        all directions.
+
+    Returns
+    -------
+    result : named_tuple
+        A named-tuple with a ``distance`` array, followed by one entry for
+        each of 'S2', 'Fsv', 'Fss' and 'cross'.  Each entry is a ``dict``
+        keyed by phase value, or by pairs of phase values for 'cross',
+        containing the function at each distance, or ``None`` if the function
+        was not requested.
+
+    Notes
+    -----
+    The forward transform of the indicator function of each phase, and of its
+    surface, is computed once using ``rfftn`` and reused by all functions
+    that need it, so requesting several functions costs little more than
+    requesting one.  The surface of each phase is represented by the
+    magnitude of the gradient of its indicator function.  The image is
+    assumed to be periodic, as is implicit in the fourier transform, and the
+    functions are normalized by the number of voxels so that ``S2`` starts at
+    the volume fraction of the phase and levels off at its square.
+
+    The transforms are computed in the precision given by
+    ``porespy.settings.precision``.
+
+    Examples
+    --------
+    >>> import porespy as ps
+    >>> im = ps.generators.blobs(shape=[100, 100], porosity=0.6)
+    >>> cf = ps.metrics.correlation_functions(im, functions=['S2', 'Fss'])
+    >>> S2 = cf.S2[True]
+    """
+    if im.ndim not in [2, 3]:
+        raise Exception('Image dimensions must be 2 or 3')
+    functions = [functions] if isinstance(functions, str) else functions
+    for f in functions:
+        if f not in ['S2', 'Fsv', 'Fss', 'cross']:
+            raise Exception('Unrecognized correlation function: ' + str(f))
+    if phases is None:
+        phases = [True] if im.dtype == bool else list(np.unique(im))
+    shape = im.shape
+    dtype = get_precision()
+    r_max = np.min((np.ceil(np.shape(im)) / 2).astype(int))
+    transforms = {}
+
+    def spectrum(phase, kind):
+        if (phase, kind) not in transforms:
+            field = (im == phase).astype(dtype)
+            if kind == 'surface':
+                grads = np.gradient(field)
+                field = np.sqrt(np.sum([g**2 for g in grads], axis=0))
+                field = field.astype(dtype, copy=False)
+            transforms[(phase, kind)] = sp_ft.rfftn(field,
+                                                    workers=settings.ncores)
+        return transforms[(phase, kind)]
+
+    def correlate(a, b):
+        # The real part of the cross-spectrum gives the symmetric part of the
+        # cross-correlation, which has the same radial average
+        P = a.real*b.real + a.imag*b.imag
+        corr = sp_ft.irfftn(P, s=shape, workers=settings.ncores)
+        corr = corr[..., :shape[-1] // 2 + 1]
+        return _radial_profile(corr, shape=shape, r_max=r_max,
+                               directional=directional, norm=im.size)
+
+    results = {}
+    distance = None
+    pairs = {'S2': ('phase', 'phase'), 'Fsv': ('surface', 'phase'),
+             'Fss': ('surface', 'surface')}
+    for f in ['S2', 'Fsv', 'Fss']:
+        if f in functions:
+            results[f] = {}
+            for p in phases:
+                prof = correlate(spectrum(p, pairs[f][0]),
+                                 spectrum(p, pairs[f][1]))
+                distance, results[f][p] = prof
+    if 'cross' in functions:
+        results['cross'] = {}
+        for i, p in enumerate(phases):
+            for q in phases[i + 1:]:
+                prof = correlate(spectrum(p, 'phase'), spectrum(q, 'phase'))
+                distance, results['cross'][(p, q)] = prof
+    if distance is None:
+        distance = np.arange(0)
+    cf = namedtuple('correlation_functions',
+                    ('distance', 'S2', 'Fsv', 'Fss', 'cross'))
+    return cf(distance, *[results.get(f, None)
+                          for f in ['S2', 'Fsv', 'Fss', 'cross']])
@@ -1,21 +1,26 @@
 import sys
 import warnings
 import numpy as np
+from numba import njit, prange
+from functools import lru_cache
 from edt import edt
 import scipy.ndimage as spim
 import scipy.spatial as sptl
-from scipy import fftpack as sp_ft
+import scipy.fft as sp_ft
 from skimage.measure import regionprops
 from porespy.tools import extend_slice, mesh_region
 from porespy.filters import find_dt_artifacts
 from porespy import settings
 from collections import namedtuple
 from skimage import measure
-from porespy.tools import get_tqdm
+from porespy.tools import get_tqdm, get_precision
+from porespy.tools import integral_image, box_sums
+from porespy.tools import RegionAdjacencyGraph
+from .__histogram__ import _histogram_of_image
 tqdm = get_tqdm()
 
 
-def representative_elementary_volume(im, npoints=1000):
+def representative_elementary_volume(im, npoints=1000, integral=None):
     r"""
     Calculates the porosity of the image as a function subdomain size.  This
     function extracts a specified number of subdomains of random size, then
@@ -28,6 +33,11 @@ def representative_elementary_volume(im, npoints=1000):
     npoints : int
         The number of randomly located and sized boxes to sample.  The default
         is 1000.
+    integral : ND-array, optional
+        The summed-area table of ``im`` as returned by
+        ``porespy.tools.integral_image``.  It is computed if not given, but
+        can be passed to avoid recomputing it when this function is called
+        repeatedly on the same image.
 
     Returns
     -------
@@ -41,12 +51,10 @@ def representative_elementary_volume(im, npoints=1000):
 
     Notes
     -----
-    This function is frustratingly slow.  Profiling indicates that all the time
-    is spent on scipy's ``sum`` function which is needed to sum the number of
-    void voxels (1's) in each subdomain.
-
-    Also, this function is a prime target for parallelization since the
-    ``npoints`` are calculated independenlty.
+    The number of void voxels in each subdomain is found in constant time
+    from the summed-area table of the image using
+    ``porespy.tools.box_sums``, so the cost is dominated by computing the
+    table once, regardless of the number or size of the subdomains.
 
     References
     ----------
@@ -55,27 +63,17 @@ def representative_elementary_volume(im, npoints=1000):
     (1987)
 
     """
-    im_temp = np.zeros_like(im)
-    crds = np.array(np.random.rand(npoints, im.ndim) * im.shape, dtype=int)
-    pads = np.array(np.random.rand(npoints) * np.amin(im.shape) / 2 + 10, dtype=int)
-    im_temp[tuple(crds.T)] = True
-    labels, N = spim.label(input=im_temp)
-    slices = spim.find_objects(input=labels)
-    porosity = np.zeros(shape=(N,), dtype=float)
-    volume = np.zeros(shape=(N,), dtype=int)
-    for i in tqdm(np.arange(0, N), **settings.tqdm):
-        s = slices[i]
-        p = pads[i]
-        new_s = extend_slice(s, shape=im.shape, pad=p)
-        temp = im[new_s]
-        Vp = np.sum(temp)
-        Vt = np.size(temp)
-        porosity[i] = Vp / Vt
-        volume[i] = Vt
+    if integral is None:
+        integral = integral_image(im > 0)
+    shape = np.array(im.shape)
+    crds = np.array(np.random.rand(npoints, im.ndim) * shape, dtype=int)
+    pads = np.array(np.random.rand(npoints) * np.amin(shape) / 2 + 10, dtype=int)
+    lower = np.maximum(crds - pads[:, None], 0)
+    upper = np.minimum(crds + pads[:, None] + 1, shape)
+    volume = np.prod(upper - lower, axis=1)
+    porosity = box_sums(integral, lower, upper) / volume
     profile = namedtuple('profile', ('volume', 'porosity'))
-    profile.volume = volume
-    profile.porosity = porosity
-    return profile
+    return profile(volume, porosity)
 
 
 def porosity_profile(im, axis=0):
@@ -98,6 +96,9 @@ def porosity_profile(im, axis=0):
     """
     if axis >= im.ndim:
         raise Exception('axis out of range')
+    if im.dtype == bool:
+        prof = phase_statistics(im).profiles[axis]
+        return prof[:, 1] if prof.shape[1] > 1 else np.zeros(prof.shape[0])
     im = np.atleast_3d(im)
     a = set(range(im.ndim)).difference(set([axis]))
     a1, a2 = a
@@ -187,14 +188,10 @@ def radial_density_distribution(im, bins=10, log=False, voxel_size=1):
     Macroscopic Properties. Springer, New York (2002) - See page 48 & 292
     """
     if im.dtype == bool:
-        im = edt(im)
+        im = edt(im, parallel=settings.ncores)
     mask = find_dt_artifacts(im) == 0
-    im[mask] = 0
-    x = im[im > 0].flatten()
-    if log:
-        x = np.log10(x)
-    h = np.histogram(x, bins=bins, density=True)
-    h = _parse_histogram(h=h, voxel_size=voxel_size)
+    h = _histogram_of_image(im, bins=bins, log=log, mask=mask)
+    h = _parse_histogram(h=h.histogram(density=True), voxel_size=voxel_size)
     rdf = namedtuple('radial_density_distribution',
                      (log*'Log' + 'R', 'pdf', 'cdf', 'bin_centers', 'bin_edges',
                       'bin_widths'))
@@ -242,11 +239,8 @@ def lineal_path_distribution(im, bins=25, voxel_size=1, log=False):
     Macroscopic Properties. Springer, New York (2002)
 
     """
-    x = im[im > 0]
-    if log:
-        x = np.log10(x)
-    h = list(np.histogram(x, bins=bins, density=True))
-    h = _parse_histogram(h=h, voxel_size=voxel_size)
+    h = _histogram_of_image(im, bins=bins, log=log)
+    h = _parse_histogram(h=h.histogram(density=True), voxel_size=voxel_size)
     cld = namedtuple('lineal_path_distribution',
                      (log*'Log'+'L', 'pdf', 'cdf', 'relfreq',
                       'bin_centers', 'bin_edges', 'bin_widths'))
@@ -396,14 +390,15 @@ def pore_size_distribution(im, bins=10, log=True, voxel_size=1):
     (1) To ensure the returned values represent actual sizes you can manually
     scale the input image by the voxel size first (``im *= voxel_size``)
 
+    (2) The histogram is accumulated one slab of the image at a time using
+    ``StreamingHistogram``, so ``im`` can also be a ``numpy.memmap`` or
+    ``zarr`` array of a volume which does not fit in memory.
+
     plt.bar(psd.R, psd.satn, width=psd.bin_widths, edgecolor='k')
 
     """
-    im = im.flatten()
-    vals = im[im > 0] * voxel_size
-    if log:
-        vals = np.log10(vals)
-    h = _parse_histogram(np.histogram(vals, bins=bins, density=True))
+    h = _histogram_of_image(im, bins=bins, log=log, scale=voxel_size)
+    h = _parse_histogram(h.histogram(density=True))
     psd = namedtuple('pore_size_distribution',
                      (log * 'Log' + 'R', 'pdf', 'cdf', 'satn',
                       'bin_centers', 'bin_edges', 'bin_widths'))
@@ -411,7 +406,7 @@ def pore_size_distribution(im, bins=10, log=True, voxel_size=1):
                h.bin_centers, h.bin_edges, h.bin_widths)
 
 
-def two_point_correlation_bf(im, spacing=10):
+def two_point_correlation_bf(im, spacing=10, directional=False):
     r"""
     Calculates the two-point correlation function using brute-force (see Notes)
 
@@ -422,6 +417,12 @@ def two_point_correlation_bf(im, spacing=10):
     spacing : int
         The space between points on the regular grid that is used to generate
         the correlation (see Notes)
+    directional : bool
+        If ``True`` then each pair of points is assigned to the axis with
+        which the line joining them is most closely aligned (pairs equally
+        aligned with several axes are shared between them), and a separate
+        correlation is returned for each axis.  This is useful for detecting
+        anisotropy.  The default is ``False``.
 
     Returns
     -------
@@ -431,7 +432,8 @@ def two_point_correlation_bf(im, spacing=10):
         function.  The x array is the distances between points and the y array
         is corresponding probabilities that points of a given distance both
         lie in the void space. The distance values are binned as follows:
-        ``bins = range(start=0, stop=np.amin(im.shape)/2, stride=spacing)``
+        ``bins = range(start=0, stop=np.amin(im.shape)/2, stride=spacing)``.
+        If ``directional`` is ``True`` the y array has one row for each axis.
 
     Notes
     -----
@@ -439,8 +441,11 @@ def two_point_correlation_bf(im, spacing=10):
     onto the image, calculating the distance between each and every pair of
     points, then counting the instances where both pairs lie in the void space.
 
-    This approach uses a distance matrix so can consume memory very quickly for
-    large 3D images and/or close spacing.
+    Since the points lie on a regular grid, all pairs separated by the same
+    offset are the same distance apart, so the pairs are counted for each
+    offset in parallel and accumulated into the histogram without storing
+    the distance between each pair.  The memory use is thus proportional to
+    the number of points rather than its square.
     """
     if im.ndim != im.squeeze().ndim:    # pragma: no cover
         warnings.warn((
@@ -448,41 +453,109 @@ def two_point_correlation_bf(im, spacing=10):
             " Reduce dimensionality with np.squeeze(im) to avoid"
             " unexpected behavior."
         ))
-    if im.ndim == 2:
-        pts = np.meshgrid(range(0, im.shape[0], spacing),
-                          range(0, im.shape[1], spacing))
-        crds = np.vstack([pts[0].flatten(),
-                          pts[1].flatten()]).T
-    elif im.ndim == 3:
-        pts = np.meshgrid(range(0, im.shape[0], spacing),
-                          range(0, im.shape[1], spacing),
-                          range(0, im.shape[2], spacing))
-        crds = np.vstack([pts[0].flatten(),
-                          pts[1].flatten(),
-                          pts[2].flatten()]).T
-    dmat = sptl.distance.cdist(XA=crds, XB=crds)
-    hits = im[tuple(pts)].flatten()
-    dmat = dmat[hits, :]
-    h1 = np.histogram(dmat, bins=range(0, int(np.amin(im.shape) / 2), spacing))
-    dmat = dmat[:, hits]
-    h2 = np.histogram(dmat, bins=h1[1])
+    if im.ndim not in [2, 3]:
+        raise Exception('Image dimensions must be 2 or 3')
+    bins = np.arange(0, int(np.amin(im.shape) / 2), spacing)
     tpcf = namedtuple('two_point_correlation_function',
                       ('distance', 'probability'))
-    return tpcf(h2[1][:-1], h2[0] / h1[0])
+    if bins.size < 2:
+        shape = (im.ndim, 0) if directional else (0, )
+        return tpcf(bins[:0], np.zeros(shape))
+    # Points on the grid, with a singleton axis added to 2D images
+    pts = np.ascontiguousarray(im[tuple([slice(None, None, spacing)]*im.ndim)])
+    pts = (pts > 0).reshape(pts.shape + (1, )*(3 - im.ndim)).astype(np.uint8)
+    # List all offsets between points that are within the largest bin
+    m = int(bins[-1] // spacing)
+    rng = [np.arange(-min(m, s - 1), min(m, s - 1) + 1) for s in pts.shape]
+    offsets = np.stack(np.meshgrid(*rng, indexing='ij'), axis=-1)
+    offsets = offsets.reshape(-1, 3)
+    dist = np.sqrt((offsets**2).sum(axis=1)) * spacing
+    offsets, dist = offsets[dist <= bins[-1]], dist[dist <= bins[-1]]
+    # Pairs with both points in the void are found for half of the offsets
+    # and mirrored, while pairs with the first point in the void are found
+    # by summing the overlapping region of the grid
+    keys = _offset_keys(offsets, m)
+    half = keys >= _offset_keys(np.zeros([1, 3], dtype=int), m)
+    mirror = np.searchsorted(keys, _offset_keys(-offsets, m))
+    hits = np.zeros(offsets.shape[0], dtype=np.int64)
+    hits[half] = _count_pairs(pts, offsets[half])
+    hits[~half] = hits[mirror[~half]]
+    shape = np.array(pts.shape)
+    lower = np.maximum(0, -offsets)
+    upper = np.minimum(shape, shape - offsets)
+    total = box_sums(integral_image(pts), lower, upper)
+    if directional:
+        mags = np.abs(offsets[:, :im.ndim])
+        frac = (mags == mags.max(axis=1, keepdims=True)).astype(float)
+        frac /= frac.sum(axis=1, keepdims=True)
+        h1 = np.array([np.histogram(dist, bins=bins, weights=total*f)[0]
+                       for f in frac.T])
+        h2 = np.array([np.histogram(dist, bins=bins, weights=hits*f)[0]
+                       for f in frac.T])
+    else:
+        h1 = np.histogram(dist, bins=bins, weights=total)[0]
+        h2 = np.histogram(dist, bins=bins, weights=hits)[0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        probability = h2 / h1
+    return tpcf(bins[:-1], probability)
+
+
+def _offset_keys(offsets, m):
+    r"""
+    Converts offsets in the range [-m, m] into sortable scalar keys
+    """
+    n = 2*m + 1
+    return ((offsets[:, 0] + m)*n + offsets[:, 1] + m)*n + offsets[:, 2] + m
 
 
-def _radial_profile(autocorr, r_max, nbins=100):
+@njit(parallel=True)
+def _count_pairs(pts, offsets):  # pragma: no cover
+    r"""
+    Counts the pairs of non-zero points separated by each offset
+    """
+    Nx, Ny, Nz = pts.shape
+    counts = np.zeros(offsets.shape[0], dtype=np.int64)
+    for n in prange(offsets.shape[0]):
+        dx, dy, dz = offsets[n, 0], offsets[n, 1], offsets[n, 2]
+        k0, k1 = max(0, -dz), min(Nz, Nz - dz)
+        c = 0
+        for i in range(max(0, -dx), min(Nx, Nx - dx)):
+            for j in range(max(0, -dy), min(Ny, Ny - dy)):
+                a = pts[i, j]
+                b = pts[i + dx, j + dy]
+                row = np.int32(0)
+                for k in range(k0, k1):
+                    row += np.int32(a[k] & b[k + dz])
+                c += row
+        counts[n] = c
+    return counts
+
+
+def _radial_profile(autocorr, shape, r_max, nbins=100, directional=False,
+                    norm=None):
     r"""
     Helper functions to calculate the radial profile of the autocorrelation
-    Masks the image in radial segments from the center and averages the values
-    The distance values are normalized and 100 bins are used as default.
+    Groups the voxels into radial segments from the origin and averages the
+    values.  The distance values are normalized and 100 bins are used as
+    default.
 
     Parameters
     ----------
     autocorr : ND-array
-        The image of autocorrelation produced by FFT
+        The autocorrelation produced by FFT, with the origin in the corner
+        and only the first half of the last axis, as returned by ``irfftn``
+        and cropped to ``shape[-1] // 2 + 1``
+    shape : tuple
+        The shape of the full autocorrelation
     r_max : int or float
         The maximum radius in pixels to sum the image over
+    nbins : int
+        The maximum number of bins
+    directional : bool
+        If ``True`` the profile is found along each axis separately
+    norm : scalar
+        The value by which the profile is divided.  The default is the value
+        at the origin.
 
     Returns
     -------
@@ -490,31 +563,90 @@ def _radial_profile(autocorr, r_max, nbins=100):
         A named tupling containing an array of ``bins`` of radial position
         and an array of ``counts`` in each bin.
     """
-    if len(autocorr.shape) == 2:
-        adj = np.reshape(autocorr.shape, [2, 1, 1])
-        inds = np.indices(autocorr.shape) - adj / 2
-        dt = np.sqrt(inds[0]**2 + inds[1]**2)
-    elif len(autocorr.shape) == 3:
-        adj = np.reshape(autocorr.shape, [3, 1, 1, 1])
-        inds = np.indices(autocorr.shape) - adj / 2
-        dt = np.sqrt(inds[0]**2 + inds[1]**2 + inds[2]**2)
-    else:
+    if len(shape) not in [2, 3]:
         raise Exception('Image dimensions must be 2 or 3')
-    bin_size = np.int(np.ceil(r_max / nbins))
+    bin_size = int(np.ceil(r_max / nbins))
     bins = np.arange(bin_size, r_max, step=bin_size)
-    radial_sum = np.zeros_like(bins)
-    for i, r in enumerate(bins):
-        # Generate Radial Mask from dt using bins
-        mask = (dt <= r) * (dt > (r - bin_size))
-        radial_sum[i] = np.sum(autocorr[mask]) / np.sum(mask)
+    # The last axis was halved, so all other elements represent two voxels
+    n = shape[-1]
+    weights = np.full(n // 2 + 1, 2.0)
+    weights[0] = 1
+    if n % 2 == 0:
+        weights[-1] = 1
+    if directional:
+        radial_sum = np.zeros([len(shape), bins.size])
+        for ax in range(len(shape)):
+            line = autocorr[tuple([slice(None) if i == ax else 0
+                                   for i in range(len(shape))])]
+            dist = np.arange(line.size)
+            if ax < len(shape) - 1:
+                dist = np.minimum(dist, shape[ax] - dist)
+                w = np.ones(line.size)
+            else:
+                w = weights
+            idx = np.ceil(dist / bin_size).astype(int)
+            sums = np.bincount(idx, weights=line*w, minlength=bins.size + 1)
+            counts = np.bincount(idx, weights=w, minlength=bins.size + 1)
+            radial_sum[ax] = sums[1:bins.size + 1] / counts[1:bins.size + 1]
+    else:
+        idx, counts = _radial_bin_index(tuple(shape), bin_size)
+        sums = np.bincount(idx.ravel(), weights=(autocorr*weights).ravel(),
+                           minlength=bins.size + 1)
+        radial_sum = sums[1:bins.size + 1] / counts[1:bins.size + 1]
     # Return normalized bin and radially summed autoc
-    norm_autoc_radial = radial_sum / np.max(autocorr)
+    if norm is None:
+        norm = autocorr.flat[0]
+    norm_autoc_radial = radial_sum / norm
     tpcf = namedtuple('two_point_correlation_function',
                       ('distance', 'probability'))
     return tpcf(bins, norm_autoc_radial)
 
 
-def two_point_correlation_fft(im):
+def _radial_bin_index(shape, bin_size):
+    r"""
+    Finds the radial bin of each element of a half-spectrum with the origin
+    in the corner, along with the number of voxels in each bin.  The result
+    is cached for small images only, so that no index the size of a large
+    image is kept in memory after the call.
+    """
+    if np.prod(shape) <= 2**20:
+        return _cached_radial_bin_index(shape, bin_size)
+    return _find_radial_bin_index(shape, bin_size)
+
+
+@lru_cache(maxsize=4)
+def _cached_radial_bin_index(shape, bin_size):
+    r"""
+    Caches the radial bin index of small images, which only depends on the
+    shape of the image
+    """
+    return _find_radial_bin_index(shape, bin_size)
+
+
+def _find_radial_bin_index(shape, bin_size):
+    r"""
+    Computes the radial bin index returned by ``_radial_bin_index``
+    """
+    half = shape[-1] // 2 + 1
+    dists = [np.minimum(np.arange(n), n - np.arange(n))**2.0
+             for n in shape[:-1]] + [np.arange(half)**2.0]
+    rmax = np.sqrt(sum([d.max() for d in dists])) / bin_size + 1
+    dtype = np.uint16 if rmax < 2**16 else np.uint32
+    idx = np.empty([d.size for d in dists], dtype=dtype)
+    rest = np.add.outer(*dists[1:]) if len(dists) == 3 else dists[1]
+    for i, d in enumerate(dists[0]):
+        idx[i] = np.ceil(np.sqrt(d + rest) / bin_size)
+    weights = np.full(half, 2.0)
+    weights[0] = 1
+    if shape[-1] % 2 == 0:
+        weights[-1] = 1
+    counts = np.bincount(idx.ravel(),
+                         weights=np.broadcast_to(weights, idx.shape).ravel())
+    idx.setflags(write=False)
+    return idx, counts
+
+
+def two_point_correlation_fft(im, directional=False):
     r"""
     Calculates the two-point correlation function using fourier transforms
 
@@ -522,6 +654,10 @@ def two_point_correlation_fft(im):
     ----------
     im : ND-array
         The image of the void space on which the 2-point correlation is desired
+    directional : bool
+        If ``True`` then the correlation is found along each axis separately
+        and the returned ``probability`` has one row per axis.  The default is
+        ``False``, which averages over all directions.
 
     Returns
     -------
@@ -536,18 +672,32 @@ def two_point_correlation_fft(im):
     -----
     The fourier transform approach utilizes the fact that the autocorrelation
     function is the inverse FT of the power spectrum density.
-    For background read the Scipy fftpack docs and for a good explanation see:
+    For background read the scipy.fft docs and for a good explanation see:
     http://www.ucl.ac.uk/~ucapikr/projects/KamilaSuankulova_BSc_Project.pdf
+
+    Since the image is real, only half of the spectrum is computed using
+    ``rfftn``, in the precision given by ``porespy.settings.precision``.
+    Setting this to ``'float32'`` halves the memory required for large
+    images.  The radial bin of each voxel is computed once per image shape
+    and cached.
     """
+    if im.ndim not in [2, 3]:
+        raise Exception('Image dimensions must be 2 or 3')
     # Calculate half lengths of the image
     hls = (np.ceil(np.shape(im)) / 2).astype(int)
-    # Fourier Transform and shift image
-    F = sp_ft.ifftshift(sp_ft.fftn(sp_ft.fftshift(im)))
-    # Compute Power Spectrum
-    P = np.absolute(F**2)
+    shape = im.shape
+    im = np.asarray(im, dtype=get_precision())
+    # Power spectrum of the image
+    F = sp_ft.rfftn(im, workers=settings.ncores)
+    P = F.real**2 + F.imag**2
+    del F
     # Auto-correlation is inverse of Power Spectrum
-    autoc = np.absolute(sp_ft.ifftshift(sp_ft.ifftn(sp_ft.fftshift(P))))
-    tpcf = _radial_profile(autoc, r_max=np.min(hls))
+    autoc = sp_ft.irfftn(P, s=shape, workers=settings.ncores)
+    del P
+    # Only half is needed since the auto-correlation is symmetric
+    autoc = autoc[..., :shape[-1] // 2 + 1]
+    tpcf = _radial_profile(autoc, shape=shape, r_max=np.min(hls),
+                           directional=directional)
     return tpcf
 
 
@@ -593,7 +743,8 @@ def chord_counts(im):
     return chord_lens
 
 
-def region_interface_areas(regions, areas, voxel_size=1, strel=None):
+def region_interface_areas(regions, areas, voxel_size=1, strel=None,
+                           rag=None):
     r"""
     Calculates the interfacial area between all pairs of adjecent regions
 
@@ -617,6 +768,10 @@ def region_interface_areas(regions, areas, voxel_size=1, strel=None):
         then a spherical element (or disk) with radius 1 is used.  See the
         docstring for ``mesh_region`` for more details, as this argument is
         passed to there.
+    rag : RegionAdjacencyGraph
+        The adjacency graph of ``regions``.  If not provided it is found from
+        the image, so passing it saves a scan of the image when it has
+        already been built.
 
     Returns
     -------
@@ -628,10 +783,20 @@ def region_interface_areas(regions, areas, voxel_size=1, strel=None):
         ``conns[0, 1]`` is 5, then row 0 of ``area`` contains the interfacial
         area shared by regions 0 and 5.
 
+    See Also
+    --------
+    region_areas
+
+    Notes
+    -----
+    The union of each pair of regions is meshed within the bounding box of
+    the pair, so the cost grows with the number of pairs times the size of
+    their bounding boxes.  ``region_areas`` finds the interfacial area of all
+    pairs in a single sweep of the image and is much faster on large images.
+
     """
     print('-' * 60, flush=True)
     print('Finding interfacial areas between each region', flush=True)
-    from skimage.morphology import disk, ball
     im = regions.copy()
     if im.ndim != im.squeeze().ndim:    # pragma: no cover
         warnings.warn((
@@ -639,44 +804,28 @@ def region_interface_areas(regions, areas, voxel_size=1, strel=None):
             " Reduce dimensionality with np.squeeze(im) to avoid"
             " unexpected behavior."
         ))
-    # cube_elem = square if im.ndim == 2 else cube
-    ball_elem = disk if im.ndim == 2 else ball
+    # Find all pairs of adjacent regions in one pass
+    if rag is None:
+        rag = RegionAdjacencyGraph(im)
+    elif rag.shape != im.shape:
+        raise Exception('The region adjacency graph does not match the shape'
+                        + ' of the image')
     # Get 'slices' into im for each region
     slices = spim.find_objects(im)
     # Initialize arrays
-    Ps = np.arange(1, np.amax(im) + 1)
-    sa = np.zeros_like(Ps, dtype=float)
-    sa_combined = []  # Difficult to preallocate since number of conns unknown
-    cn = []
+    sa = np.asarray(areas, dtype=float)
+    cn = rag.conns
+    sa_combined = np.zeros(cn.shape[0])
     # Start extracting area from im
-    for i in tqdm(Ps, **settings.tqdm):
-        reg = i - 1
-        if slices[reg] is not None:
-            s = extend_slice(slices[reg], im.shape)
-            sub_im = im[s]
-            mask_im = sub_im == i
-            sa[reg] = areas[reg]
-            im_w_throats = spim.binary_dilation(input=mask_im,
-                                                structure=ball_elem(1))
-            im_w_throats = im_w_throats * sub_im
-            Pn = np.unique(im_w_throats)[1:] - 1
-            for j in Pn:
-                if j > reg:
-                    cn.append([reg, j])
-                    merged_region = im[(min(slices[reg][0].start,
-                                            slices[j][0].start)):
-                                       max(slices[reg][0].stop,
-                                           slices[j][0].stop),
-                                       (min(slices[reg][1].start,
-                                            slices[j][1].start)):
-                                       max(slices[reg][1].stop,
-                                           slices[j][1].stop)]
-                    merged_region = ((merged_region == reg + 1)
-                                     + (merged_region == j + 1))
-                    mesh = mesh_region(region=merged_region, strel=strel)
-                    sa_combined.append(mesh_surface_area(mesh))
+    for n, (reg, j) in enumerate(tqdm(cn, **settings.tqdm)):
+        s = tuple(slice(min(a.start, b.start), max(a.stop, b.stop))
+                  for a, b in zip(slices[reg], slices[j]))
+        merged_region = im[s]
+        merged_region = ((merged_region == reg + 1)
+                         + (merged_region == j + 1))
+        mesh = mesh_region(region=merged_region, strel=strel)
+        sa_combined[n] = mesh_surface_area(mesh)
     # Interfacial area calculation
-    cn = np.array(cn)
     ia = 0.5 * (sa[cn[:, 0]] + sa[cn[:, 1]] - sa_combined)
     ia[ia <= 0] = 1
     result = namedtuple('interfacial_areas', ('conns', 'area'))
@@ -736,6 +885,326 @@ def region_surface_areas(regions, voxel_size=1, strel=None):
     return result
 
 
+def region_areas(regions, voxel_size=1, conns=None):
+    r"""
+    Finds the surface area of every region and the interfacial area between
+    every pair of adjoining regions in a single sweep of the image
+
+    Parameters
+    ----------
+    regions : ND-array
+        An image of the pore space partitioned into individual pore regions.
+        Note that zeros in the image will not be considered for area
+        calculation.
+    voxel_size : scalar
+        The resolution of the image, expressed as the length of one side of a
+        voxel, so the volume of a voxel would be **voxel_size**-cubed.  The
+        default is 1.
+    conns : array_like, optional
+        An N-by-2 array of pairs of region indices (offset by 1, as in the
+        ``'throat.conns'`` array of a network extracted from ``regions``).
+        If given, the interfacial areas are returned for these pairs in the
+        given order, with 0 for pairs that do not share an interface.
+
+    Returns
+    -------
+    result : named_tuple
+        A named-tuple containing the following arrays:
+
+        ``surface_area`` holds the surface area of each region, offset by 1,
+        such that the surface area of region 1 is stored in element 0.
+
+        ``conns`` holds each pair of adjoining regions, also offset by 1, as
+        an N-by-2 array sorted by the first then second column (or a copy of
+        the received ``conns``).
+
+        ``area`` holds the interfacial area shared by each pair in ``conns``.
+
+    Notes
+    -----
+    Each region is blurred with a ball (or disk) of radius 1 as done by
+    ``mesh_region``, but the blurring and meshing are done on the fly for
+    all regions at once.  The image is divided into 2x2x2 cells and for each
+    cell containing more than one label, the marching cubes triangles of each
+    region present in the cell are found using a lookup table and the area
+    is assigned to that region.  The interfacial area between regions i and j
+    is found from the area of each and of their union as
+    :math:`(A_i + A_j - A_{i \cup j})/2`, accumulated cell by cell.  Only the
+    cells lying on a boundary are visited and the sweep is done in parallel
+    by slices.  In 2D the perimeter of each region is returned instead.
+
+    The iso-level is always halfway, so regions that are only 1 voxel thick
+    everywhere will have a smaller area than found by ``region_surface_areas``
+    which adjusts the level to the blurred values of each region.
+
+    Examples
+    --------
+    >>> import porespy as ps
+    >>> import numpy as np
+    >>> im = np.zeros([20, 20, 20], dtype=int)
+    >>> im[2:10, 2:18, 2:18] = 1
+    >>> im[10:18, 2:18, 2:18] = 2
+    >>> areas = ps.metrics.region_areas(im)
+    >>> areas.conns
+    array([[0, 1]])
+
+    """
+    if regions.ndim not in [2, 3]:
+        raise Exception('Only 2D and 3D images are supported')
+    im = regions if regions.ndim == 3 else regions[..., np.newaxis]
+    Np = int(np.amax(regions))
+    corners, nbrs, edges, simplices, level = _marching_tables(regions.ndim)
+    lo = np.array([-1, -1, -1])
+    hi = np.array(im.shape)
+    if regions.ndim == 2:
+        lo[2], hi[2] = 0, 1
+    # Count the records produced in each slice, then fill them in batches
+    counts = _region_areas_count(im, lo, hi, corners, nbrs)
+    batch_lim = 2**22
+    keys, vals = [], []
+    start = 0
+    while start < counts.size:
+        stop = start + max(1, np.searchsorted(np.cumsum(counts[start:]),
+                                              batch_lim))
+        stop = min(stop, counts.size)
+        offsets = np.cumsum(np.append(0, counts[start:stop]))
+        ra = np.zeros(offsets[-1], dtype=np.int64)
+        rb = np.zeros(offsets[-1], dtype=np.int64)
+        rv = np.zeros(offsets[-1], dtype=float)
+        _region_areas_fill(im, start + lo[0], stop + lo[0], lo, hi, corners,
+                           nbrs, edges, simplices, level, offsets, ra, rb, rv)
+        k, inv = np.unique(ra*(Np + 1) + rb, return_inverse=True)
+        keys.append(k)
+        vals.append(np.bincount(inv, weights=rv))
+        start = stop
+    keys = np.concatenate(keys + [np.zeros(0, dtype=np.int64)])
+    vals = np.concatenate(vals + [np.zeros(0)])
+    keys, inv = np.unique(keys, return_inverse=True)
+    vals = np.bincount(inv, weights=vals, minlength=keys.size)
+    a, b = keys // (Np + 1), keys % (Np + 1)
+    sa = np.zeros(Np, dtype=float)
+    sa[a[a == b] - 1] = vals[a == b]
+    pairs = (a != b) * (vals > 0)
+    if conns is None:
+        conns = np.vstack((a[pairs] - 1, b[pairs] - 1)).T
+        area = vals[pairs]
+    else:
+        conns = np.array(conns, dtype=int).reshape(-1, 2)
+        lookup = np.sort(conns, axis=1) + 1
+        lookup = lookup[:, 0]*(Np + 1) + lookup[:, 1]
+        hits = keys[pairs]
+        loc = np.clip(np.searchsorted(hits, lookup), 0, max(hits.size - 1, 0))
+        area = np.zeros(conns.shape[0], dtype=float)
+        if hits.size > 0:
+            found = hits[loc] == lookup
+            area[found] = vals[pairs][loc[found]]
+    scale = voxel_size**(regions.ndim - 1)
+    result = namedtuple('region_areas', ('surface_area', 'conns', 'area'))
+    return result(sa*scale, conns, area*scale)
+
+
+@lru_cache(maxsize=2)
+def _marching_tables(ndim):
+    r"""
+    Builds the lookup tables used by ``region_areas``
+
+    Returns the corner offsets of a cell, the offsets of the voxels used to
+    blur each corner (including itself), the pairs of corners forming each
+    edge, the simplices (line segments in 2D or triangles in 3D) of each
+    corner configuration expressed as edge indices, and the iso-level.  An
+    edge index equal to the number of edges refers to the center of the cell,
+    which the marching cubes algorithm uses in some ambiguous cases.
+    """
+    nc = 2**ndim
+    corners = np.zeros((nc, 3), dtype=np.int64)
+    for k in range(nc):
+        corners[k, :ndim] = [(k >> (ndim - 1 - i)) & 1 for i in range(ndim)]
+    nbrs = np.zeros((2*ndim + 1, 3), dtype=np.int64)
+    for i in range(ndim):
+        nbrs[2*i + 1, i], nbrs[2*i + 2, i] = -1, 1
+    edges = np.array([(a, b) for a in range(nc) for b in range(a + 1, nc)
+                      if np.abs(corners[a] - corners[b]).sum() == 1])
+    mids = (corners[edges[:, 0]] + corners[edges[:, 1]])/2
+    ne = edges.shape[0]
+    simplices = -np.ones((2**nc, 12, ndim), dtype=np.int64)
+    for cfg in range(1, 2**nc - 1):
+        inside = np.array([(cfg >> k) & 1 for k in range(nc)], dtype=bool)
+        if ndim == 2:
+            # Marching squares, keeping diagonal corners separated
+            cross = [e for e in range(ne)
+                     if inside[edges[e, 0]] != inside[edges[e, 1]]]
+            if len(cross) == 2:
+                segs = [cross]
+            else:
+                segs = [[e for e in cross if c in edges[e]]
+                        for c in np.where(inside)[0]]
+            simplices[cfg, :len(segs)] = segs
+        else:
+            cube = np.zeros((2, 2, 2))
+            cube[tuple(corners[:, :3].T)] = inside
+            verts, faces = measure.marching_cubes(cube, level=0.5)[:2]
+            ids = [ne if np.allclose(v, 0.5)
+                   else np.where(np.all(np.isclose(mids, v), axis=1))[0][0]
+                   for v in verts]
+            simplices[cfg, :faces.shape[0]] = np.array(ids)[faces]
+    level = ndim + 0.5
+    return corners, nbrs, edges, simplices, level
+
+
+@njit
+def _gather_cell(im, x, y, z, corners, nbrs, lab, cand):  # pragma: no cover
+    r"""
+    Fetches the labels around each corner of the cell at (x, y, z), using 0
+    outside the image, and finds the distinct non-zero labels among them.
+    Returns 0 if all corners carry the same label since no surface can pass
+    through the cell in that case.
+    """
+    Nx, Ny, Nz = im.shape
+    inner = (x >= 1) and (y >= 1) and (z >= 1) and (x + 2 < Nx) \
+        and (y + 2 < Ny) and (z + 2 < Nz)
+    if inner:
+        uniform = True
+        v = im[x, y, z]
+        for c in range(1, corners.shape[0]):
+            if im[x + corners[c, 0], y + corners[c, 1], z + corners[c, 2]] != v:
+                uniform = False
+                break
+        if uniform:
+            return 0
+    uniform = True
+    for c in range(corners.shape[0]):
+        for n in range(nbrs.shape[0]):
+            i = x + corners[c, 0] + nbrs[n, 0]
+            j = y + corners[c, 1] + nbrs[n, 1]
+            k = z + corners[c, 2] + nbrs[n, 2]
+            if inner or ((i >= 0) and (j >= 0) and (k >= 0) and (i < Nx)
+                         and (j < Ny) and (k < Nz)):
+                lab[c, n] = im[i, j, k]
+            else:
+                lab[c, n] = 0
+        if lab[c, 0] != lab[0, 0]:
+            uniform = False
+    if uniform:
+        return 0
+    N = 0
+    for c in range(corners.shape[0]):
+        for n in range(nbrs.shape[0]):
+            v = lab[c, n]
+            if v == 0:
+                continue
+            new = True
+            for m in range(N):
+                if cand[m] == v:
+                    new = False
+                    break
+            if new:
+                cand[N] = v
+                N += 1
+    return N
+
+
+@njit
+def _cell_measure(cnt, level, corners, edges, simplices, pts):  # pragma: no cover
+    r"""
+    Finds the area (or length in 2D) of the iso-surface within a cell given
+    the number of voxels belonging to a region around each corner
+    """
+    nc = corners.shape[0]
+    cfg = 0
+    for c in range(nc):
+        if cnt[c] > level:
+            cfg |= 1 << c
+    if (cfg == 0) or (cfg == 2**nc - 1):
+        return 0.0
+    ne = edges.shape[0]
+    pts[ne, :] = 0.0
+    m = 0
+    for e in range(ne):
+        a, b = edges[e, 0], edges[e, 1]
+        if (cnt[a] > level) != (cnt[b] > level):
+            t = (level - cnt[a])/(cnt[b] - cnt[a])
+            for d in range(3):
+                pts[e, d] = corners[a, d] + t*(corners[b, d] - corners[a, d])
+                pts[ne, d] += pts[e, d]
+            m += 1
+    for d in range(3):
+        pts[ne, d] /= m
+    total = 0.0
+    for s in range(simplices.shape[1]):
+        v0 = simplices[cfg, s, 0]
+        if v0 < 0:
+            break
+        v1 = simplices[cfg, s, 1]
+        if simplices.shape[2] == 2:
+            total += np.sqrt((pts[v1, 0] - pts[v0, 0])**2
+                             + (pts[v1, 1] - pts[v0, 1])**2)
+        else:
+            v2 = simplices[cfg, s, 2]
+            ux = pts[v1, 0] - pts[v0, 0]
+            uy = pts[v1, 1] - pts[v0, 1]
+            uz = pts[v1, 2] - pts[v0, 2]
+            wx = pts[v2, 0] - pts[v0, 0]
+            wy = pts[v2, 1] - pts[v0, 1]
+            wz = pts[v2, 2] - pts[v0, 2]
+            total += 0.5*np.sqrt((uy*wz - uz*wy)**2 + (uz*wx - ux*wz)**2
+                                 + (ux*wy - uy*wx)**2)
+    return total
+
+
+@njit(parallel=True)
+def _region_areas_count(im, lo, hi, corners, nbrs):  # pragma: no cover
+    nx = hi[0] - lo[0]
+    counts = np.zeros(nx, dtype=np.int64)
+    for i in prange(nx):
+        lab = np.zeros((corners.shape[0], nbrs.shape[0]), dtype=im.dtype)
+        cand = np.zeros(lab.size, dtype=im.dtype)
+        n = 0
+        for y in range(lo[1], hi[1]):
+            for z in range(lo[2], hi[2]):
+                k = _gather_cell(im, i + lo[0], y, z, corners, nbrs, lab, cand)
+                n += k + k*(k - 1)//2
+        counts[i] = n
+    return counts
+
+
+@njit(parallel=True)
+def _region_areas_fill(im, x0, x1, lo, hi, corners, nbrs, edges, simplices,
+                       level, offsets, ra, rb, rv):  # pragma: no cover
+    nc = corners.shape[0]
+    for i in prange(x1 - x0):
+        x = x0 + i
+        lab = np.zeros((nc, nbrs.shape[0]), dtype=im.dtype)
+        cand = np.zeros(lab.size, dtype=im.dtype)
+        cnt = np.zeros((lab.size, nc))
+        union = np.zeros(nc)
+        A = np.zeros(lab.size)
+        pts = np.zeros((edges.shape[0] + 1, 3))
+        p = offsets[i]
+        for y in range(lo[1], hi[1]):
+            for z in range(lo[2], hi[2]):
+                k = _gather_cell(im, x, y, z, corners, nbrs, lab, cand)
+                for a in range(k):
+                    for c in range(nc):
+                        cnt[a, c] = 0
+                        for n in range(nbrs.shape[0]):
+                            if lab[c, n] == cand[a]:
+                                cnt[a, c] += 1
+                    A[a] = _cell_measure(cnt[a], level, corners, edges,
+                                         simplices, pts)
+                    ra[p], rb[p], rv[p] = cand[a], cand[a], A[a]
+                    p += 1
+                for a in range(k):
+                    for b in range(a + 1, k):
+                        for c in range(nc):
+                            union[c] = cnt[a, c] + cnt[b, c]
+                        Aab = _cell_measure(union, level, corners, edges,
+                                            simplices, pts)
+                        ra[p] = min(cand[a], cand[b])
+                        rb[p] = max(cand[a], cand[b])
+                        rv[p] = 0.5*(A[a] + A[b] - Aab)
+                        p += 1
+
+
 def mesh_surface_area(mesh=None, verts=None, faces=None):
     r"""
     Calculates the surface area of a meshed region
@@ -772,6 +1241,140 @@ def mesh_surface_area(mesh=None, verts=None, faces=None):
     return surface_area
 
 
+def phase_statistics(im, slab_thickness=None, profiles=True):
+    r"""
+    Counts the voxels of each phase in an image, along with the fraction of
+    each phase in every slice along each axis, in a single read of the image
+
+    Parameters
+    ----------
+    im : ND-array
+        An image containing non-negative integer (or boolean) values for each
+        phase.  Any object which can be sliced along its first axis to give
+        numpy arrays can be used, such as a ``numpy.memmap`` or a ``zarr``
+        array, so volumes stored on disk need not be loaded into memory.
+    slab_thickness : int
+        The number of slices along the first axis which are read and processed
+        at once.  The default is to use slabs containing about 64 million
+        voxels.
+    profiles : bool
+        If ``True`` (default) the profiles along each axis are found as well.
+        If ``False`` only the counts are found, which avoids allocating a
+        profile with one column per phase for every slice, so this should be
+        used for images with many labels.
+
+    Returns
+    -------
+    result : named_tuple
+        A named-tuple containing:
+
+        ``counts`` is an array containing the number of voxels of each phase,
+        with element ``i`` corresponding to phase ``i``.
+
+        ``fractions`` is the same as ``counts`` divided by the total number of
+        voxels.
+
+        ``profiles`` is a tuple containing one array per axis, each with one
+        row per slice along the axis and one column per phase, giving the
+        fraction of each slice occupied by each phase.  This is ``None`` if
+        ``profiles`` is ``False``.
+
+    See Also
+    --------
+    phase_fraction
+    porosity
+    porosity_profile
+
+    Notes
+    -----
+    The image is processed one slab at a time along the first axis.  Each
+    slab is scanned once by a parallel kernel which increments the counts
+    of the phase found at each voxel for its slice along each axis.  If the
+    profiles are not needed the counts are found with ``np.bincount`` over
+    pieces of each slab instead, so no memory is used beyond one count per
+    phase and a small buffer.
+
+    Examples
+    --------
+    >>> import porespy as ps
+    >>> im = ps.generators.blobs(shape=[50, 50, 50], porosity=0.6)
+    >>> stats = ps.metrics.phase_statistics(im)
+    >>> phi = stats.fractions[1]
+    >>> prof = stats.profiles[2][:, 1]
+
+    """
+    shape = im.shape
+    if len(shape) not in [1, 2, 3]:
+        raise Exception('Only 1D, 2D and 3D images are supported')
+    if (im.dtype != bool) and not np.issubdtype(im.dtype, np.integer):
+        raise Exception('Image must contain integer values for each phase')
+    if slab_thickness is None:
+        slab_thickness = max(1, 2**26 // max(1, int(np.prod(shape[1:]))))
+    size = int(np.prod(shape))
+    stats = namedtuple('phase_statistics', ('counts', 'fractions', 'profiles'))
+    if not profiles:
+        counts = np.zeros(1, dtype=np.int64)
+        for start in range(0, shape[0], slab_thickness):
+            slab = _phase_slab(im, start, slab_thickness)
+            for flat in np.array_split(slab.ravel(), max(1, slab.size//2**20)):
+                c = np.bincount(flat.astype(np.intp, copy=False))
+                if c.size > counts.size:
+                    counts = np.pad(counts, (0, c.size - counts.size))
+                counts[:c.size] += c
+        return stats(counts, counts / size, None)
+    nphases = 1
+    profs = [np.zeros((s, nphases), dtype=np.int64) for s in shape]
+    for start in range(0, shape[0], slab_thickness):
+        slab = _phase_slab(im, start, slab_thickness)
+        if slab.size == 0:
+            continue
+        n = int(slab.max()) + 1
+        if n > nphases:
+            profs = [np.pad(p, ((0, 0), (0, n - nphases))) for p in profs]
+            nphases = n
+        slab = slab.reshape(slab.shape + (1, )*(3 - slab.ndim))
+        nchunks = max(1, min(settings.ncores, slab.shape[0]))
+        p0, p1, p2 = _phase_count_kernel(slab, nphases, nchunks)
+        profs[0][start:start + slab.shape[0]] += p0
+        if len(shape) > 1:
+            profs[1] += p1
+        if len(shape) > 2:
+            profs[2] += p2
+    counts = profs[0].sum(axis=0)
+    profiles = tuple(p / (size / s) for p, s in zip(profs, shape))
+    return stats(counts, counts / size, profiles)
+
+
+def _phase_slab(im, start, thickness):
+    r"""
+    Reads one slab of an image of phases as a numpy array of non-negative
+    integers
+    """
+    slab = np.asarray(im[start:start + thickness])
+    if slab.dtype == bool:
+        slab = slab.view(np.uint8)
+    if slab.min(initial=0) < 0:
+        raise Exception('Image must not contain negative values')
+    return slab
+
+
+@njit(parallel=True)
+def _phase_count_kernel(slab, nphases, nchunks):  # pragma: no cover
+    X, Y, Z = slab.shape
+    p0 = np.zeros((X, nphases), dtype=np.int64)
+    p1 = np.zeros((nchunks, Y, nphases), dtype=np.int64)
+    p2 = np.zeros((nchunks, Z, nphases), dtype=np.int64)
+    for t in prange(nchunks):
+        for x in range(t * X // nchunks, (t + 1) * X // nchunks):
+            for y in range(Y):
+                for z in range(Z):
+                    v = slab[x, y, z]
+                    p0[x, v] += 1
+                    p1[t, y, v] += 1
+                    p2[t, z, v] += 1
+    return p0, p1.sum(axis=0), p2.sum(axis=0)
+
+
 def phase_fraction(im, normed=True):
     r"""
     Calculates the number (or fraction) of each phase in an image
@@ -796,14 +1399,9 @@ def phase_fraction(im, normed=True):
     porosity
 
     """
-    if im.dtype == bool:
-        im = im.astype(int)
-    elif im.dtype != int:
+    if (im.dtype != bool) and not np.issubdtype(im.dtype, np.integer):
         raise Exception('Image must contain integer values for each phase')
-    labels = np.arange(0, np.amax(im) + 1)
-    results = np.zeros_like(labels)
-    for i in labels:
-        results[i] = np.sum(im == i)
+    results = phase_statistics(im, profiles=False).counts
     if normed:
         results = results / im.size
     return results
@@ -844,6 +1442,12 @@ def porosity(im):
     calculation of accessible porosity, rather than overall porosity.
 
     """
+    if (im.dtype == bool) or np.issubdtype(im.dtype, np.integer):
+        if (im.ndim <= 3) and (im.min(initial=0) >= 0):
+            counts = phase_statistics(im, profiles=False).counts
+            counts = np.append(counts, 0)
+            Vs, Vp = counts[0], counts[1]
+            return Vp / (Vs + Vp)
     im = np.array(im, dtype=int)
     Vp = np.sum(im == 1)
     Vs = np.sum(im == 0)
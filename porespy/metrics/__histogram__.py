@@ -0,0 +1,119 @@
+import numpy as np
+
+
+class StreamingHistogram:
+    r"""
+    Accumulates a histogram from data supplied in chunks, so that the
+    distribution of values in an image can be found without holding all of
+    the values in memory at once
+
+    Parameters
+    ----------
+    bins : int or array_like
+        The number of bins (if int) or the location of the bin edges (if
+        array).  If an int is given then ``range`` must also be given since
+        the extent of the data is not known in advance.
+    range : tuple of scalars
+        The lower and upper edges of the bins when ``bins`` is an int.
+    log : bool
+        If ``True`` the values are converted to log (base-10) before binning,
+        in which case ``bins`` and ``range`` refer to the logged values.  The
+        default is ``False``.
+
+    Notes
+    -----
+    Values outside the bins are ignored and the last bin includes its upper
+    edge, as done by ``numpy.histogram``.  Histograms accumulated separately,
+    for instance by different workers, can be combined with ``merge`` (or
+    ``+=``) provided they use the same bins.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> from porespy.metrics import StreamingHistogram
+    >>> hist = StreamingHistogram(bins=4, range=(0, 1))
+    >>> for chunk in np.array_split(np.linspace(0, 1, 100), 7):
+    ...     hist.add(chunk)
+    >>> print(hist.counts)
+    [25 25 25 25]
+
+    """
+
+    def __init__(self, bins=10, range=None, log=False):
+        if np.ndim(bins) == 0:
+            if range is None:
+                raise Exception('range must be given when bins is an int')
+            bins = np.histogram_bin_edges(np.array(range, dtype=float),
+                                          bins=int(bins))
+        self.edges = np.array(bins, dtype=float)
+        self.log = log
+        self.counts = np.zeros(self.edges.size - 1, dtype=np.int64)
+
+    def add(self, x):
+        r"""
+        Adds the given values to the histogram
+        """
+        x = np.asarray(x).ravel()
+        if self.log:
+            x = np.log10(x)
+        self.counts += np.histogram(x, bins=self.edges)[0]
+
+    def merge(self, other):
+        r"""
+        Adds the counts of another histogram with the same bins to this one
+        """
+        if not np.array_equal(self.edges, other.edges):
+            raise Exception('Histograms must have the same bins to be merged')
+        self.counts += other.counts
+        return self
+
+    def __iadd__(self, other):
+        return self.merge(other)
+
+    def histogram(self, density=True):
+        r"""
+        Returns the accumulated histogram as a tuple of the bin values and
+        the bin edges, as returned by ``numpy.histogram``
+        """
+        values = self.counts
+        if density:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values = values / values.sum() / np.diff(self.edges)
+        return values, self.edges
+
+
+def _histogram_of_image(im, bins, log=False, scale=1, mask=None,
+                        slab_thickness=None):
+    r"""
+    Finds the histogram of the non-zero values of an image, processing it
+    one slab at a time along the first axis
+
+    When ``bins`` is an int, a first pass over the slabs finds the extent of
+    the values so that the bins are identical to those chosen by
+    ``numpy.histogram``.  Voxels where ``mask`` is ``True`` are ignored.
+    """
+    if slab_thickness is None:
+        slab_thickness = max(1, 2**24 // max(1, int(np.prod(im.shape[1:]))))
+    starts = range(0, max(im.shape[0], 1), slab_thickness)
+
+    def values(start):
+        slab = np.asarray(im[start:start + slab_thickness])
+        keep = slab > 0
+        if mask is not None:
+            keep &= ~np.asarray(mask[start:start + slab_thickness])
+        x = slab[keep] * scale
+        return np.log10(x) if log else x
+
+    if np.ndim(bins) == 0:
+        lo, hi = np.inf, -np.inf
+        for start in starts:
+            x = values(start)
+            if x.size > 0:
+                lo, hi = min(lo, x.min()), max(hi, x.max())
+        if lo > hi:
+            lo, hi = 0, 1
+        bins = np.histogram_bin_edges(np.array([lo, hi]), bins=int(bins))
+    hist = StreamingHistogram(bins=bins)
+    for start in starts:
+        hist.add(values(start))
+    return hist
@@ -12,38 +12,54 @@ functions can be applied directly to the binary image.
 
 .. autosummary::
 
+    porespy.metrics.StreamingHistogram
     porespy.metrics.chord_counts
     porespy.metrics.chord_length_distribution
+    porespy.metrics.correlation_functions
     porespy.metrics.lineal_path_distribution
     porespy.metrics.mesh_surface_area
+    porespy.metrics.minkowski_functionals
+    porespy.metrics.minkowski_histogram
     porespy.metrics.phase_fraction
+    porespy.metrics.phase_statistics
     porespy.metrics.pore_size_distribution
     porespy.metrics.porosity
     porespy.metrics.porosity_profile
     porespy.metrics.prop_to_image
     porespy.metrics.props_to_DataFrame
     porespy.metrics.radial_density_distribution
+    porespy.metrics.region_areas
     porespy.metrics.region_interface_areas
     porespy.metrics.region_surface_areas
     porespy.metrics.regionprops_3D
+    porespy.metrics.regions_to_DataFrame
     porespy.metrics.representative_elementary_volume
     porespy.metrics.two_point_correlation_bf
     porespy.metrics.two_point_correlation_fft
 
+.. autoclass:: StreamingHistogram
+    :members:
+
 .. autofunction:: chord_counts
 .. autofunction:: chord_length_distribution
+.. autofunction:: correlation_functions
 .. autofunction:: lineal_path_distribution
 .. autofunction:: mesh_surface_area
+.. autofunction:: minkowski_functionals
+.. autofunction:: minkowski_histogram
 .. autofunction:: phase_fraction
+.. autofunction:: phase_statistics
 .. autofunction:: pore_size_distribution
 .. autofunction:: porosity
 .. autofunction:: porosity_profile
 .. autofunction:: prop_to_image
 .. autofunction:: props_to_DataFrame
 .. autofunction:: radial_density_distribution
+.. autofunction:: region_areas
 .. autofunction:: region_interface_areas
 .. autofunction:: region_surface_areas
 .. autofunction:: regionprops_3D
+.. autofunction:: regions_to_DataFrame
 .. autofunction:: representative_elementary_volume
 .. autofunction:: two_point_correlation_bf
 .. autofunction:: two_point_correlation_fft
@@ -53,6 +69,7 @@ functions can be applied directly to the binary image.
 from .__regionprops__ import regionprops_3D
 from .__regionprops__ import props_to_DataFrame
 from .__regionprops__ import prop_to_image
+from .__regionprops__ import regions_to_DataFrame
 from .__funcs__ import chord_counts
 from .__funcs__ import chord_length_distribution
 from .__funcs__ import lineal_path_distribution
@@ -65,5 +82,11 @@ from .__funcs__ import two_point_correlation_bf
 from .__funcs__ import two_point_correlation_fft
 from .__funcs__ import region_surface_areas
 from .__funcs__ import region_interface_areas
+from .__funcs__ import region_areas
 from .__funcs__ import mesh_surface_area
 from .__funcs__ import phase_fraction
+from .__funcs__ import phase_statistics
+from .__correlations__ import correlation_functions
+from .__minkowski__ import minkowski_functionals
+from .__minkowski__ import minkowski_histogram
+from .__histogram__ import StreamingHistogram
@@ -0,0 +1,291 @@
+import numpy as np
+from numba import njit, prange
+from functools import lru_cache
+from itertools import combinations
+from collections import namedtuple
+from porespy import settings
+
+
+def minkowski_histogram(im, boundary=(True, True), nlabels=None):
+    r"""
+    Counts the occurrences of each configuration of 2x2(x2) voxels in an
+    image, for each phase or region
+
+    Parameters
+    ----------
+    im : ND-array
+        A boolean image of the phase of interest, or an image of labelled
+        regions with 0 indicating the background.
+    boundary : tuple of bool
+        Indicates whether the start and the end of the image along the first
+        axis are the true boundaries of the volume, beyond which is
+        background.  When computing the histogram of a large volume in slabs
+        along the first axis, each slab must overlap the next one by a single
+        voxel, and ``boundary`` must be ``(True, False)`` for the first slab,
+        ``(False, False)`` for interior slabs and ``(False, True)`` for the
+        last.  The histograms of all slabs can then be summed to give exactly
+        the histogram of the whole volume.
+    nlabels : int
+        The number of labels in the image.  The default is the maximum value
+        found in ``im``, but this should be given when summing the histograms
+        of slabs so that they all have the same size.  It may not be less
+        than the maximum value found in ``im``.
+
+    Returns
+    -------
+    hist : ND-array
+        An array with one row per label, offset by 1 so that the
+        configurations of region 1 are in row 0, and one column per
+        configuration (16 in 2D and 256 in 3D).  Boolean images give a single
+        row.
+
+    See Also
+    --------
+    minkowski_functionals
+
+    Notes
+    -----
+    The image is scanned in a single parallel pass over all cells formed by
+    2x2(x2) neighboring voxels, including the cells straddling the edge of
+    the image, where voxels outside the image are treated as background.
+    For each region present in a cell, the voxels belonging to it define a
+    configuration which is counted.  Each thread counts into its own
+    histogram, so fewer threads are used for images with very many labels
+    to bound the memory used.
+
+    """
+    if im.ndim not in [2, 3]:
+        raise Exception('Only 2D and 3D images are supported')
+    if im.dtype == bool:
+        im = im.view(np.uint8)
+        nlabels = 1
+    if im.min(initial=0) < 0:
+        raise Exception('The image may not contain negative labels')
+    if nlabels is None:
+        nlabels = int(im.max(initial=0))
+    elif nlabels < im.max(initial=0):
+        raise Exception('nlabels is less than the largest label in the image')
+    corners = _minkowski_tables(im.ndim)[0]
+    zlo = -1 if im.ndim == 3 else 0
+    im = im if im.ndim == 3 else im[..., np.newaxis]
+    x0 = -1 if boundary[0] else 0
+    x1 = im.shape[0] if boundary[1] else im.shape[0] - 1
+    # Each thread fills its own histogram, so limit the number of threads
+    # to keep their total size under 2**24 counts when there are many labels
+    nchunks = min(settings.ncores, x1 - x0,
+                  2**24 // max(1, nlabels * 2**corners.shape[0]))
+    nchunks = max(1, nchunks)
+    hist = _minkowski_hist(im, corners, x0, x1, zlo, nlabels, nchunks)
+    return hist
+
+
+def minkowski_functionals(im=None, voxel_size=1, connectivity=None,
+                          hist=None):
+    r"""
+    Computes the Minkowski functionals of each phase or region in an image,
+    namely volume, surface area, integral of mean curvature and Euler
+    characteristic
+
+    Parameters
+    ----------
+    im : ND-array
+        A boolean image of the phase of interest, or an image of labelled
+        regions with 0 indicating the background.  Not needed if ``hist`` is
+        given.
+    voxel_size : scalar
+        The resolution of the image, expressed as the length of one side of a
+        voxel.  The default is 1.
+    connectivity : int
+        The connectivity of the phase used to find the Euler characteristic,
+        either 6 or 26 in 3D, and 4 or 8 in 2D.  The default is the highest,
+        as in ``skimage.measure.euler_number``.
+    hist : ND-array
+        The configuration histogram produced by ``minkowski_histogram``, for
+        instance after summing the histograms of several slabs of a large
+        volume.  If given then ``im`` is not used.
+
+    Returns
+    -------
+    result : named_tuple
+        A named-tuple containing ``volume``, ``surface_area``,
+        ``mean_curvature`` and ``euler``.  For labelled images, each is an
+        array with one element per label, offset by 1 as in the histogram.
+        For boolean images each is a scalar.  In 2D, these are the area,
+        the perimeter, ``None`` and the Euler characteristic respectively.
+
+    See Also
+    --------
+    minkowski_histogram
+
+    Notes
+    -----
+    Following Ohser and Mücklich [1], each functional is a weighted sum over
+    the configuration histogram, with the weights of each configuration
+    found once and cached.  The volume is the fraction of each cell which is
+    occupied.  The surface area is found from the number of transitions
+    between the phase and the background along the 13 directions in a cell
+    (4 in 2D), and the integral of mean curvature from the Euler
+    characteristic of the intersections of the phase with the planes
+    perpendicular to these directions, both using Crofton's formula.  The
+    Euler characteristic is found from the number of vertices, edges, faces
+    and cubes of the phase.  Dividing the Euler characteristic by the volume
+    gives the connectivity density.
+
+    The surface area and mean curvature are unbiased estimates for smooth
+    surfaces, so are lower than the area of the triangulated surface found
+    by ``mesh_surface_area``.
+
+    References
+    ----------
+    [1] Ohser J, Mücklich F. Statistical Analysis of Microstructures in
+    Materials Science. Wiley (2000)
+
+    Examples
+    --------
+    >>> import porespy as ps
+    >>> im = ps.tools.ps_ball(10)
+    >>> mf = ps.metrics.minkowski_functionals(im)
+    >>> print(mf.euler)
+    1.0
+
+    """
+    if hist is None:
+        hist = minkowski_histogram(im)
+    ndim = {16: 2, 256: 3}[hist.shape[1]]
+    if connectivity is None:
+        connectivity = {2: 8, 3: 26}[ndim]
+    if connectivity not in {2: [4, 8], 3: [6, 26]}[ndim]:
+        raise Exception('Unsupported connectivity: ' + str(connectivity))
+    corners, vol, area, curv, euler = _minkowski_tables(ndim)
+    if connectivity in [8, 26]:
+        # The phase connected with high connectivity is the complement of
+        # the background connected with low connectivity, which has the
+        # opposite sign in 2D
+        euler = euler[::-1] * (1 if ndim == 3 else -1)
+    hist = np.asarray(hist, dtype=float)
+    result = [hist @ vol * voxel_size**ndim,
+              hist @ area * voxel_size**(ndim - 1),
+              hist @ curv * voxel_size if ndim == 3 else None,
+              hist @ euler]
+    if (im is not None) and (im.dtype == bool):
+        result = [r if r is None else r[0] for r in result]
+    mf = namedtuple('minkowski_functionals',
+                    ('volume', 'surface_area', 'mean_curvature', 'euler'))
+    return mf(*result)
+
+
+@lru_cache(maxsize=2)
+def _minkowski_tables(ndim):
+    r"""
+    Computes the contribution of each configuration of a cell to the
+    volume, surface area, integral of mean curvature and Euler
+    characteristic, along with the corner offsets of a cell
+    """
+    nc = 2**ndim
+    corners = np.zeros((nc, 3), dtype=np.int64)
+    for k in range(nc):
+        corners[k, :ndim] = [(k >> (ndim - 1 - i)) & 1 for i in range(ndim)]
+    pts = corners[:, :ndim]
+    configs = np.array([[(c >> k) & 1 for k in range(nc)]
+                        for c in range(2**nc)], dtype=bool)
+    # Directions within a cell, their share of the unit sphere (or circle),
+    # and the number of cells sharing each segment along them
+    if ndim == 3:
+        dirs = [d for d in np.array(list(np.ndindex(3, 3, 3))) - 1
+                if tuple(d) > (0, 0, 0)]
+        frac = {1: 0.04577789120476, 2: 0.03698062787608,
+                3: 0.03519563978232}
+        crofton = 2.0
+    else:
+        dirs = [d for d in np.array(list(np.ndindex(3, 3))) - 1
+                if tuple(d) > (0, 0)]
+        frac = {1: 0.125, 2: 0.125}
+        crofton = np.pi / 2
+    vol = configs.sum(axis=1) / nc
+    area = np.zeros(2**nc)
+    curv = np.zeros(2**nc)
+    for d in dirs:
+        n2 = int((d**2).sum())
+        weight = 2 * frac[n2]
+        share = 2**(ndim - n2)
+        pairs = [(a, b) for a, b in combinations(range(nc), 2)
+                 if np.all(pts[b] - pts[a] == d)
+                 or np.all(pts[b] - pts[a] == -d)]
+        for a, b in pairs:
+            area += (configs[:, a] != configs[:, b]) * weight / share \
+                / np.sqrt(n2)
+        if ndim == 3:
+            # Euler characteristic of the sections perpendicular to d
+            proj = pts @ d
+            for val in np.unique(proj):
+                poly = np.where(proj == val)[0]
+                if poly.size < 3:
+                    continue
+                lengths = [((pts[a] - pts[b])**2).sum()
+                           for a, b in combinations(poly, 2)]
+                sides = [pair for pair, L in
+                         zip(combinations(poly, 2), lengths)
+                         if (poly.size == 3) or (L < max(lengths))]
+                nv = configs[:, poly].sum(axis=1)
+                ne = np.sum([configs[:, a] * configs[:, b]
+                             for a, b in sides], axis=0)
+                nf = np.all(configs[:, poly], axis=1)
+                chi = nv / (6 if poly.size == 3 else 4) - ne / 2 + nf
+                on_face = 0.5 if n2 == 1 else 1.0
+                curv += 2 * np.pi * weight * chi * on_face / np.sqrt(n2)
+    area = area * crofton
+    # Euler characteristic from the vertices, edges, faces and cubes
+    euler = configs.sum(axis=1) / nc
+    for sub in range(1, 2**ndim):
+        # Each subset of axes defines a type of face of the cell
+        axes = [i for i in range(ndim) if (sub >> i) & 1]
+        groups = {}
+        for k in range(nc):
+            key = tuple(pts[k, i] for i in range(ndim) if i not in axes)
+            groups.setdefault(key, []).append(k)
+        dim = len(axes)
+        for g in groups.values():
+            euler += (-1)**dim * np.all(configs[:, g], axis=1) \
+                / 2**(ndim - dim)
+    return corners, vol, area, curv, euler
+
+
+@njit(parallel=True)
+def _minkowski_hist(im, corners, x0, x1, zlo, nlabels, nchunks):  # pragma: no cover
+    Nx, Ny, Nz = im.shape
+    nc = corners.shape[0]
+    hist = np.zeros((nchunks, nlabels, 2**nc), dtype=np.int64)
+    nx = x1 - x0
+    for t in prange(nchunks):
+        lab = np.zeros(nc, dtype=im.dtype)
+        for x in range(x0 + t * nx // nchunks, x0 + (t + 1) * nx // nchunks):
+            for y in range(-1, Ny):
+                for z in range(zlo, Nz):
+                    for c in range(nc):
+                        i = x + corners[c, 0]
+                        j = y + corners[c, 1]
+                        k = z + corners[c, 2]
+                        if (i < 0) or (j < 0) or (k < 0) or (i >= Nx) \
+                                or (j >= Ny) or (k >= Nz):
+                            lab[c] = 0
+                        else:
+                            lab[c] = im[i, j, k]
+                    for c in range(nc):
+                        v = lab[c]
+                        if v == 0:
+                            continue
+                        seen = False
+                        for e in range(c):
+                            if lab[e] == v:
+                                seen = True
+                                break
+                        if seen:
+                            continue
+                        cfg = 0
+                        for e in range(c, nc):
+                            if lab[e] == v:
+                                cfg |= 1 << e
+                        hist[t, v - 1, cfg] += 1
+    if nchunks == 1:
+        return hist[0]
+    return hist.sum(axis=0)
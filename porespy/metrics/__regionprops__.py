@@ -1,6 +1,9 @@
+import dask
 import numpy as np
+from functools import wraps
 import scipy.ndimage as spim
-from porespy.tools import extract_subsection, bbox_to_slices
+from porespy import settings
+from porespy.tools import extract_subsection, bbox_to_slices, map_labels
 from skimage.measure import mesh_surface_area
 try:
     from skimage.measure import marching_cubes
@@ -13,7 +16,7 @@ from pandas import DataFrame
 from edt import edt
 
 
-def props_to_DataFrame(regionprops):
+def props_to_DataFrame(regionprops, props=None):
     r"""
     Returns a Pandas DataFrame containing all the scalar metrics for each
     region, such as volume, sphericity, and so on, calculated by
@@ -26,6 +29,11 @@ def props_to_DataFrame(regionprops):
         by ``regionprops_3D``.  Because ``regionprops_3D`` returns data in
         the same ``list`` format as the ``regionprops`` function in **Skimage**
         you can pass in either.
+    props : list of strings
+        The scalar properties to include in the DataFrame.  If not given, all
+        scalar properties are found by evaluating every property of the first
+        region, which can be slow since some properties such as 'skeleton'
+        are expensive.
 
     Returns
     -------
@@ -44,7 +52,7 @@ def props_to_DataFrame(regionprops):
     # Parse the regionprops list and pull out all props with scalar values
     metrics = []
     reg = regionprops[0]
-    for item in reg.__dir__():
+    for item in (reg.__dir__() if props is None else props):
         if not item.startswith('_'):
             try:
                 if np.shape(getattr(reg, item)) == ():
@@ -66,6 +74,188 @@ def props_to_DataFrame(regionprops):
     return df
 
 
+def regions_to_DataFrame(regions, props=None):
+    r"""
+    Computes the requested properties of all labeled regions in an image at
+    once and returns them as a Pandas DataFrame
+
+    Parameters
+    ----------
+    regions : ND-array
+        An image containing labeled regions, with 0 indicating background.
+    props : list of strings
+        The properties to compute.  The following are computed for all
+        regions at once using label-wise reductions:
+
+        'label', 'volume', 'bbox', 'bbox_volume', 'extent', 'centroid',
+        'equivalent_diameter', 'inertia_tensor', 'inertia_tensor_eigvals',
+        'major_axis_length', 'minor_axis_length', 'surface_area',
+        'sphericity', and 'euler_number'.
+
+        Any other property of ``regionprops_3D`` can also be requested, in
+        which case it is computed region by region in parallel.  The default
+        is ``['label', 'volume', 'bbox_volume', 'extent', 'centroid',
+        'equivalent_diameter', 'surface_area', 'sphericity']``.
+
+    Returns
+    -------
+    DataFrame : Pandas DataFrame
+        A DataFrame with one row for each label present in ``regions`` and
+        one column for each scalar property.  Properties with several values
+        per region are split into several columns with the index appended,
+        such as 'centroid-0', 'centroid-1', and so on.
+
+    See Also
+    --------
+    props_to_DataFrame
+    regionprops_3D
+
+    Notes
+    -----
+    The moments of all regions are found with ``np.bincount`` and the
+    bounding boxes with ``scipy.ndimage.find_objects``, so no per-region
+    objects are created.  The surface area is found for all regions in a
+    single sweep by ``porespy.metrics.region_areas``, so differs slightly
+    from the 'surface_area' of ``regionprops_3D`` which meshes each region
+    separately.  The Euler number is found by
+    ``porespy.metrics.minkowski_functionals``.
+
+    Examples
+    --------
+    >>> import porespy as ps
+    >>> import scipy.ndimage as spim
+    >>> im = ps.generators.blobs(shape=[50, 50, 50])
+    >>> regions = spim.label(im)[0]
+    >>> df = ps.metrics.regions_to_DataFrame(regions, props=['volume', 'centroid'])
+    >>> columns = list(df.columns)
+
+    """
+    from .__funcs__ import region_areas
+    from .__minkowski__ import minkowski_functionals
+    if props is None:
+        props = ['label', 'volume', 'bbox_volume', 'extent', 'centroid',
+                 'equivalent_diameter', 'surface_area', 'sphericity']
+    ndim = regions.ndim
+    slices = spim.find_objects(regions)
+    labels = np.array([i + 1 for i, s in enumerate(slices) if s is not None],
+                      dtype=int)
+    if labels.size == 0:
+        return DataFrame()
+    slices = [slices[i - 1] for i in labels]
+    flat = regions.ravel()
+    n = labels.max() + 1
+    cache = {}
+
+    def offset(a):
+        # The coordinate along axis a of each voxel relative to the start of
+        # the bounding box of its label
+        start = np.zeros(n)
+        start[labels] = get('bbox')[:, a]
+        crds = np.arange(regions.shape[a]).reshape(
+            [-1 if i == a else 1 for i in range(ndim)])
+        return (crds - start[regions]).ravel()
+
+    def get(p):
+        if p in cache:
+            return cache[p]
+        if p == 'label':
+            val = labels
+        elif p == 'volume':
+            val = np.bincount(flat, minlength=n)[labels]
+        elif p == 'bbox':
+            val = np.array([[s.start for s in sl] + [s.stop for s in sl]
+                            for sl in slices])
+        elif p == 'bbox_volume':
+            bbox = get('bbox')
+            val = np.prod(bbox[:, ndim:] - bbox[:, :ndim], axis=1)
+        elif p == 'extent':
+            val = get('volume') / get('bbox_volume')
+        elif p == 'equivalent_diameter':
+            val = (2 * ndim * get('volume') / np.pi)**(1 / ndim)
+        elif p == '_m1':
+            # Sums of the coordinates of each label, relative to the start
+            # of each bounding box for precision, one axis at a time
+            if any(q in props for q in _second_moment_props):
+                return get('_m2')[0]
+            val = np.zeros([labels.size, ndim])
+            for a in range(ndim):
+                val[:, a] = np.bincount(flat, weights=offset(a),
+                                        minlength=n)[labels]
+        elif p == '_m2':
+            # Sums of the coordinates and their products for each label,
+            # finding the offsets along each axis only once
+            x = [offset(a) for a in range(ndim)]
+            m1, m2 = np.zeros([labels.size, ndim]), {}
+            for a in range(ndim):
+                m1[:, a] = np.bincount(flat, weights=x[a], minlength=n)[labels]
+                for b in range(a, ndim):
+                    m2[(a, b)] = np.bincount(flat, weights=x[a]*x[b],
+                                             minlength=n)[labels]
+            cache['_m1'] = m1
+            val = (m1, m2)
+        elif p == 'centroid':
+            start = get('bbox')[:, :ndim]
+            val = start + get('_m1') / get('volume')[:, None]
+        elif p == 'inertia_tensor':
+            m1, m2 = get('_m2')
+            vol = get('volume')
+            mean = m1 / vol[:, None]
+            cov = np.zeros([labels.size, ndim, ndim])
+            for (a, b), m in m2.items():
+                cov[:, a, b] = m / vol - mean[:, a] * mean[:, b]
+                cov[:, b, a] = cov[:, a, b]
+            trace = np.trace(cov, axis1=1, axis2=2)
+            val = trace[:, None, None] * np.eye(ndim) - cov
+        elif p == 'inertia_tensor_eigvals':
+            ev = np.linalg.eigvalsh(get('inertia_tensor'))[:, ::-1]
+            val = np.clip(ev, 0, None)
+        elif p in ['major_axis_length', 'minor_axis_length']:
+            ev = get('inertia_tensor_eigvals')
+            if ndim == 2:
+                val = 4 * np.sqrt(ev[:, 0 if p[:5] == 'major' else -1])
+            elif p[:5] == 'major':
+                val = np.sqrt(10 * (ev[:, 0] + ev[:, 1] - ev[:, 2]))
+            else:
+                val = np.sqrt(10 * (-ev[:, 0] + ev[:, 1] + ev[:, 2]))
+        elif p == 'surface_area':
+            val = region_areas(regions).surface_area[labels - 1]
+        elif p == 'sphericity':
+            r = (3 / 4 / np.pi * get('volume'))**(1 / 3)
+            val = 4 * np.pi * r**2 / get('surface_area')
+        elif p == 'euler_number':
+            val = minkowski_functionals(regions).euler[labels - 1]
+        else:
+            others = [q for q in props if q not in _vectorized_props]
+            rp = regionprops_3D(regions, props=others)
+            for q in others:
+                cache[q] = np.array([r[q] for r in rp])
+            val = cache[p]
+        cache[p] = val
+        return val
+
+    d = {}
+    for p in props:
+        val = np.asarray(get(p))
+        if val.ndim == 1:
+            d[p] = val
+        else:
+            val = val.reshape(val.shape[0], -1)
+            for i in range(val.shape[1]):
+                d[p + '-' + str(i)] = val[:, i]
+    df = DataFrame(d)
+    return df
+
+
+_vectorized_props = ['label', 'volume', 'bbox', 'bbox_volume', 'extent',
+                     'equivalent_diameter', 'centroid', 'inertia_tensor',
+                     'inertia_tensor_eigvals', 'major_axis_length',
+                     'minor_axis_length', 'surface_area', 'sphericity',
+                     'euler_number']
+
+_second_moment_props = ['inertia_tensor', 'inertia_tensor_eigvals',
+                        'major_axis_length', 'minor_axis_length']
+
+
 def prop_to_image(regionprops, shape, prop):
     r"""
     Creates an image with each region colored according the specified ``prop``,
@@ -95,7 +285,22 @@ def prop_to_image(regionprops, shape, prop):
     props_to_DataFrame
     regionprops_3d
 
+    Notes
+    -----
+    If ``prop`` is a scalar and all the regions were found from the same
+    label image, as is the case for the output of ``regionprops_3D`` or
+    Skimage's ``regionprops``, the image is created by filling a lookup table
+    indexed by label and mapping it onto the label image in a single pass
+    using ``porespy.tools.map_labels``.
+
     """
+    labels = _common_label_image(regionprops, shape)
+    if (labels is not None) and (prop != 'convex'):
+        values = [r[prop] for r in regionprops]
+        if all([np.ndim(v) == 0 for v in values]):
+            lut = np.zeros(labels.max() + 1)
+            lut[[r.label for r in regionprops]] = values
+            return map_labels(labels, lut, dtype=float)
     im = np.zeros(shape=shape)
     for r in regionprops:
         if prop == 'convex':
@@ -108,7 +313,23 @@ def prop_to_image(regionprops, shape, prop):
     return im
 
 
-def regionprops_3D(im):
+def _common_label_image(regionprops, shape):
+    r"""
+    Returns the label image from which all the given regions were found, or
+    ``None`` if they do not share one of the given shape
+    """
+    if len(regionprops) == 0:
+        return None
+    labels = getattr(regionprops[0], '_label_image', None)
+    if (labels is None) or (labels.shape != tuple(shape)):
+        return None
+    for r in regionprops:
+        if getattr(r, '_label_image', None) is not labels:
+            return None
+    return labels
+
+
+def regionprops_3D(im, props=None, cores=None):
     r"""
     Calculates various metrics for each labeled region in a 3D image.
 
@@ -122,6 +343,14 @@ def regionprops_3D(im):
         An imaging containing at least one labeled region.  If a boolean image
         is received than the ``True`` voxels are treated as a single region
         labeled ``1``.  Regions labeled 0 are ignored in all cases.
+    props : list of strings
+        The properties to evaluate for all regions immediately, in parallel.
+        If not given (default) then all properties are evaluated lazily when
+        first accessed.  In both cases each value is cached after being
+        computed.
+    cores : int
+        The number of threads used to evaluate ``props``.  The default is
+        the value of ``porespy.settings.ncores``.
 
     Returns
     -------
@@ -176,6 +405,12 @@ def regionprops_3D(im):
     tricky to obtain desired results.  *PoreSpy* includes the SNOW algorithm,
     which may be helpful.
 
+    When ``props`` is given, the regions are split into batches which are
+    evaluated in a pool of threads, so no worker processes are started and
+    the image is not copied.  The distance transforms and marching cubes
+    that dominate the cost release the GIL.  The results are stored in the
+    cache of each region.
+
     """
     results = regionprops(im)
     for i, obj in enumerate(results):
@@ -186,10 +421,54 @@ def regionprops_3D(im):
                                a._intensity_image,
                                a._cache_active)
         results[i] = b
-
+    if props is not None:
+        _evaluate_props(results, props=props, cores=cores)
     return results
 
 
+def _evaluate_props(regions, props, cores=None):
+    r"""
+    Evaluates the given properties of all regions in a pool of threads,
+    which stores the values in the cache of each region
+    """
+    cores = settings.ncores if cores is None else cores
+    nbatches = min(len(regions), 4 * cores)
+    if nbatches == 0:
+        return
+    batches = np.array_split(np.arange(len(regions)), nbatches)
+    tasks = []
+    for batch in batches:
+        batch = [regions[i] for i in batch]
+        tasks.append(dask.delayed(_region_props_batch)(batch, props))
+    if cores > 1:
+        dask.compute(*tasks, scheduler='threads', num_workers=cores)
+    else:
+        dask.compute(*tasks, scheduler='synchronous')
+
+
+def _region_props_batch(regions, props):
+    r"""
+    Computes the given properties of each region, caching their values
+    """
+    for r in regions:
+        for p in props:
+            getattr(r, p)
+
+
+def _cached(f):
+    r"""
+    Decorates a property so its value is stored in the ``_cache`` of the
+    region and only computed once
+    """
+    @wraps(f)
+    def wrapper(self):
+        name = f.__name__
+        if name not in self._cache:
+            self._cache[name] = f(self)
+        return self._cache[name]
+    return wrapper
+
+
 class RegionPropertiesPS(RegionProperties):
 
     @property
@@ -205,15 +484,18 @@ class RegionPropertiesPS(RegionProperties):
         return self.area
 
     @property
+    @_cached
     def bbox_volume(self):
         mask = self.mask
         return np.prod(mask.shape)
 
     @property
+    @_cached
     def border(self):
         return self.dt == 1
 
     @property
+    @_cached
     def dt(self):
         mask = self.mask
         mask_padded = np.pad(mask, pad_width=1, mode='constant')
@@ -221,6 +503,7 @@ class RegionPropertiesPS(RegionProperties):
         return extract_subsection(temp, shape=mask.shape)
 
     @property
+    @_cached
     def inscribed_sphere(self):
         dt = self.dt
         r = dt.max()
@@ -228,6 +511,7 @@ class RegionPropertiesPS(RegionProperties):
         return inv_dt < r
 
     @property
+    @_cached
     def sphericity(self):
         vol = self.volume
         r = (3 / 4 / np.pi * vol)**(1 / 3)
@@ -236,32 +520,37 @@ class RegionPropertiesPS(RegionProperties):
         return a_equiv / a_region
 
     @property
+    @_cached
     def skeleton(self):
         return skeletonize_3d(self.mask)
 
     @property
+    @_cached
     def surface_area(self):
         mask = self.mask
         tmp = np.pad(np.atleast_3d(mask), pad_width=1, mode='constant')
         tmp = spim.convolve(tmp, weights=ball(1)) / 5
         verts, faces, norms, vals = marching_cubes(volume=tmp, level=0)
-        self._surface_mesh_vertices = verts
-        self._surface_mesh_simplices = faces
+        self._cache['surface_mesh_vertices'] = verts
+        self._cache['surface_mesh_simplices'] = faces
         area = mesh_surface_area(verts, faces)
         return area
 
     @property
     def surface_mesh_vertices(self):
-        if not hasattr(self, '_surface_mesh_vertices'):
+        if 'surface_mesh_vertices' not in self._cache:
+            self._cache.pop('surface_area', None)
             _ = self.surface_area
-        return self._surface_mesh_vertices
+        return self._cache['surface_mesh_vertices']
 
     @property
     def surface_mesh_simplices(self):
-        if not hasattr(self, '_surface_mesh_simplices'):
+        if 'surface_mesh_simplices' not in self._cache:
+            self._cache.pop('surface_area', None)
             _ = self.surface_area
-        return self._surface_mesh_simplices
+        return self._cache['surface_mesh_simplices']
 
     @property
+    @_cached
     def convex_volume(self):
         return self.convex_area
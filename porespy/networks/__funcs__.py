@@ -1,18 +1,20 @@
 import numpy as np
-import openpnm as op
+import dask.array as da
+from numba import njit, prange
+from functools import lru_cache
 from porespy.tools import make_contiguous
 from skimage.segmentation import find_boundaries
-from skimage.morphology import ball, cube
 from skimage.segmentation import relabel_sequential
-from porespy.tools import _create_alias_map, overlay
-from porespy.tools import insert_cylinder
+from porespy.tools import _create_alias_map
+from porespy.tools.__funcs__ import _find_cylinder_tiles, _segment_dist2
+from porespy.tools.__funcs__ import _get_sphere_template
 from porespy.tools import zero_corners
-from porespy import settings
-from porespy.tools import get_tqdm
-tqdm = get_tqdm()
+from porespy.tools import map_labels
+from porespy.metrics import region_areas
+from collections import namedtuple
 
 
-def map_to_regions(regions, values):
+def map_to_regions(regions, values, out=None, dtype=None):
     r"""
     Maps pore values from a network onto the image from which it was extracted
 
@@ -30,6 +32,18 @@ def map_to_regions(regions, values):
         ``regions`` is *n+1*.  This mis-match is caused by the fact that 0's
         in the ``regions`` image is assumed to be the backgroung phase, while
         pore index 0 is valid.
+    out : ND-array, optional
+        An array the same shape as ``regions`` into which the values are
+        written in place, such as when mapping several pore properties in
+        turn.
+    dtype : data-type, optional
+        The data type of the returned image.  The default is the type of
+        ``out`` if given, or else the type of ``values``.
+
+    Returns
+    -------
+    image : ND-array
+        An image with each region filled with its value.
 
     Notes
     -----
@@ -41,8 +55,7 @@ def map_to_regions(regions, values):
     values = np.array(values).flatten()
     if np.size(values) != regions.max() + 1:
         raise Exception('Number of values does not match number of regions')
-    im = np.zeros_like(regions)
-    im = values[regions]
+    im = map_labels(regions, values, out=out, dtype=dtype)
     return im
 
 
@@ -140,7 +153,134 @@ def add_boundary_regions(regions=None, faces=['front', 'back', 'left',
     return regions
 
 
-def _generate_voxel_image(network, pore_shape, throat_shape, max_dim=200):
+_face_axes = {'left': (0, 0), 'right': (0, -1), 'front': (1, 0),
+              'back': (1, -1), 'bottom': (2, 0), 'top': (2, -1)}
+
+
+def _boundary_face_labels(regions, faces):
+    r"""
+    Finds which voxels of each face slice of ``regions`` are kept in the
+    boundary regions added by ``add_boundary_regions``, without padding the
+    image
+
+    Only the layers which ``add_boundary_regions`` adds on each face are
+    built, each padded along the other axes in the same way as the image.
+    These layers are then labeled and trimmed by the same steps, with the
+    lines shared by two layers kept equal, so the result is the same as
+    slicing the padded image.
+
+    Returns a list containing the axis, the side (0 or -1) and the face slice
+    of ``regions`` with the removed voxels set to 0, for each face.
+    """
+    if regions.ndim not in [2, 3]:
+        raise Exception("add_boundary_regions works only on 2D and 3D images")
+    if regions.ndim == 2:
+        if set(["bottom", "top"]).intersection(faces):
+            raise Exception("For 2D images, use 'left', 'right', 'front', 'back' labels")
+    ndim = regions.ndim
+    faces = [_face_axes[face] for face in faces]
+    pad_width = [[0, 0] for i in range(ndim)]
+    for axis, side in faces:
+        pad_width[axis][side] = 1
+    layers = []
+    for axis, side in faces:
+        pw = [p for i, p in enumerate(pad_width) if i != axis]
+        layers.append(np.pad(np.take(regions, side, axis=axis), pw,
+                             mode="edge"))
+
+    def share_lines(k):
+        a, sa = faces[k]
+        for g, (b, sb) in enumerate(faces):
+            if a != b:
+                line_k = [slice(None)]*(ndim - 1)
+                line_k[b - (b > a)] = sb
+                line_g = [slice(None)]*(ndim - 1)
+                line_g[a - (a > b)] = sa
+                layers[g][tuple(line_g)] = layers[k][tuple(line_k)]
+
+    top = regions.max() if regions.size > 0 else 0
+    for k, layer in enumerate(layers):
+        non_background = layer != 0
+        layer[non_background] += max([top] + [a.max() for a in layers])
+        share_lines(k)
+    for k, layer in enumerate(layers):
+        layer *= ~find_boundaries(layer, mode="outer")
+        share_lines(k)
+    result = []
+    for (axis, side), layer in zip(faces, layers):
+        pw = [p for i, p in enumerate(pad_width) if i != axis]
+        s = tuple(slice(p[0], n - p[1]) for p, n in zip(pw, layer.shape))
+        labels = np.take(regions, side, axis=axis)*(layer[s] != 0)
+        result.append((axis, side, labels))
+    return result
+
+
+def _boundary_region_areas(regions, conns, faces, voxel_size=1):
+    r"""
+    Finds the areas of ``region_areas`` for a network extracted from
+    ``regions`` with boundary pores on ``faces``, as if the image had been
+    padded by ``add_boundary_regions``
+
+    The areas of the regions in the image are found from the image itself.
+    Those of the boundary regions on each face are found from a thin block
+    holding their slab, the three layers of the image beneath it, and along
+    its edges the slabs of the neighboring faces, which is all the padded
+    image the marching cubes sweep sees around them.
+    """
+    Np = int(regions.max()) if regions.size > 0 else 0
+    areas = region_areas(regions, voxel_size=voxel_size, conns=conns)
+    if faces is None:
+        return areas
+    ndim = regions.ndim
+    slices = _boundary_face_labels(regions, faces)
+    # Give the boundary regions the labels used by regions_to_network
+    bounds = [Np]
+    labels = []
+    for axis, side, im in slices:
+        lut = np.zeros(Np + 1, dtype=int)
+        parents = np.unique(im[im > 0])
+        lut[parents] = np.arange(bounds[-1] + 1,
+                                 bounds[-1] + parents.size + 1)
+        labels.append(lut[im])
+        bounds.append(bounds[-1] + parents.size)
+    pad_width = [[0, 0] for i in range(ndim)]
+    for axis, side, im in slices:
+        pad_width[axis][side] = 3
+    surface_area = np.zeros(bounds[-1])
+    surface_area[:Np] = areas.surface_area
+    area = np.copy(areas.area)
+    for k, (axis, side, im) in enumerate(slices):
+        pw = [p for i, p in enumerate(pad_width) if i != axis]
+        layers = [np.pad(labels[k], pw, mode='constant')]*3
+        for t in range(3):
+            t = t if side == 0 else -1 - t
+            layer = np.pad(np.take(regions, t, axis=axis), pw,
+                           mode='constant')
+            for g, (b, sb, _) in enumerate(slices):
+                if b == axis:
+                    continue
+                # The row of the slab of face g lying over this layer
+                row = np.take(labels[g], t, axis=axis - (axis > b))
+                b = b - (b > axis)
+                if row.ndim > 0:
+                    row = np.pad(row, [p for i, p in enumerate(pw) if i != b],
+                                 mode='constant')
+                strip = [slice(None)]*(ndim - 1)
+                strip[b] = slice(0, 3) if sb == 0 else slice(-3, None)
+                layer[tuple(strip)] = np.expand_dims(row, b)
+            layers.append(layer)
+        block = np.stack(layers if side == 0 else layers[::-1], axis=axis)
+        lo, hi = bounds[k], bounds[k + 1]
+        Ts = np.flatnonzero((conns[:, 1] >= lo) * (conns[:, 1] < hi))
+        result = region_areas(block, voxel_size=voxel_size, conns=conns[Ts])
+        surface_area[lo:hi] = result.surface_area[lo:hi]
+        area[Ts] = result.area
+    result = namedtuple('region_areas', ('surface_area', 'conns', 'area'))
+    return result(surface_area, areas.conns, area)
+
+
+def _generate_voxel_image(network, pore_shape, throat_shape, max_dim=200,
+                          chunks=None):
     r"""
     Generates a 3d numpy array from a network model.
 
@@ -154,6 +294,9 @@ def _generate_voxel_image(network, pore_shape, throat_shape, max_dim=200):
         Shape of throats in the network, valid choices are "cylinder", "cuboid"
     max_dim : int
         Number of voxels in the largest dimension of the network
+    chunks : int or tuple of ints
+        If given, a ``dask`` array with chunks of this shape is returned, each
+        chunk being voxelized only when it is computed.
 
     Returns
     -------
@@ -166,85 +309,159 @@ def _generate_voxel_image(network, pore_shape, throat_shape, max_dim=200):
     solid phase, pores, and throats respectively.
 
     """
-    xyz = network["pore.coords"]
+    if pore_shape not in ["sphere", "cube"]:
+        raise Exception(f"Unrecognized pore shape: {pore_shape}")
+    if throat_shape == "cuboid":
+        raise Exception("Not yet implemented, try 'cylinder'.")
+    shape, xyz, rp, rt = _voxel_geometry(network, max_dim=max_dim)
     cn = network["throat.conns"]
+    cube = np.full(rp.size, pore_shape == "cube")
+    if chunks is None:
+        im = np.zeros(shape, dtype=np.uint8)
+        return _insert_network(im, np.zeros(3, dtype=int), xyz, rp, cube,
+                               cn, rt)
+    im = da.zeros(shape, chunks=chunks, dtype=np.uint8)
+    return im.map_blocks(_voxelize_chunk, xyz=xyz, rp=rp, cube=cube, cn=cn,
+                         rt=rt, dtype=np.uint8)
 
+
+def _voxel_geometry(network, max_dim):
+    r"""
+    Finds the shape of the voxel image of a network with ``max_dim`` voxels
+    along its largest dimension, and the pore centers, pore radii and throat
+    radii in voxels
+    """
+    xyz = network["pore.coords"]
     # Distance bounding box from the network by a fixed amount
     delta = network["pore.diameter"].mean() / 2
+    import openpnm as op
     if isinstance(network, op.network.Cubic):
         delta = network._spacing.mean() / 2
-
-    # Shift everything to avoid out-of-bounds
-    extra_clearance = int(max_dim * 0.05)
-
     # Transform points to satisfy origin at (0, 0, 0)
-    xyz0 = xyz.min(axis=0) - delta
-    xyz += -xyz0
+    xyz = xyz - (xyz.min(axis=0) - delta)
     res = (xyz.ptp(axis=0).max() + 2 * delta) / max_dim
-    shape = np.rint((xyz.max(axis=0) + delta) / res).astype(
-        int) + 2 * extra_clearance
-
+    shape = np.rint((xyz.max(axis=0) + delta) / res).astype(int)
     # Transforming from real coords to matrix coords
-    xyz = np.rint(xyz / res).astype(int) + extra_clearance
+    xyz = np.rint(xyz / res).astype(int)
     pore_radi = np.rint(network["pore.diameter"] * 0.5 / res).astype(int)
     throat_radi = np.rint(network["throat.diameter"] * 0.5 / res).astype(int)
+    # Throats thinner than a voxel are given the smallest radius which keeps
+    # them 26-connected
+    return shape, xyz, pore_radi, np.maximum(throat_radi, np.sqrt(3)/2)
 
-    im_pores = np.zeros(shape, dtype=np.uint8)
-    im_throats = np.zeros_like(im_pores)
 
+def _voxel_porosity(network, pore_shape, max_dim):
+    r"""
+    Predicts the porosity of the voxel image of a network from the number of
+    voxels in each pore and throat, without generating the image
+
+    Overlaps between pores are ignored, and each throat is taken to span the
+    gap between the surfaces of its pores.
+    """
+    shape, xyz, rp, rt = _voxel_geometry(network, max_dim=max_dim)
+    cn = network["throat.conns"]
     if pore_shape == "cube":
-        pore_elem = cube
-        rp = pore_radi * 2 + 1  # +1 since num_voxel must be odd
-        rp_max = int(2 * round(delta / res)) + 1
-    if pore_shape == "sphere":
-        pore_elem = ball
-        rp = pore_radi
-        rp_max = int(round(delta / res))
-    if throat_shape == "cuboid":
-        raise Exception("Not yet implemented, try 'cylinder'.")
+        vol = (2*rp + 1)**3
+    else:
+        vol = np.array([_lattice_count(r, ndim=3) for r in rp])
+    L = np.linalg.norm(xyz[cn[:, 0]] - xyz[cn[:, 1]], axis=1)
+    L = np.clip(L - rp[cn[:, 0]] - rp[cn[:, 1]] - 1, 0, None)
+    area = np.array([_lattice_count(r, ndim=2) for r in rt])
+    return (vol.sum() + (area*L).sum()) / np.prod(shape)
+
+
+@lru_cache(maxsize=256)
+def _lattice_count(r, ndim):
+    r"""
+    Returns the number of voxels within a distance ``r`` of the center of a
+    disk or sphere
+    """
+    h = _get_sphere_template(r, smooth=False)
+    if ndim == 2:
+        h = h[h.shape[0]//2]
+    return int(np.sum(2*h[h >= 0] + 1))
+
+
+def _voxelize_chunk(block, xyz, rp, cube, cn, rt, block_info=None):
+    r"""
+    Voxelizes the part of a network lying within one chunk of a ``dask``
+    array
+    """
+    offset = [a for a, b in block_info[0]['array-location']]
+    im = np.zeros(block.shape, dtype=np.uint8)
+    return _insert_network(im, np.array(offset), xyz, rp, cube, cn, rt)
 
-    # Generating voxels for pores
-    with tqdm(network.Ps, **settings.tqdm) as pbar:
-        for i, pore in enumerate(network.Ps):
-            pbar.update()
-            elem = pore_elem(rp[i])
-            try:
-                im_pores = overlay(im1=im_pores, im2=elem, c=xyz[i])
-            except ValueError:
-                elem = pore_elem(rp_max)
-                im_pores = overlay(im1=im_pores, im2=elem, c=xyz[i])
-    # Get rid of pore overlaps
-    im_pores[im_pores > 0] = 1
-
-    # Generating voxels for throats
-    with tqdm(network.Ts, **settings.tqdm) as pbar:
-        for i, throat in enumerate(network.Ts):
-            pbar.update()
-            try:
-                im_throats = insert_cylinder(im_throats, r=throat_radi[i],
-                                             xyz0=xyz[cn[i, 0]],
-                                             xyz1=xyz[cn[i, 1]])
-            except ValueError:
-                im_throats = insert_cylinder(im_throats, r=rp_max,
-                                             xyz0=xyz[cn[i, 0]],
-                                             xyz1=xyz[cn[i, 1]])
-    # Get rid of throat overlaps
-    im_throats[im_throats > 0] = 1
-
-    # Subtract pore-throat overlap from throats
-    im_throats = (im_throats.astype(bool) * ~im_pores.astype(bool)).astype(
-        np.uint8)
-    im = im_pores * 1 + im_throats * 2
-
-    return im[extra_clearance:-extra_clearance,
-              extra_clearance:-extra_clearance,
-              extra_clearance:-extra_clearance]
 
+def _insert_network(im, offset, xyz, rp, cube, cn, rt):
+    r"""
+    Inserts the pores of a network as 1s and its throats as 2s into an image
+    whose corner lies at ``offset``, in a single pass over tiles of the image
+
+    Each pore is a sphere, or a cube if ``cube`` is ``True``, and each throat
+    is a cylinder capped by hemispheres, filling only the voxels left empty
+    by the pores.
+    """
+    xyz = xyz - offset
+    a = np.vstack((xyz, xyz[cn[:, 0]])).astype(float)
+    b = np.vstack((xyz, xyz[cn[:, 1]])).astype(float)
+    r = np.concatenate((rp, rt)).astype(float)
+    cube = np.concatenate((cube, np.zeros(rt.size, dtype=bool)))
+    values = np.concatenate((np.ones(rp.size, dtype=np.uint8),
+                             np.full(rt.size, 2, dtype=np.uint8)))
+    shape = np.array(im.shape)
+    # Find the bounding box of each element, clipped to the image
+    lo = np.floor(np.minimum(a, b) - r[:, np.newaxis]).astype(np.int64)
+    hi = np.ceil(np.maximum(a, b) + r[:, np.newaxis]).astype(np.int64)
+    lo = np.clip(lo, 0, shape)
+    hi = np.clip(hi + 1, 0, shape)
+    keep = np.where(np.all(hi > lo, axis=1))[0]
+    if keep.size == 0:
+        return im
+    tile = 16
+    ntiles = np.ceil(shape/tile).astype(np.int64)
+    # A cube lies within the sphere through its corners
+    reach = np.where(cube, r*np.sqrt(3), r)
+    tiles, elems = _find_cylinder_tiles(a, b, reach, lo, hi, keep, tile,
+                                        ntiles)
+    # Group the elements by tile, keeping the pores ahead of the throats
+    order = np.argsort(tiles, kind='stable')
+    tiles, elems = tiles[order], elems[order]
+    tiles, start = np.unique(tiles, return_index=True)
+    indptr = np.append(start, elems.size).astype(np.int64)
+    _insert_network_kernel(im, a, b, r, cube, values, lo, hi, tiles, indptr,
+                           elems, tile, ntiles)
     return im
 
 
+@njit(parallel=True)
+def _insert_network_kernel(im, a, b, r, cube, values, lo, hi, tiles, indptr,
+                           elems, tile, ntiles):  # pragma: no cover
+    for k in prange(tiles.size):
+        tz = tiles[k] % ntiles[2]
+        ty = (tiles[k]//ntiles[2]) % ntiles[1]
+        tx = tiles[k]//(ntiles[1]*ntiles[2])
+        for j in range(indptr[k], indptr[k + 1]):
+            n = elems[j]
+            for x in range(max(tx*tile, lo[n, 0]), min(tx*tile + tile, hi[n, 0])):
+                for y in range(max(ty*tile, lo[n, 1]),
+                               min(ty*tile + tile, hi[n, 1])):
+                    for z in range(max(tz*tile, lo[n, 2]),
+                                   min(tz*tile + tile, hi[n, 2])):
+                        if im[x, y, z] != 0:
+                            continue
+                        if cube[n]:
+                            d = max(abs(x - a[n, 0]), abs(y - a[n, 1]),
+                                    abs(z - a[n, 2]))
+                            inside = d <= r[n]
+                        else:
+                            d2 = _segment_dist2(x, y, z, a[n], b[n], True)
+                            inside = d2 <= r[n]**2
+                        if inside:
+                            im[x, y, z] = values[n]
+
+
 def generate_voxel_image(network, pore_shape="sphere", throat_shape="cylinder",
-                         max_dim=None, rtol=0.1):
+                         max_dim=None, rtol=0.1, chunks=None):
     r"""
     Generates voxel image from an OpenPNM network object.
 
@@ -262,6 +479,12 @@ def generate_voxel_image(network, pore_shape="sphere", throat_shape="cylinder",
         Stopping criteria for finding the smallest voxel image such that
         further increasing the number of voxels in each dimension by 25% would
         improve the predicted porosity of the image by less that ``rtol``
+    chunks : int or tuple of ints
+        If given, the image is returned as a ``dask`` array with chunks of
+        this shape, and each chunk is only voxelized when it is computed.
+        This allows images of large domains to be written to disk, for
+        instance using ``to_zarr``, without ever holding them in memory.  The
+        default is ``None``, which returns a numpy array.
 
     Returns
     -------
@@ -274,37 +497,33 @@ def generate_voxel_image(network, pore_shape="sphere", throat_shape="cylinder",
     solid phase, pores, and throats respectively.
 
     (2) If max_dim is not provided, the method calculates it such that the
-    further increasing it doesn't change porosity by much.
+    further increasing it doesn't change porosity by much.  The porosity at
+    each size is predicted from the number of voxels in each pore and throat
+    after rounding their radii, so the image is only generated once.
+
+    (3) All the pores and throats are inserted in a single parallel pass over
+    cubic tiles of the image, with each tile testing its voxels against the
+    pores and throats that reach it only.
 
     """
     print("\n" + "-" * 44, flush=True)
     print("| Generating voxel image from pore network |", flush=True)
     print("-" * 44, flush=True)
 
-    # If max_dim is provided, generate voxel image using max_dim
-    if max_dim is not None:
-        return _generate_voxel_image(network, pore_shape, throat_shape,
-                                     max_dim=max_dim)
-    else:
-        max_dim = 200
-
     # If max_dim is not provided, find best max_dim that predicts porosity
-    eps_old = 200
-    err = 100
-
-    while err > rtol:
-        print(f"\nMaximum dimension in voxels: {max_dim}", flush=True)
-        im = _generate_voxel_image(network, pore_shape, throat_shape,
-                                   max_dim=max_dim)
-        eps = im.astype(bool).sum() / np.prod(im.shape)
-
-        err = abs(1 - eps / eps_old)
-        eps_old = eps
-        max_dim = int(max_dim * 1.25)
-
-    print(f"\nConverged at max_dim = {max_dim} voxels.\n")
-
-    return im
+    if max_dim is None:
+        max_dim = 200
+        eps_old = _voxel_porosity(network, pore_shape, max_dim=max_dim)
+        err = 100
+        while err > rtol:
+            max_dim = int(max_dim * 1.25)
+            eps = _voxel_porosity(network, pore_shape, max_dim=max_dim)
+            err = abs(1 - eps / eps_old)
+            eps_old = eps
+        print(f"\nConverged at max_dim = {max_dim} voxels.\n")
+
+    return _generate_voxel_image(network, pore_shape, throat_shape,
+                                 max_dim=max_dim, chunks=chunks)
 
 
 def add_phase_interconnections(net, snow_partitioning_n, voxel_size=1,
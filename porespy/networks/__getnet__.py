@@ -1,14 +1,15 @@
 import numpy as np
-import openpnm as op
 import scipy.ndimage as spim
-from porespy.tools import extend_slice
+from numba import njit, prange
+from collections import namedtuple
+from edt import edt
 from porespy import settings
-import openpnm.models.geometry as op_gm
-from porespy.tools import get_tqdm
-tqdm = get_tqdm()
+from porespy.tools.__rag__ import _adjacent_voxels
+from porespy.networks.__funcs__ import _boundary_face_labels
 
 
-def regions_to_network(im, dt=None, voxel_size=1):
+def regions_to_network(im, dt=None, voxel_size=1, rag=None,
+                       boundary_faces=None):
     r"""
     Analyzes an image that has been partitioned into pore regions and extracts
     the pore and throat geometry as well as network connectivity.
@@ -29,6 +30,22 @@ def regions_to_network(im, dt=None, voxel_size=1):
         default is 1, which is useful when overlaying the PNM on the original
         image since the scale of the image is alway 1 unit lenth per voxel.
 
+    rag : RegionAdjacencyGraph
+        The adjacency graph of the regions in ``im``, built with
+        ``voxels=True``.  If given, the throats are measured from its
+        interface voxels rather than by scanning the image again, which
+        saves time when the graph is also needed elsewhere.
+
+    boundary_faces : list of strings
+        The faces of the image on which boundary pores should be added, using
+        the same labels as ``add_boundary_regions``.  The boundary pores and
+        their throats are found from the face slices of ``im`` and ``dt``
+        as if ``add_boundary_regions`` had been applied, but without padding
+        the image.  They are given the labels following those of ``im``, and
+        lie just outside the image, so their coordinates along the normal
+        to the face are -2 or 1 more than the size of the image.  The default
+        is ``None``, which adds no boundary pores.
+
     Returns
     -------
     A dictionary containing all the pore and throat size data, as well as the
@@ -39,8 +56,6 @@ def regions_to_network(im, dt=None, voxel_size=1):
     """
     print('-' * 60, flush=True)
     print('Extracting pore and throat information from image', flush=True)
-    from skimage.morphology import disk, ball
-    struc_elem = disk if im.ndim == 2 else ball
 
     # if ~np.any(im == 0):
     #     raise Exception('The received image has no solid phase (0\'s)')
@@ -49,67 +64,40 @@ def regions_to_network(im, dt=None, voxel_size=1):
         dt = spim.distance_transform_edt(im > 0)
         dt = spim.gaussian_filter(input=dt, sigma=0.5)
 
-    # Get 'slices' into im for each pore region
-    slices = spim.find_objects(im)
-
-    # Initialize arrays
-    Ps = np.arange(1, np.amax(im)+1)
-    Np = np.size(Ps)
-    p_coords = np.zeros((Np, im.ndim), dtype=float)
-    p_volume = np.zeros((Np, ), dtype=float)
-    p_dia_local = np.zeros((Np, ), dtype=float)
-    p_dia_global = np.zeros((Np, ), dtype=float)
-    p_label = np.zeros((Np, ), dtype=int)
-    p_area_surf = np.zeros((Np, ), dtype=int)
-    t_conns = []
-    t_dia_inscribed = []
-    t_area = []
-    t_perimeter = []
-    t_coords = []
-    # dt_shape = np.array(dt.shape)
-
-    # Start extracting size information for pores and throats
-    for i in tqdm(Ps, **settings.tqdm):
-        pore = i - 1
-        if slices[pore] is None:
-            continue
-        s = extend_slice(slices[pore], im.shape)
-        sub_im = im[s]
-        sub_dt = dt[s]
-        pore_im = sub_im == i
-        padded_mask = np.pad(pore_im, pad_width=1, mode='constant')
-        pore_dt = spim.distance_transform_edt(padded_mask)
-        s_offset = np.array([i.start for i in s])
-        p_label[pore] = i
-        p_coords[pore, :] = spim.center_of_mass(pore_im) + s_offset
-        p_volume[pore] = np.sum(pore_im)
-        p_dia_local[pore] = (2*np.amax(pore_dt)) - np.sqrt(3)
-        p_dia_global[pore] = 2*np.amax(sub_dt)
-        p_area_surf[pore] = np.sum(pore_dt == 1)
-        im_w_throats = spim.binary_dilation(input=pore_im, structure=struc_elem(1))
-        im_w_throats = im_w_throats*sub_im
-        Pn = np.unique(im_w_throats)[1:] - 1
-        for j in Pn:
-            if j > pore:
-                t_conns.append([pore, j])
-                vx = np.where(im_w_throats == (j + 1))
-                t_dia_inscribed.append(2*np.amax(sub_dt[vx]))
-                t_perimeter.append(np.sum(sub_dt[vx] < 2))
-                t_area.append(np.size(vx[0]))
-                t_inds = tuple([i+j for i, j in zip(vx, s_offset)])
-                temp = np.where(dt[t_inds] == np.amax(dt[t_inds]))[0][0]
-                if im.ndim == 2:
-                    t_coords.append(tuple((t_inds[0][temp],
-                                           t_inds[1][temp])))
-                else:
-                    t_coords.append(tuple((t_inds[0][temp],
-                                           t_inds[1][temp],
-                                           t_inds[2][temp])))
+    # Find the size and location of all pores and throats at once
+    pores = pore_properties(im, dt)
+    throats = _throat_properties(im, dt, rag=rag)
+    if boundary_faces is not None:
+        pores, throats = _add_boundary_pores(im, dt, pores, throats,
+                                             faces=boundary_faces)
+    net = _network_dict(pores, throats, ndim=im.ndim, voxel_size=voxel_size)
+    return net
+
+
+def _network_dict(pores, throats, ndim, voxel_size=1):
+    r"""
+    Assembles the network dictionary returned by ``regions_to_network`` from
+    the pore and throat properties, expressed in voxels
+    """
+    Np = pores.label.size
+    p_coords = pores.centroid
+    p_volume = pores.volume
+    p_dia_local = pores.inscribed_diameter
+    p_dia_global = pores.extended_diameter
+    p_label = pores.label
+    p_area_surf = pores.surface_area
+
+    t_conns = throats.conns
+    t_dia_inscribed = throats.inscribed_diameter
+    t_area = throats.area
+    t_perimeter = throats.perimeter
+    t_coords = throats.coords
+
     # Clean up values
-    Nt = len(t_dia_inscribed)  # Get number of throats
-    if im.ndim == 2:  # If 2D, add 0's in 3rd dimension
+    Nt = t_conns.shape[0]  # Get number of throats
+    if ndim == 2:  # If 2D, add 0's in 3rd dimension
         p_coords = np.vstack((p_coords.T, np.zeros((Np, )))).T
-        t_coords = np.vstack((np.array(t_coords).T, np.zeros((Nt, )))).T
+        t_coords = np.vstack((t_coords.T, np.zeros((Nt, )))).T
 
     net = {}
     net['pore.all'] = np.ones((Np, ), dtype=bool)
@@ -117,7 +105,7 @@ def regions_to_network(im, dt=None, voxel_size=1):
     net['pore.coords'] = np.copy(p_coords)*voxel_size
     net['pore.centroid'] = np.copy(p_coords)*voxel_size
     net['throat.centroid'] = np.array(t_coords)*voxel_size
-    net['throat.conns'] = np.array(t_conns)
+    net['throat.conns'] = t_conns
     net['pore.label'] = np.array(p_label)
     net['pore.volume'] = np.copy(p_volume)*(voxel_size**3)
     net['throat.volume'] = np.zeros((Nt, ), dtype=float)
@@ -140,26 +128,359 @@ def regions_to_network(im, dt=None, voxel_size=1):
     net['throat.length'] = PT1 + PT2
     dist = (p_coords[P12[:, 0]]-p_coords[P12[:, 1]])*voxel_size
     net['throat.direct_length'] = np.sqrt(np.sum(dist**2, axis=1))
-    # Make a dummy openpnm network to get the conduit lengths
-    pn = op.network.GenericNetwork()
-    pn.update(net)
-    pn.add_model(propname='throat.endpoints',
-                 model=op_gm.throat_endpoints.spherical_pores,
-                 pore_diameter='pore.inscribed_diameter',
-                 throat_diameter='throat.inscribed_diameter')
-    pn.add_model(propname='throat.conduit_lengths',
-                 model=op_gm.throat_length.conduit_lengths)
-    pn.add_model(propname='pore.area',
-                 model=op_gm.pore_area.sphere)
-    net['throat.endpoints.head'] = pn['throat.endpoints.head']
-    net['throat.endpoints.tail'] = pn['throat.endpoints.tail']
-    net['throat.conduit_lengths.pore1'] = pn['throat.conduit_lengths.pore1']
-    net['throat.conduit_lengths.pore2'] = pn['throat.conduit_lengths.pore2']
-    net['throat.conduit_lengths.throat'] = pn['throat.conduit_lengths.throat']
-    net['pore.area'] = pn['pore.area']
-    prj = pn.project
-    prj.clear()
-    wrk = op.Workspace()
-    wrk.close_project(prj)
+    # Find the conduit lengths assuming spherical pores
+    head, tail = _spherical_pore_endpoints(
+        coords=net['pore.coords'], conns=P12,
+        pore_diameter=net['pore.inscribed_diameter'],
+        throat_diameter=net['throat.inscribed_diameter'],
+        throat_centroid=net['throat.centroid'])
+    net['throat.endpoints.head'] = head
+    net['throat.endpoints.tail'] = tail
+    net['throat.conduit_lengths.pore1'] = \
+        np.linalg.norm(net['pore.coords'][P12[:, 0]] - head, axis=1)
+    net['throat.conduit_lengths.pore2'] = \
+        np.linalg.norm(net['pore.coords'][P12[:, 1]] - tail, axis=1)
+    net['throat.conduit_lengths.throat'] = \
+        np.maximum(net['throat.length'], 1e-15)
+    net['pore.area'] = np.pi/4*net['pore.diameter']**2
 
     return net
+
+
+def _add_boundary_pores(im, dt, pores, throats, faces):
+    r"""
+    Appends a boundary pore for each region touching the given faces of
+    ``im``, plus the throat joining it to that region, to the pore and throat
+    properties of the image
+
+    Each boundary pore has the properties it would have if ``im`` had been
+    padded by ``add_boundary_regions`` and ``dt`` by ``pad_faces``: a slab 3
+    voxels thick covering the part of the face occupied by its region, with
+    the voxels where two regions meet removed.  Since the slab is a stack of
+    copies of the face slice, its properties follow from that slice alone.
+    """
+    Np = pores.label.size
+    new_pores, new_throats = [pores], [throats]
+    for axis, side, labels in _boundary_face_labels(im, faces):
+        p, t = _boundary_slab(labels, np.take(dt, side, axis=axis),
+                              axis=axis, start=Np,
+                              layer=-1 if side == 0 else im.shape[axis])
+        Np += p.label.size
+        new_pores.append(p)
+        new_throats.append(t)
+    pores = type(pores)(*[np.concatenate(a) for a in zip(*new_pores)])
+    throats = type(throats)(*[np.concatenate(a) for a in zip(*new_throats)])
+    order = np.lexsort((throats.conns[:, 1], throats.conns[:, 0]))
+    throats = type(throats)(*[a[order] for a in throats])
+    return pores, throats
+
+
+def _boundary_slab(labels, vals, axis, layer, start):
+    r"""
+    Finds the properties of the boundary pores grown from the regions in one
+    face slice, with ``layer`` being the position along ``axis`` of the slab
+    layer next to the image and ``start`` the number of preceding pores
+    """
+    inds = np.flatnonzero(labels)
+    order = np.argsort(labels.flat[inds], kind='stable')
+    inds = inds[order]
+    parents, starts, counts = np.unique(labels.flat[inds], return_index=True,
+                                        return_counts=True)
+    n = parents.size
+    if n == 0:
+        starts = np.zeros(1, dtype=int)
+    label = np.arange(start + 1, start + n + 1)
+    crds = np.vstack(np.unravel_index(inds, labels.shape)).T
+    csum = np.add.reduceat(crds, starts, axis=0)[:n]
+    # The middle layer of the slab is 2 voxels from both the image and the
+    # outer side, which caps its local distance transform
+    mid = layer - 1 if layer < 0 else layer + 1
+    centroid = np.insert(csum/np.maximum(counts, 1)[:, np.newaxis], axis,
+                         mid, axis=1)
+    ldt = np.ravel(edt(labels, black_border=True))[inds]
+    ldt_max = np.minimum(np.maximum.reduceat(ldt, starts)[:n], 2)
+    surf = 2*counts + np.add.reduceat(ldt == 1, starts)[:n]
+    v = np.ravel(vals)[inds]
+    dt_max = np.maximum.reduceat(v, starts)[:n]
+    perimeter = np.add.reduceat(v < 2, starts)[:n]
+    peaks = np.flatnonzero(v == np.repeat(dt_max, counts))
+    peaks = inds[peaks[np.searchsorted(peaks, starts[:n])]]
+    coords = np.vstack(np.unravel_index(peaks, labels.shape)).T
+    coords = np.insert(coords.reshape(n, -1), axis, layer, axis=1)
+    tup = namedtuple('pores', ('label', 'centroid', 'volume',
+                               'inscribed_diameter', 'extended_diameter',
+                               'surface_area'))
+    pores = tup(label, centroid, 3.0*counts, 2*ldt_max - np.sqrt(3),
+                2*dt_max, surf)
+    tup = namedtuple('throats', ('conns', 'area', 'perimeter',
+                                 'inscribed_diameter', 'coords'))
+    conns = np.vstack((parents - 1, label - 1)).T
+    throats = tup(conns, counts, perimeter, 2*dt_max, coords)
+    return pores, throats
+
+
+def _spherical_pore_endpoints(coords, conns, pore_diameter, throat_diameter,
+                              throat_centroid):
+    r"""
+    Finds the points where each throat meets the surface of its two pores,
+    treating the pores as spheres
+
+    This follows the ``spherical_pores`` endpoint model of OpenPNM, including
+    its handling of throats wider than their pores, of throat centroids
+    which are not colinear with the pore centers, and of overlapping pores.
+
+    Returns
+    -------
+    head, tail : ND-arrays
+        The coordinates of the endpoints of each throat on its first and
+        second pore, respectively.
+
+    """
+    C1, C2 = coords[conns[:, 0]], coords[conns[:, 1]]
+    D1, D2 = pore_diameter[conns[:, 0]], pore_diameter[conns[:, 1]]
+    Dt = throat_diameter
+    L = np.linalg.norm(C1 - C2, axis=1) + 1e-15
+    L1 = np.where(Dt > D1, 0.5*D1, np.sqrt(np.abs(D1**2 - Dt**2))/2)
+    L2 = np.where(Dt > D2, 0.5*D2, np.sqrt(np.abs(D2**2 - Dt**2))/2)
+    LP1T = np.linalg.norm(throat_centroid - C1, axis=1) + 1e-15
+    LP2T = np.linalg.norm(throat_centroid - C2, axis=1) + 1e-15
+    unit_vec_P1T = (throat_centroid - C1) / LP1T[:, np.newaxis]
+    unit_vec_P2T = (throat_centroid - C2) / LP2T[:, np.newaxis]
+    head = C1 + L1[:, np.newaxis]*unit_vec_P1T
+    tail = C2 + L2[:, np.newaxis]*unit_vec_P2T
+    # Handle throats whose pores overlap, placing the endpoints on the lens
+    L1 = (4*L**2 + D1**2 - D2**2) / (8*L)
+    L2 = (4*L**2 + D2**2 - D1**2) / (8*L)
+    h = 2*np.sqrt(np.clip(D1**2/4 - L1**2, 0, None))
+    mask = (L - 0.5*(D1 + D2) < 0) & (Dt < h)
+    head[mask] = (C1 + L1[:, np.newaxis]*unit_vec_P1T)[mask]
+    tail[mask] = (C2 + L2[:, np.newaxis]*unit_vec_P2T)[mask]
+    return head, tail
+
+
+def pore_properties(regions, dt=None):
+    r"""
+    Computes the size and location of all pore regions in an image at once
+
+    Parameters
+    ----------
+    regions : ND-array
+        An image of the pore space partitioned into individual pore regions,
+        with zeros indicating the solid phase.
+    dt : ND-array
+        The distance transform of the pore space.  If not given it will be
+        calculated in the same way as in ``regions_to_network``.
+
+    Returns
+    -------
+    pores : namedtuple
+        A tuple containing the following arrays, each with one entry for
+        each label from 1 to ``regions.max()`` and expressed in voxels:
+
+        **label** : The label of each region, or 0 if it is absent from
+        ``regions``
+
+        **centroid** : The center of mass of each region
+
+        **volume** : The number of voxels in each region
+
+        **inscribed_diameter** : The diameter of the largest sphere that fits
+        within each region, less the length of a voxel diagonal
+
+        **extended_diameter** : Twice the maximum of ``dt`` within each region
+
+        **surface_area** : The number of voxels in each region which touch a
+        voxel of another region, the solid, or the image border
+
+    See Also
+    --------
+    regions_to_network
+
+    Notes
+    -----
+    The local distance transform of all regions is found in a single call to
+    the label-aware ``edt``, which gives the distance of each voxel to the
+    boundary of its own region.  All the per-region sums and maxima are then
+    gathered in one pass over the image.
+
+    """
+    if dt is None:
+        dt = spim.distance_transform_edt(regions > 0)
+        dt = spim.gaussian_filter(input=dt, sigma=0.5)
+    ldt = edt(regions, black_border=True, parallel=settings.ncores)
+    shape = regions.shape + (1, )*(3 - regions.ndim)
+    Np = int(regions.max()) if regions.size > 0 else 0
+    nchunks = _moment_chunks(Np, shape[0])
+    moments = _pore_moments(regions.reshape(shape), np.reshape(dt, shape),
+                            ldt.reshape(shape), Np, np.zeros(3, dtype=int),
+                            np.array(shape), nchunks)
+    return _pore_summary(*moments, ndim=regions.ndim)
+
+
+def _pore_summary(vol, csum, dt_max, ldt_max, surf, ndim):
+    r"""
+    Converts the per-label sums and maxima found by ``_pore_moments`` into
+    the pore properties returned by ``pore_properties``
+    """
+    vol, csum = vol[1:], csum[1:, :ndim]
+    Np = vol.size
+    found = vol > 0
+    centroid = np.zeros_like(csum)
+    centroid[found] = csum[found] / vol[found, np.newaxis]
+    label = np.where(found, np.arange(1, Np + 1), 0)
+    inscribed = np.where(found, 2*ldt_max[1:] - np.sqrt(3), 0.0)
+    tup = namedtuple('pores', ('label', 'centroid', 'volume',
+                               'inscribed_diameter', 'extended_diameter',
+                               'surface_area'))
+    return tup(label, centroid, vol.astype(float), inscribed,
+               2*dt_max[1:], surf[1:])
+
+
+def _moment_chunks(Np, nx):
+    r"""
+    Returns the number of threads used by ``_pore_moments`` for ``Np``
+    labels and ``nx`` rows, limited so that the accumulators of all threads,
+    which take 56 bytes per label each, use at most 128 MB when there are
+    many labels
+    """
+    return max(1, min(settings.ncores, nx, 2**27 // (56*(Np + 1))))
+
+
+@njit(parallel=True)
+def _pore_moments(im, dt, ldt, Np, lower, upper, nchunks):  # pragma: no cover
+    x0, x1 = lower[0], upper[0]
+    vol = np.zeros((nchunks, Np + 1), dtype=np.int64)
+    csum = np.zeros((nchunks, Np + 1, 3))
+    dt_max = np.zeros((nchunks, Np + 1))
+    ldt_max = np.zeros((nchunks, Np + 1))
+    surf = np.zeros((nchunks, Np + 1), dtype=np.int64)
+    for t in prange(nchunks):
+        for x in range(x0 + t*(x1 - x0)//nchunks,
+                       x0 + (t + 1)*(x1 - x0)//nchunks):
+            for y in range(lower[1], upper[1]):
+                for z in range(lower[2], upper[2]):
+                    n = im[x, y, z]
+                    if n == 0:
+                        continue
+                    vol[t, n] += 1
+                    csum[t, n, 0] += x
+                    csum[t, n, 1] += y
+                    csum[t, n, 2] += z
+                    dt_max[t, n] = max(dt_max[t, n], dt[x, y, z])
+                    ldt_max[t, n] = max(ldt_max[t, n], ldt[x, y, z])
+                    if ldt[x, y, z] == 1:
+                        surf[t, n] += 1
+    return (vol.sum(axis=0), csum.sum(axis=0), _max_rows(dt_max),
+            _max_rows(ldt_max), surf.sum(axis=0))
+
+
+@njit
+def _max_rows(a):  # pragma: no cover
+    out = a[0].copy()
+    for t in range(1, a.shape[0]):
+        for n in range(a.shape[1]):
+            out[n] = max(out[n], a[t, n])
+    return out
+
+
+def _throat_records(im, dt, lower=None, upper=None, nchunks=None):
+    r"""
+    Reduces the voxels of each throat found by ``_adjacent_voxels`` to its
+    connections, voxel count, number of voxels with ``dt < 2``, maximum
+    ``dt``, and the flat index of the first voxel at that maximum
+    """
+    conns, voxels, starts = _adjacent_voxels(im, lower=lower, upper=upper,
+                                             nchunks=nchunks)
+    return _reduce_throat_voxels(dt, conns, voxels, starts)
+
+
+def _reduce_throat_voxels(dt, conns, voxels, starts):
+    r"""
+    Reduces the voxels of each throat to the records of ``_throat_records``
+    """
+    if voxels.size == 0:
+        return (conns, np.zeros(0, dtype=int), np.zeros(0, dtype=int),
+                np.zeros(0), np.zeros(0, dtype=np.int64))
+    vals = np.ravel(dt)[voxels]
+    area = np.diff(np.append(starts, voxels.size))
+    perimeter = np.add.reduceat((vals < 2).astype(int), starts)
+    dt_max = np.maximum.reduceat(vals, starts)
+    peaks = np.flatnonzero(vals == np.repeat(dt_max, area))
+    peaks = peaks[np.searchsorted(peaks, starts)]
+    return conns, area, perimeter, dt_max, voxels[peaks]
+
+
+def _merge_pore_records(keys, vol, csum, dt_max, ldt_max, surf):
+    r"""
+    Combines the pore records found on several parts of an image, summing
+    the volumes, coordinates and surface voxels and taking the largest
+    distances of all records sharing a key
+
+    Returns the sorted unique keys followed by the combined records.
+    """
+    keys, inv = np.unique(keys, return_inverse=True)
+    n = keys.size
+    vol_ = np.zeros(n, dtype=np.int64)
+    np.add.at(vol_, inv, vol)
+    csum_ = np.zeros((n, 3))
+    np.add.at(csum_, inv, csum)
+    surf_ = np.zeros(n, dtype=np.int64)
+    np.add.at(surf_, inv, surf)
+    dt_max_ = np.zeros(n)
+    np.maximum.at(dt_max_, inv, dt_max)
+    ldt_max_ = np.zeros(n)
+    np.maximum.at(ldt_max_, inv, ldt_max)
+    return keys, vol_, csum_, dt_max_, ldt_max_, surf_
+
+
+def _merge_throat_records(conns, area, perimeter, dt_max, peaks):
+    r"""
+    Combines the throat records found on several parts of an image, summing
+    the areas and perimeters of records with the same connections and
+    keeping the lowest flat index among those at the largest ``dt``
+    """
+    conns = conns.reshape(-1, 2)
+    order = np.lexsort((peaks, conns[:, 1], conns[:, 0]))
+    conns, area, perimeter, dt_max, peaks = \
+        conns[order], area[order], perimeter[order], dt_max[order], peaks[order]
+    if conns.shape[0] == 0:
+        return conns, area, perimeter, dt_max, peaks
+    new = np.ones(conns.shape[0], dtype=bool)
+    new[1:] = np.any(conns[1:] != conns[:-1], axis=1)
+    starts = np.flatnonzero(new)
+    counts = np.diff(np.append(starts, conns.shape[0]))
+    best = np.maximum.reduceat(dt_max, starts)
+    first = np.flatnonzero(dt_max == np.repeat(best, counts))
+    first = first[np.searchsorted(first, starts)]
+    return (conns[starts], np.add.reduceat(area, starts),
+            np.add.reduceat(perimeter, starts), best, peaks[first])
+
+
+def _throat_properties(im, dt, rag=None):
+    r"""
+    Computes the size and location of every throat in an image, reusing the
+    interface voxels of ``rag`` if given
+    """
+    if (rag is None) or (rag.voxels is None):
+        records = _throat_records(im, dt)
+    else:
+        if rag.shape != im.shape:
+            raise Exception('The region adjacency graph does not match the'
+                            + ' shape of the image')
+        records = _reduce_throat_voxels(dt, rag.conns, rag.voxels,
+                                        rag.voxel_ptr[:-1])
+    return _throat_summary(records, shape=im.shape)
+
+
+def _throat_summary(records, shape):
+    r"""
+    Converts the records found by ``_throat_records`` into the throat
+    properties, with the centroid being the voxel of each throat at its
+    maximum ``dt``
+    """
+    conns, area, perimeter, dt_max, peaks = records
+    coords = np.vstack(np.unravel_index(peaks, shape)).T
+    coords = coords.reshape(-1, len(shape))
+    tup = namedtuple('throats', ('conns', 'area', 'perimeter',
+                                 'inscribed_diameter', 'coords'))
+    return tup(conns, area, perimeter, 2*dt_max, coords)
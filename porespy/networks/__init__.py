@@ -13,8 +13,11 @@ Contains functions for analysing images as pore networks
     porespy.networks.add_boundary_regions
     porespy.networks.snow
     porespy.networks.snow_dual
+    porespy.networks.snow_tiled
+    porespy.networks.snow_update
     porespy.networks.regions_to_network
     porespy.networks.map_to_regions
+    porespy.networks.pore_properties
     porespy.networks.generate_voxel_image
     porespy.networks.maximal_ball
 
@@ -24,10 +27,13 @@ Contains functions for analysing images as pore networks
 .. autofunction:: label_boundary_cells
 .. autofunction:: map_to_regions
 .. autofunction:: add_phase_interconnections
+.. autofunction:: pore_properties
 .. autofunction:: regions_to_network
 .. autofunction:: snow
 .. autofunction:: snow_dual
 .. autofunction:: snow_n
+.. autofunction:: snow_tiled
+.. autofunction:: snow_update
 .. autofunction:: maximal_ball
 
 
@@ -39,8 +45,11 @@ from .__funcs__ import generate_voxel_image
 from .__funcs__ import label_boundary_cells
 from .__funcs__ import add_phase_interconnections
 from .__getnet__ import regions_to_network
+from .__getnet__ import pore_properties
 from .__utils__ import _net_dict
 from .__snow__ import snow
 from .__snow_dual__ import snow_dual
 from .__snow_n__ import snow_n
+from .__snow_tiled__ import snow_tiled
+from .__snow_update__ import snow_update
 from .__maximal_ball__ import maximal_ball
@@ -1,11 +1,10 @@
 import numpy as np
-from porespy.networks import regions_to_network, add_boundary_regions
+from porespy.networks import regions_to_network
 from porespy.networks import _net_dict
 from porespy.networks import label_boundary_cells
-from porespy.tools import pad_faces
+from porespy.networks.__funcs__ import _boundary_region_areas
 from porespy.filters import snow_partitioning
 from porespy.tools import make_contiguous
-from porespy.metrics import region_surface_areas, region_interface_areas
 
 
 def snow(im, voxel_size=1,
@@ -33,12 +32,16 @@ def snow(im, voxel_size=1,
         ‘front’ and ‘back’ face labels to assign boundary nodes. If no label is
         assigned then all six faces will be selected as boundary nodes
         automatically which can be trimmed later on based on user requirements.
+        The boundary pores are found from the faces of the image without
+        padding it, so they lie just outside the returned image.
     marching_cubes_area : bool
         If ``True`` then the surface area and interfacial area between regions
-        will be using the marching cube algorithm. This is a more accurate
-        representation of area in extracted network, but is quite slow, so
-        it is ``False`` by default.  The default method simply counts voxels
-        so does not correctly account for the voxelated nature of the images.
+        will be calculated using the marching cube algorithm, applied to all
+        regions in a single sweep by ``porespy.metrics.region_areas``.  This
+        is a more accurate representation of area in extracted network, but
+        is slower, so it is ``False`` by default.  The default method simply
+        counts voxels so does not correctly account for the voxelated nature
+        of the images.
 
     Returns
     -------
@@ -64,28 +67,41 @@ def snow(im, voxel_size=1,
     im = regions.im
     dt = regions.dt
     regions = regions.regions
+    regions = make_contiguous(regions*im)
     b_num = np.amax(regions)
     # -------------------------------------------------------------------------
-    # Boundary Conditions
-    regions = add_boundary_regions(regions=regions, faces=boundary_faces)
-    # -------------------------------------------------------------------------
-    # Padding distance transform and image to extract geometrical properties
-    dt = pad_faces(im=dt, faces=boundary_faces)
-    im = pad_faces(im=im, faces=boundary_faces)
-    regions = regions*im
-    regions = make_contiguous(regions)
-    # -------------------------------------------------------------------------
-    # Extract void and throat information from image
-    net = regions_to_network(im=regions, dt=dt, voxel_size=voxel_size)
+    # Extract void and throat information from image, adding the boundary
+    # pores from the faces of the image
+    net = regions_to_network(im=regions, dt=dt, voxel_size=voxel_size,
+                             boundary_faces=boundary_faces)
     # -------------------------------------------------------------------------
     # Extract marching cube surface area and interfacial area of regions
     if marching_cubes_area:
-        areas = region_surface_areas(regions=regions)
-        interface_area = region_interface_areas(regions=regions, areas=areas,
-                                                voxel_size=voxel_size)
-        net['pore.surface_area'] = areas * voxel_size**2
-        net['throat.area'] = interface_area.area
+        areas = _boundary_region_areas(regions=regions,
+                                       conns=net['throat.conns'],
+                                       faces=boundary_faces,
+                                       voxel_size=voxel_size)
+        net['pore.surface_area'] = areas.surface_area
+        net['throat.area'] = areas.area
+    # -------------------------------------------------------------------------
+    # Label the boundary and internal pores and throats
+    net = _label_snow_network(net, b_num=b_num, boundary_faces=boundary_faces)
     # -------------------------------------------------------------------------
+    # assign out values to dummy dict
+
+    temp = _net_dict(net)
+    temp.im = im.copy()
+    temp.dt = dt
+    temp.regions = regions
+    return temp
+
+
+def _label_snow_network(net, b_num, boundary_faces):
+    r"""
+    Adds the labels of the boundary and internal pores and throats to a
+    network whose first ``b_num`` pores are internal, followed by the
+    boundary pores on the given faces
+    """
     # Find void to void connections of boundary and internal voids
     boundary_labels = net['pore.label'] > b_num
     loc1 = net['throat.conns'][:, 0] < b_num
@@ -97,14 +113,6 @@ def snow(im, voxel_size=1,
     net['throat.boundary'] = loc1 * loc2
     net['pore.internal'] = pore_labels
     net['throat.internal'] = loc3 * loc4
-    # -------------------------------------------------------------------------
     # label boundary cells
     net = label_boundary_cells(network=net, boundary_faces=boundary_faces)
-    # -------------------------------------------------------------------------
-    # assign out values to dummy dict
-
-    temp = _net_dict(net)
-    temp.im = im.copy()
-    temp.dt = dt
-    temp.regions = regions
-    return temp
+    return net
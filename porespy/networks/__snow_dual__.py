@@ -1,11 +1,9 @@
 import numpy as np
 from porespy.networks import regions_to_network
-from porespy.networks import add_boundary_regions
 from porespy.networks import label_boundary_cells
 from porespy.networks import _net_dict
-from porespy.tools import pad_faces
+from porespy.networks.__funcs__ import _boundary_region_areas
 from porespy.filters import snow_partitioning
-from porespy.metrics import region_surface_areas, region_interface_areas
 
 
 def snow_dual(im,
@@ -37,12 +35,16 @@ def snow_dual(im,
         ‘front’ and ‘back’ face labels to assign boundary nodes. If no label is
         assigned then all six faces will be selected as boundary nodes
         automatically which can be trimmed later on based on user requirements.
+        The boundary pores are found from the faces of the image without
+        padding it, so they lie just outside the returned image.
     marching_cubes_area : bool
         If ``True`` then the surface area and interfacial area between regions
-        will be using the marching cube algorithm. This is a more accurate
-        representation of area in extracted network, but is quite slow, so
-        it is ``False`` by default.  The default method simply counts voxels
-        so does not correctly account for the voxelated nature of the images.
+        will be calculated using the marching cube algorithm, applied to all
+        regions in a single sweep by ``porespy.metrics.region_areas``.  This
+        is a more accurate representation of area in extracted network, but
+        is slower, so it is ``False`` by default.  The default method simply
+        counts voxels so does not correctly account for the voxelated nature
+        of the images.
 
     Returns
     -------
@@ -94,22 +96,19 @@ def snow_dual(im,
     regions = pore_region + solid_region
     b_num = np.amax(regions)
     # -------------------------------------------------------------------------
-    # Boundary Conditions
-    regions = add_boundary_regions(regions=regions, faces=boundary_faces)
-    # -------------------------------------------------------------------------
-    # Padding distance transform to extract geometrical properties
-    dt = pad_faces(im=dt, faces=boundary_faces)
-    # -------------------------------------------------------------------------
-    # Extract void,solid and throat information from image
-    net = regions_to_network(im=regions, dt=dt, voxel_size=voxel_size)
+    # Extract void,solid and throat information from image, adding the
+    # boundary pores from the faces of the image
+    net = regions_to_network(im=regions, dt=dt, voxel_size=voxel_size,
+                             boundary_faces=boundary_faces)
     # -------------------------------------------------------------------------
     # Extract marching cube surface area and interfacial area of regions
     if marching_cubes_area:
-        areas = region_surface_areas(regions=regions)
-        interface_area = region_interface_areas(regions=regions, areas=areas,
-                                                voxel_size=voxel_size)
-        net['pore.surface_area'] = areas * voxel_size**2
-        net['throat.area'] = interface_area.area
+        areas = _boundary_region_areas(regions=regions,
+                                       conns=net['throat.conns'],
+                                       faces=boundary_faces,
+                                       voxel_size=voxel_size)
+        net['pore.surface_area'] = areas.surface_area
+        net['throat.area'] = areas.area
     # -------------------------------------------------------------------------
     # Find void to void, void to solid and solid to solid throat conns
     loc1 = net['throat.conns'][:, 0] < solid_num
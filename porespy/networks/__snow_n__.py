@@ -1,13 +1,12 @@
 import numpy as np
 from porespy.networks import regions_to_network
 from porespy.networks import label_boundary_cells
-from porespy.networks import add_boundary_regions
 from porespy.networks import add_phase_interconnections
 from porespy.tools import _create_alias_map
 from porespy.networks import _net_dict
 from porespy.filters import snow_partitioning_n
-from porespy.tools import make_contiguous, pad_faces
-from porespy.metrics import region_surface_areas, region_interface_areas
+from porespy.networks.__funcs__ import _boundary_region_areas
+from porespy.tools import make_contiguous
 
 
 def snow_n(im,
@@ -39,14 +38,17 @@ def snow_n(im,
         ‘front’ and ‘back’ face labels to assign boundary nodes. If no label is
         assigned then all six faces will be selected as boundary nodes
         automatically which can be trimmed later on based on user requirements.
+        The boundary pores are found from the faces of the image without
+        padding it, so they lie just outside the returned image.
 
     marching_cubes_area : bool
         If ``True`` then the surface area and interfacial area between regions
-        will be calculated using the marching cube algorithm. This is a more
-        accurate representation of area in extracted network, but is quite
-        slow, so it is ``False`` by default.  The default method simply counts
-        voxels so does not correctly account for the voxelated nature of the
-        images.
+        will be calculated using the marching cube algorithm, applied to all
+        regions in a single sweep by ``porespy.metrics.region_areas``.  This
+        is a more accurate representation of area in extracted network, but
+        is slower, so it is ``False`` by default.  The default method simply
+        counts voxels so does not correctly account for the voxelated nature
+        of the images.
 
     alias : dict (Optional)
         A dictionary that assigns unique image label to specific phases. For
@@ -66,27 +68,26 @@ def snow_n(im,
     # Perform snow on each phase and merge all segmentation and dt together
     snow = snow_partitioning_n(im, r_max=4, sigma=0.4, return_all=True,
                                mask=True, randomize=False, alias=alias)
-    # Add boundary regions
-    regions = add_boundary_regions(regions=snow.regions, faces=boundary_faces)
-    # Padding distance transform to extract geometrical properties
-    dt = pad_faces(im=snow.dt, faces=boundary_faces)
+    regions = snow.regions
+    dt = snow.dt
     # For only one phase extraction with boundary regions
     phases_num = np.unique(im).astype(int)
     phases_num = np.trim_zeros(phases_num)
     if len(phases_num) == 1:
-        if boundary_faces is not None:
-            snow.im = pad_faces(im=snow.im, faces=boundary_faces)
         regions = regions * (snow.im.astype(bool))
         regions = make_contiguous(regions)
-    # Extract N phases sites and bond information from image
-    net = regions_to_network(im=regions, dt=dt, voxel_size=voxel_size)
+    # Extract N phases sites and bond information from image, adding the
+    # boundary pores from the faces of the image
+    net = regions_to_network(im=regions, dt=dt, voxel_size=voxel_size,
+                             boundary_faces=boundary_faces)
     # Extract marching cube surface area and interfacial area of regions
     if marching_cubes_area:
-        areas = region_surface_areas(regions=regions)
-        interface_area = region_interface_areas(regions=regions, areas=areas,
-                                                voxel_size=voxel_size)
-        net['pore.surface_area'] = areas * voxel_size ** 2
-        net['throat.area'] = interface_area.area
+        areas = _boundary_region_areas(regions=regions,
+                                       conns=net['throat.conns'],
+                                       faces=boundary_faces,
+                                       voxel_size=voxel_size)
+        net['pore.surface_area'] = areas.surface_area
+        net['throat.area'] = areas.area
     # Find interconnection and interfacial area between ith and jth phases
     net = add_phase_interconnections(net=net, snow_partitioning_n=snow,
                                      marching_cubes_area=marching_cubes_area,
@@ -0,0 +1,157 @@
+import numpy as np
+from itertools import product
+from edt import edt
+from porespy import settings
+from porespy.filters import snow_partitioning
+from porespy.tools import map_labels
+from porespy.networks.__getnet__ import _pore_moments, _throat_records
+from porespy.networks.__getnet__ import _moment_chunks
+from porespy.networks.__getnet__ import _merge_pore_records
+from porespy.networks.__getnet__ import _merge_throat_records
+from porespy.networks.__getnet__ import _pore_summary, _throat_summary
+from porespy.networks.__getnet__ import _network_dict
+from porespy.tools.__rag__ import _box_bounds
+from porespy.tools import get_tqdm
+tqdm = get_tqdm()
+
+
+def snow_tiled(im, tile_shape, halo=30, voxel_size=1, r_max=4, sigma=0.4):
+    r"""
+    Extracts a pore network from an image one tile at a time, without ever
+    holding the full distance transform or region image in memory
+
+    Parameters
+    ----------
+    im : array_like
+        Binary image with ``True`` indicating the void phase.  Only one tile
+        and its halo are read at a time, so this can be any array that
+        supports slicing, such as a ``numpy.memmap`` or a ``zarr`` or
+        ``h5py`` dataset stored on disk.
+    tile_shape : int or list of ints
+        The shape of the tiles into which the image is divided.  A scalar
+        is used for all axes.
+    halo : int
+        The number of voxels by which each tile is extended on all sides
+        when it is partitioned.  This should exceed the diameter of the
+        largest pores so that the pores straddling the tile boundaries are
+        found the same way in each tile.  The default is 30.
+    voxel_size : scalar
+        The resolution of the image, expressed as the length of one side of
+        a voxel.  The default is 1.
+    r_max : int
+        The radius of the structuring element used by ``snow_partitioning``
+        to find peaks.  The default is 4.
+    sigma : float
+        The standard deviation of the Gaussian blur applied by
+        ``snow_partitioning`` to the distance transform.  The default is 0.4.
+
+    Returns
+    -------
+    net : dict
+        A dictionary containing the same pore and throat data as that
+        returned by ``regions_to_network``.  The 'pore.label' of each pore
+        is its index plus 1, since no global region image is created.
+
+    See Also
+    --------
+    snow
+    regions_to_network
+
+    Notes
+    -----
+    Each tile is partitioned with the SNOW algorithm on its own, then the
+    records of the pores and throats whose voxels lie in the tile itself,
+    not its halo, are kept.  Each region is identified by the location of
+    the peak from which it was grown, so a pore straddling several tiles is
+    recognized as the same pore in each of them and its records are merged:
+    volumes, coordinate sums and surface voxels are added, while diameters
+    are the largest found in any tile.
+
+    Unlike ``snow``, no boundary pores are added to the faces of the image.
+
+    """
+    shape = np.array(im.shape)
+    tile_shape = np.ones(len(shape), dtype=int)*tile_shape
+    origins = list(product(*[range(0, s, t)
+                             for s, t in zip(shape, tile_shape)]))
+    pores, throats = [], []
+    for origin in tqdm(origins, **settings.tqdm):
+        origin = np.array(origin)
+        upper = np.minimum(origin + tile_shape, shape)
+        lo = np.maximum(origin - halo, 0)
+        hi = np.minimum(upper + halo, shape)
+        sub = np.asarray(im[tuple(slice(a, b) for a, b in zip(lo, hi))]) > 0
+        if not np.any(sub):
+            continue
+        p, t = _tile_records(sub, offset=lo, lower=origin - lo,
+                             upper=upper - lo, shape=tuple(shape),
+                             r_max=r_max, sigma=sigma)
+        pores.append(p)
+        throats.append(t)
+    if len(pores) == 0:
+        raise Exception('The image contains no void space')
+    # Merge the pieces of each pore found in different tiles
+    recs = [np.concatenate([p[i] for p in pores]) for i in range(6)]
+    keys, *recs = _merge_pore_records(*recs)
+    recs = [np.concatenate((np.zeros((1, ) + r.shape[1:], dtype=r.dtype), r))
+            for r in recs]
+    pores = _pore_summary(*recs, ndim=len(shape))
+    # Convert the keys of the throats to pore indices and merge them
+    conns, *recs = [np.concatenate([t[i] for t in throats]) for i in range(5)]
+    conns = conns.reshape(-1, 2)
+    inds = np.searchsorted(keys, conns)
+    found = np.all(keys[np.minimum(inds, keys.size - 1)] == conns, axis=1)
+    records = _merge_throat_records(inds[found], *[r[found] for r in recs])
+    throats = _throat_summary(records, shape=tuple(shape))
+    net = _network_dict(pores, throats, ndim=len(shape), voxel_size=voxel_size)
+    return net
+
+
+def _tile_records(sub, offset, lower, upper, shape, r_max, sigma):
+    r"""
+    Partitions one tile and returns the records of the pores and throats
+    found between ``lower`` and ``upper``, keyed by the global flat index
+    (plus 1) of the peak of each region
+    """
+    snow = snow_partitioning(sub, r_max=r_max, sigma=sigma, return_all=True,
+                             randomize=False)
+    regions, dt = snow.regions, snow.dt
+    Nr = int(regions.max())
+    # Identify each region by the first voxel of its peak in the full image
+    peaks = np.flatnonzero(snow.peaks)
+    labels = regions.ravel()[peaks]
+    peaks = _to_global(peaks, sub.shape, offset, shape)
+    keys = np.zeros(Nr + 1, dtype=np.int64)
+    labels, first = np.unique(labels, return_index=True)
+    keys[labels] = peaks[first] + 1
+    keys[0] = 0
+    # Find the pore records within the tile
+    shape3 = sub.shape + (1, )*(3 - sub.ndim)
+    lower3, upper3 = _box_bounds(shape3, lower, upper)
+    ldt = edt(regions, black_border=True, parallel=settings.ncores)
+    nchunks = _moment_chunks(Nr, upper3[0] - lower3[0])
+    vol, csum, dt_max, ldt_max, surf = _pore_moments(
+        regions.reshape(shape3), dt.reshape(shape3), ldt.reshape(shape3),
+        Nr, lower3, upper3, nchunks)
+    n = np.flatnonzero(vol)
+    offset3 = np.append(offset, [0]*(3 - sub.ndim))
+    csum = csum[n] + vol[n, np.newaxis]*offset3
+    pores = (keys[n], vol[n], csum, dt_max[n], ldt_max[n], surf[n])
+    # Find the throat records using the keys as labels, so that the voxels
+    # of each throat are assigned to the same side in every tile
+    keyed = map_labels(regions, keys)
+    conns, area, perimeter, t_max, t_peaks = \
+        _throat_records(keyed, dt, lower=lower, upper=upper)
+    t_peaks = _to_global(t_peaks, sub.shape, offset, shape)
+    throats = (conns + 1, area, perimeter, t_max, t_peaks)
+    return pores, throats
+
+
+def _to_global(inds, shape, offset, global_shape):
+    r"""
+    Converts flat indices into a tile of the given shape and offset into flat
+    indices into the full image
+    """
+    crds = np.unravel_index(inds, shape)
+    crds = tuple([c + o for c, o in zip(crds, offset)])
+    return np.ravel_multi_index(crds, global_shape)
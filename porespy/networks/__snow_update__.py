@@ -0,0 +1,294 @@
+import numpy as np
+from collections import namedtuple
+import scipy.ndimage as spim
+from edt import edt
+from skimage.segmentation import watershed
+from porespy import settings
+from porespy.filters import find_peaks, trim_saddle_points, trim_nearby_peaks
+from porespy.tools import map_labels
+from porespy.networks import _net_dict
+from porespy.networks.__getnet__ import _pore_moments, _pore_summary
+from porespy.networks.__getnet__ import _moment_chunks
+from porespy.networks.__getnet__ import _throat_records, _throat_summary
+from porespy.networks.__getnet__ import _add_boundary_pores, _network_dict
+from porespy.networks.__snow__ import _label_snow_network
+from porespy.tools.__rag__ import _box_bounds
+
+
+def snow_update(network, im, lower, upper, voxel_size=1,
+                boundary_faces=['top', 'bottom', 'left', 'right',
+                                'front', 'back'],
+                r_max=4, sigma=0.4):
+    r"""
+    Updates a network extracted by ``snow`` after a small part of the image
+    has changed, by partitioning and measuring only the neighborhood of the
+    change
+
+    Parameters
+    ----------
+    network : dict
+        The result of ``snow`` or of a previous call to this function, which
+        carries the ``im``, ``dt`` and ``regions`` of the previous image as
+        attributes.  The ``dt`` and ``regions`` images are updated in place.
+    im : ND-array
+        The modified binary image, with ``True`` indicating the void phase.
+        It may only differ from ``network.im`` within the box given by
+        ``lower`` and ``upper``.
+    lower, upper : array_like
+        The corners of the box containing all the changed voxels, such that
+        ``im[lower[0]:upper[0], lower[1]:upper[1], ...]`` covers them.
+    voxel_size : scalar
+        The resolution of the image, which must be the same as that given to
+        ``snow``.  The default is 1.
+    boundary_faces : list of strings
+        The faces of the image on which ``snow`` added boundary pores, which
+        must be the same as those given to ``snow``.  The default is all six
+        faces, as in ``snow``.
+    r_max : int
+        The radius of the structuring element used to find peaks, as in
+        ``snow_partitioning``.  The default is 4.
+    sigma : float
+        The standard deviation of the Gaussian blur applied to the distance
+        transform before finding peaks, as in ``snow_partitioning``.  The
+        default is 0.4.
+
+    Returns
+    -------
+    A dictionary of the same form as that returned by ``snow``, with the
+    new image, distance transform and regions attached as the ``im``, ``dt``
+    and ``regions`` attributes.  The pores of the unchanged regions keep
+    their properties but are renumbered to fill the gaps left by the removed
+    ones, and the new pores follow them, before the boundary pores.
+
+    See Also
+    --------
+    snow
+
+    Notes
+    -----
+    The distance transform can only change within a distance of the box
+    equal to the largest distance found near it, so it is recomputed in that
+    neighborhood only and is identical to that of the full image.  All the
+    regions reaching the neighborhood, after allowing for the Gaussian blur,
+    are removed, and the space they occupied plus any new void in the box is
+    partitioned again using the peaks of the blurred distance transform
+    found within it.  The pores of these new regions and all their throats
+    are then measured, while the rest of the network is kept as is.  The
+    boundary pores are cheap to find from the faces of the image, so they
+    are always found again.
+
+    The result is consistent with ``regions_to_network`` applied to the
+    returned regions and distance transform, but it is not identical to
+    running ``snow`` on the new image, since the peaks of the untouched
+    regions are not sought again.  The surface and interfacial areas of the
+    new pores and throats are found by counting voxels, even if ``snow``
+    was called with ``marching_cubes_area=True``.
+
+    """
+    regions, dt = network.regions, network.dt
+    im = np.asarray(im) > 0
+    if im.shape != regions.shape:
+        raise Exception('The image must have the same shape as the regions')
+    shape = np.array(im.shape)
+    lower = np.clip(np.array(lower, dtype=int), 0, shape)
+    upper = np.clip(np.array(upper, dtype=int), lower, shape)
+    ndim = im.ndim
+    Ni = int(regions.max())
+    # Find the distance transform of the neighborhood of the box
+    halo = _update_dt(im, dt, lower, upper)
+    # Find the regions whose watershed may change, allowing for the blur
+    blur = int(4*sigma + 0.5)
+    s = _box(lower - halo - blur, upper + halo + blur, shape)
+    hits = np.unique(regions[s])
+    hits = hits[hits > 0]
+    box = [slice(a, b) for a, b in zip(lower, upper)]
+    slices = spim.find_objects(regions, max_label=Ni)
+    for n in hits:
+        box = [slice(min(a.start, b.start), max(a.stop, b.stop))
+               for a, b in zip(box, slices[n - 1])]
+    pad = r_max + blur + 1
+    s = _box([b.start - pad for b in box], [b.stop + pad for b in box], shape)
+    # Partition the space of the removed regions and the new void
+    sub = regions[s]
+    changed = np.zeros(sub.shape, dtype=bool)
+    changed[tuple(slice(a - b.start, c - b.start)
+                  for a, c, b in zip(lower, upper, s))] = True
+    mask = (np.isin(sub, hits) | changed) & im[s]
+    new = _partition(dt[s], mask, r_max=r_max, sigma=sigma)
+    sub[np.isin(sub, hits)] = 0
+    sub[mask] = new[mask] + Ni
+    Nn = int(new.max())
+    # Renumber the kept regions contiguously, followed by the new ones
+    keep = np.ones(Ni + 1, dtype=bool)
+    keep[0] = False
+    keep[hits] = False
+    K = int(keep.sum())
+    lut = np.zeros(Ni + Nn + 1, dtype=regions.dtype)
+    lut[1:Ni + 1][keep[1:]] = np.arange(1, K + 1)
+    lut[Ni + 1:] = np.arange(K + 1, K + Nn + 1)
+    map_labels(regions, lut, out=regions)
+    # Measure the new pores and their throats
+    pores = _new_pores(regions[s], dt[s], first=K + 1,
+                       offset=[b.start for b in s])
+    records = _throat_records(regions, dt, lower=[b.start for b in s],
+                              upper=[b.stop for b in s])
+    found = records[0][:, 1] >= K
+    throats = _throat_summary([r[found] for r in records], shape=im.shape)
+    # Merge them with the properties of the kept pores, in voxels
+    rows = np.flatnonzero(keep[1:])
+    pores = type(pores)(*[np.concatenate((a, b)) for a, b in zip(
+        _kept_pores(network, rows, ndim, voxel_size), pores)])
+    if boundary_faces is not None:
+        pores, throats = _add_boundary_pores(regions, dt, pores, throats,
+                                             faces=boundary_faces)
+    net = _network_dict(pores, throats, ndim=ndim, voxel_size=voxel_size)
+    net = _patch_network(network, net, Ni=Ni, rows=rows, lut=lut)
+    net = _label_snow_network(net, b_num=K + Nn,
+                              boundary_faces=boundary_faces)
+    temp = _net_dict(net)
+    temp.im = im
+    temp.dt = dt
+    temp.regions = regions
+    return temp
+
+
+def _box(lower, upper, shape):
+    r"""
+    Returns the slices of the given box, clipped to an image of the given
+    shape
+    """
+    lower = np.clip(lower, 0, shape)
+    upper = np.clip(upper, 0, shape)
+    return tuple(slice(a, b) for a, b in zip(lower, upper))
+
+
+def _update_dt(im, dt, lower, upper):
+    r"""
+    Replaces ``dt`` in place by the distance transform of ``im`` around the
+    given box and returns the distance from the box beyond which it is
+    unchanged
+
+    A voxel's distance can only change if its nearest solid voxel, before
+    or after the change, lies in the box, so the change is confined to the
+    voxels within a distance of the box equal to their previous distance.
+    """
+    shape = np.array(im.shape)
+    halo = 1
+    while True:
+        s = _box(lower - halo, upper + halo, shape)
+        if (dt[s].size == 0) or (dt[s].max() + 1 < halo):
+            break
+        halo = int(np.ceil(dt[s].max())) + 2
+        if all(b.stop - b.start == n for b, n in zip(s, shape)):
+            break
+    # The distances within the box are exact once they are less than the
+    # distance to the edge of the region transformed
+    ext = halo
+    while True:
+        e = _box(lower - halo - ext, upper + halo + ext, shape)
+        vals = edt(im[e], parallel=settings.ncores)
+        vals = vals[tuple(slice(a.start - b.start, a.stop - b.start)
+                          for a, b in zip(s, e))]
+        if all(b.stop - b.start == n for b, n in zip(e, shape)):
+            break
+        if vals.size == 0 or vals.max() <= ext:
+            break
+        ext *= 2
+    dt[s] = vals
+    return halo
+
+
+def _partition(dt, mask, r_max, sigma):
+    r"""
+    Partitions the voxels of ``mask`` with a marker-based watershed of the
+    blurred distance transform, using the peaks that lie within the mask as
+    found by ``snow_partitioning``
+    """
+    if sigma > 0:
+        dt = spim.gaussian_filter(input=dt, sigma=sigma)
+    peaks = find_peaks(dt=dt, r_max=r_max)
+    peaks = trim_saddle_points(peaks=peaks, dt=dt, max_iters=500, verbose=0)
+    peaks = trim_nearby_peaks(peaks=peaks, dt=dt)
+    peaks = peaks*mask
+    # Seed any part of the mask left without a peak at its largest distance
+    parts, N = spim.label(mask)
+    if N > 0:
+        seeded = np.zeros(N + 1, dtype=bool)
+        seeded[parts[peaks > 0]] = True
+        for n in np.flatnonzero(~seeded[1:]) + 1:
+            vals = np.where(parts == n, dt, -np.inf)
+            peaks.flat[np.argmax(vals)] = True
+    markers = spim.label(peaks)[0]
+    regions = watershed(image=-dt, markers=markers, mask=mask)
+    return regions
+
+
+def _new_pores(regions, dt, first, offset):
+    r"""
+    Measures the regions labelled ``first`` and above in a box of the image
+    whose corner lies at ``offset``, which must contain them entirely
+    """
+    local = np.where(regions >= first, regions - first + 1, 0)
+    Np = int(local.max())
+    ldt = edt(local, black_border=True, parallel=settings.ncores)
+    shape = local.shape + (1, )*(3 - local.ndim)
+    lower, upper = _box_bounds(shape)
+    nchunks = _moment_chunks(Np, shape[0])
+    vol, csum, dt_max, ldt_max, surf = _pore_moments(
+        local.reshape(shape), np.reshape(dt, shape), ldt.reshape(shape),
+        Np, lower, upper, nchunks)
+    offset = np.append(offset, [0]*(3 - local.ndim))
+    csum = csum + vol[:, np.newaxis]*offset
+    pores = _pore_summary(vol, csum, dt_max, ldt_max, surf, ndim=local.ndim)
+    return pores._replace(label=np.where(pores.label > 0,
+                                         pores.label + first - 1, 0))
+
+
+def _kept_pores(net, rows, ndim, voxel_size):
+    r"""
+    Recovers the properties of the given pores of a network, in voxels,
+    as needed to find the lengths of the throats attached to them
+    """
+    tup = namedtuple('pores', ('label', 'centroid', 'volume',
+                               'inscribed_diameter', 'extended_diameter',
+                               'surface_area'))
+    return tup(
+        label=np.arange(1, rows.size + 1),
+        centroid=net['pore.coords'][rows, :ndim]/voxel_size,
+        volume=net['pore.volume'][rows]/voxel_size**3,
+        inscribed_diameter=net['pore.inscribed_diameter'][rows]/voxel_size,
+        extended_diameter=net['pore.extended_diameter'][rows]/voxel_size,
+        surface_area=net['pore.surface_area'][rows]/voxel_size**2)
+
+
+def _patch_network(old, new, Ni, rows, lut):
+    r"""
+    Combines a network ``new`` containing the new pores, all the throats
+    attached to them and the boundary pores with the kept pores and throats
+    of ``old``, whose first ``Ni`` pores are internal
+
+    The kept pores are the given ``rows`` of ``old`` and are placed first
+    with their original values, while the throats are sorted by their
+    connections.
+    """
+    K = rows.size
+    conns = old['throat.conns']
+    kept = np.all(conns < Ni, axis=1)
+    kept[kept] = np.all(lut[conns[kept] + 1] > 0, axis=1)
+    t_conns = np.vstack((lut[conns[kept] + 1].astype(np.int64) - 1,
+                         new['throat.conns']))
+    order = np.lexsort((t_conns[:, 1], t_conns[:, 0]))
+    net = {}
+    for key in new.keys():
+        if key.startswith('pore.'):
+            vals = np.array(new[key])
+            if (key in old) and (key != 'pore.label'):
+                vals[:K] = old[key][rows]
+        else:
+            vals = new[key]
+            if key in old:
+                vals = np.concatenate((old[key][kept], vals))
+            vals = vals[order]
+        net[key] = vals
+    net['throat.conns'] = t_conns[order]
+    return net
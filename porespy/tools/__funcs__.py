@@ -3,15 +3,20 @@ import numpy as np
 import scipy.ndimage as spim
 import warnings
 from edt import edt
+from numba import njit, prange
+from functools import lru_cache
 from collections import namedtuple
 from skimage.morphology import ball, disk
 from skimage.segmentation import relabel_sequential
 from array_split import shape_split, ARRAY_BOUNDS
+import scipy.fft as sp_fft
 from scipy.signal import fftconvolve
+from .__utils__ import Settings, get_precision
 try:
     from skimage.measure import marching_cubes
 except ImportError:
     from skimage.measure import marching_cubes_lewiner as marching_cubes
+settings = Settings()
 
 
 def align_image_with_openpnm(im):
@@ -110,13 +115,19 @@ def fftmorphology(im, strel, mode='opening'):
 
     """
 
+    # The convolution of two binary arrays is integer valued, so thresholding
+    # halfway between integers is robust to the round-off of either precision
+    dtype = get_precision()
+
     def erode(im, strel):
-        t = fftconvolve(im, strel, mode='same') > (strel.sum() - 0.1)
-        return t
+        with sp_fft.set_workers(settings.ncores):
+            t = fftconvolve(im.astype(dtype), strel.astype(dtype), mode='same')
+        return t > (strel.sum() - 0.5)
 
     def dilate(im, strel):
-        t = fftconvolve(im, strel, mode='same') > 0.1
-        return t
+        with sp_fft.set_workers(settings.ncores):
+            t = fftconvolve(im.astype(dtype), strel.astype(dtype), mode='same')
+        return t > 0.5
 
     if im.ndim != im.squeeze().ndim:    # pragma: no cover
         warnings.warn((
@@ -249,6 +260,195 @@ def bbox_to_slices(bbox):
     return ret
 
 
+def integral_image(im):
+    r"""
+    Computes the summed-area table of an image so that the sum of any
+    rectangular box can be found in constant time
+
+    Parameters
+    ----------
+    im : ND-array
+        The image to be summed.  Boolean images are treated as 0's and 1's.
+
+    Returns
+    -------
+    ii : ND-array
+        An array one element larger than ``im`` in each direction, with
+        ``ii[i, j, k]`` equal to ``im[:i, :j, :k].sum()``.  The smallest
+        integer type which cannot overflow is used for boolean and integer
+        images, and ``float64`` is used otherwise.
+
+    See Also
+    --------
+    box_sums
+
+    Notes
+    -----
+    The table can be computed once and reused for any number of queries
+    using ``box_sums``, for instance by passing it to
+    ``porespy.metrics.representative_elementary_volume``.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> from porespy.tools import integral_image
+    >>> im = np.ones([3, 4], dtype=bool)
+    >>> ii = integral_image(im)
+    >>> print(ii[-1, -1], ii.shape)
+    12 (4, 5)
+    """
+    im = np.asarray(im)
+    if im.dtype == bool or np.issubdtype(im.dtype, np.integer):
+        bound = im.size * max(abs(int(im.max(initial=0))),
+                              abs(int(im.min(initial=0))))
+        dtype = np.int32 if bound < 2**31 else np.int64
+    else:
+        dtype = np.float64
+    ii = np.zeros([s + 1 for s in im.shape], dtype=dtype)
+    ii[tuple([slice(1, None)]*im.ndim)] = im
+    for ax in range(im.ndim):
+        np.cumsum(ii, axis=ax, out=ii)
+    return ii
+
+
+def box_sums(ii, lower, upper):
+    r"""
+    Finds the sum of the image within each of a list of boxes using its
+    summed-area table
+
+    Parameters
+    ----------
+    ii : ND-array
+        The summed-area table of the image, as returned by
+        ``integral_image``.
+    lower : array_like
+        An N-by-ndim array containing the first index of each box along each
+        axis.
+    upper : array_like
+        An N-by-ndim array containing the index one past the end of each box
+        along each axis, so that box ``n`` of a 3D image covers
+        ``im[lower[n, 0]:upper[n, 0], lower[n, 1]:upper[n, 1], ...]``.
+
+    Returns
+    -------
+    sums : ND-array
+        An array of length N containing the sum within each box.
+
+    See Also
+    --------
+    integral_image
+
+    Notes
+    -----
+    Each sum is found from the 2**ndim corners of its box by
+    inclusion-exclusion, so the cost does not depend on the size of the
+    boxes and millions of boxes can be processed in one vectorized call.
+    Boxes are clipped to the image.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> from porespy.tools import integral_image, box_sums
+    >>> im = np.arange(12).reshape([3, 4])
+    >>> ii = integral_image(im)
+    >>> print(box_sums(ii, lower=[[0, 0], [1, 1]], upper=[[3, 4], [3, 3]]))
+    [66 30]
+    """
+    shape = np.array(ii.shape) - 1
+    lower = np.clip(np.atleast_2d(lower), 0, shape).astype(np.intp)
+    upper = np.clip(np.atleast_2d(upper), lower, shape).astype(np.intp)
+    ndim = ii.ndim
+    sums = np.zeros(lower.shape[0], dtype=ii.dtype)
+    for k in range(2**ndim):
+        pick = [(k >> ax) & 1 for ax in range(ndim)]
+        crds = tuple(upper[:, ax] if pick[ax] else lower[:, ax]
+                     for ax in range(ndim))
+        if (ndim - sum(pick)) % 2:
+            sums -= ii[crds]
+        else:
+            sums += ii[crds]
+    return sums
+
+
+def map_labels(labels, values, out=None, dtype=None):
+    r"""
+    Paints each labeled region of an image with its value from a lookup table
+
+    Parameters
+    ----------
+    labels : ND-array
+        An image of non-negative integer labels.
+    values : array_like
+        The value to insert into each region, indexed by label, so that
+        ``values[n]`` is placed where ``labels == n``.  Must contain an entry
+        for every label present in ``labels``, including 0.
+    out : ND-array, optional
+        An array the same shape as ``labels`` in which to write the result.
+        If given, the result is written into it in place, which avoids
+        allocating a new image when painting several sets of values in turn.
+    dtype : data-type, optional
+        The data type of the returned image.  If not given, the type of
+        ``out`` is used if provided, or else the type of ``values``.
+
+    Returns
+    -------
+    image : ND-array
+        An image the same shape as ``labels`` with each voxel containing the
+        value of its label.  If ``out`` was given it is returned.
+
+    Notes
+    -----
+    This is equivalent to ``values[labels]`` but the gather is done in
+    parallel using ``porespy.settings.ncores`` threads.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> import porespy as ps
+    >>> labels = np.array([[0, 1], [2, 1]])
+    >>> print(ps.tools.map_labels(labels, [0.0, 0.5, 2.0]))
+    [[0.  0.5]
+     [2.  0.5]]
+
+    """
+    labels = np.asarray(labels)
+    if labels.dtype == bool:
+        labels = labels.view(np.uint8)
+    if labels.dtype.kind not in 'iu':
+        raise Exception('labels must be an image of integers')
+    if dtype is None:
+        dtype = out.dtype if out is not None else np.asarray(values).dtype
+    lut = np.asarray(values, dtype=dtype).ravel()
+    if labels.size > 0:
+        if (labels.min() < 0) or (labels.max() >= lut.size):
+            raise Exception('values does not contain an entry for each label')
+    if out is None:
+        out = np.empty(labels.shape, dtype=dtype)
+    elif out.shape != labels.shape:
+        raise Exception('out must be the same shape as labels')
+    elif not out.flags['C_CONTIGUOUS']:
+        raise Exception('out must be a C-contiguous array')
+    if lut.dtype != out.dtype:
+        lut = lut.astype(out.dtype)
+    if lut.dtype == bool:
+        lut = lut.view(np.uint8)
+        target = out.view(np.uint8)
+    else:
+        target = out
+    flat = labels.reshape(-1)
+    nchunks = max(1, min(settings.ncores, flat.size))
+    _map_labels_kernel(flat, lut, target.reshape(-1), nchunks)
+    return out
+
+
+@njit(parallel=True)
+def _map_labels_kernel(labels, lut, out, nchunks):  # pragma: no cover
+    N = labels.size
+    for t in prange(nchunks):
+        for i in range(t * N // nchunks, (t + 1) * N // nchunks):
+            out[i] = lut[labels[i]]
+
+
 def find_outer_region(im, r=0):
     r"""
     Finds regions of the image that are outside of the solid matrix.
@@ -279,16 +479,16 @@ def find_outer_region(im, r=0):
 
     """
     if r == 0:
-        dt = edt(input=im)
+        dt = edt(input=im, parallel=settings.ncores)
         r = int(np.amax(dt)) * 2
     im_padded = np.pad(array=im, pad_width=r, mode='constant',
                        constant_values=True)
-    dt = edt(input=im_padded)
+    dt = edt(input=im_padded, parallel=settings.ncores)
     seeds = (dt >= r) + get_border(shape=im_padded.shape)
     # Remove seeds not connected to edges
     labels = spim.label(seeds)[0]
     mask = labels == 1  # Assume label of 1 on edges, assured by adding border
-    dt = edt(~mask)
+    dt = edt(~mask, parallel=settings.ncores)
     outer_region = dt < r
     outer_region = extract_subsection(im=outer_region, shape=im.shape)
     return outer_region
@@ -736,6 +936,7 @@ def norm_to_uniform(im, scale=None):
     """
     if scale is None:
         scale = [im.min(), im.max()]
+    im = np.asarray(im, dtype=get_precision())
     im = (im - np.mean(im)) / np.std(im)
     im = 1 / 2 * sp.special.erfc(-im / np.sqrt(2))
     im = (im - im.min()) / (im.max() - im.min())
@@ -1000,32 +1201,162 @@ def insert_sphere(im, c, r, v=True, overwrite=True):
     if im.dtype != type(v):
         im = im.astype(type(v))
     # Parse the arugments
-    r = int(sp.around(r, decimals=0))
+    r = int(np.around(r, decimals=0))
     if r == 0:
         return im
     c = np.array(c, dtype=int)
     if c.size != im.ndim:
         raise Exception('Coordinates do not match dimensionality of image')
-    # Define a bounding box around inserted sphere, minding imaage boundaries
-    bbox = []
-    [bbox.append(np.clip(c[i] - r, 0, im.shape[i])) for i in range(im.ndim)]
-    [bbox.append(np.clip(c[i] + r, 0, im.shape[i])) for i in range(im.ndim)]
-    bbox = np.ravel(bbox)
-    # Obtain slices into image
-    s = bbox_to_slices(bbox)
-    # Generate sphere template within image boundaries
-    blank = np.ones_like(im[s], dtype=int)
-    blank[tuple(c - bbox[0:im.ndim])] = 0
-    sph = edt(blank) < r
-    if overwrite:  # Clear voxles under sphere to be zero
-        temp = im[s] * sph > 0
-        im[s][temp] = 0
-    else:  # Clear portions of sphere to prevent overwriting
-        sph *= im[s] == 0
-    im[s] = im[s] + sph * v
+    im = insert_spheres(im, centers=[c], radii=r, values=v,
+                        overwrite=overwrite)
     return im
 
 
+def insert_spheres(im, centers, radii, values=True, overwrite=True,
+                   smooth=True):
+    r"""
+    Inserts many spheres (or disks) into an image in a single pass
+
+    Parameters
+    ----------
+    im : ND-array
+        The 2D or 3D image into which the spheres should be inserted.  The
+        image is modified in place.
+    centers : array_like
+        An N-by-ndim array of the [x, y, z] coordinates of the sphere centers.
+        Centers lying outside the image are allowed, in which case only the
+        portion of the sphere that overlaps the image is inserted.
+    radii : scalar or array_like
+        The radius of each sphere, or a single value to apply to all of them.
+    values : scalar or array_like
+        The value to put into the voxels of each sphere, or a single value to
+        apply to all of them.  The default is ``True``.  The values are cast
+        to the ``dtype`` of ``im``.
+    overwrite : boolean
+        If ``True`` (default) then the spheres overwrite whatever values are
+        present in ``im``.  If ``False`` then the sphere values are only
+        inserted into locations that are 0 or ``False``.  Where spheres
+        overlap the one appearing last in ``centers`` takes precedence.
+    smooth : boolean
+        If ``True`` (default) the spheres will not have the little bumps on
+        each face, as in ``ps_round``.
+
+    Returns
+    -------
+    image : ND-array
+        The original image with the spheres inserted.
+
+    Notes
+    -----
+    Rather than computing a distance transform for each sphere, a template
+    containing the half-length of each chord through a sphere of a given
+    radius is computed once and cached, then a ``numba`` kernel writes each
+    chord directly into the image, clipping it at the image boundaries. The
+    work is divided among threads by image slice, so the result does not
+    depend on the number of threads used.
+
+    Examples
+    --------
+    >>> import porespy as ps
+    >>> import numpy as np
+    >>> im = np.zeros([50, 50], dtype=bool)
+    >>> im = ps.tools.insert_spheres(im, centers=[[10, 10], [40, 0]],
+    ...                              radii=[5, 8])
+    >>> im[:21, :21].sum() == ps.tools.ps_disk(5).sum()
+    True
+    """
+    im = np.asarray(im)
+    if im.ndim not in [2, 3]:
+        raise Exception('Only 2D and 3D images are supported')
+    centers = np.array(centers, dtype=int, ndmin=2)
+    if centers.shape[1] != im.ndim:
+        raise Exception('Coordinates do not match dimensionality of image')
+    N = centers.shape[0]
+    radii = np.broadcast_to(np.array(radii, dtype=float), (N, ))
+    values = np.broadcast_to(np.array(values).astype(im.dtype), (N, ))
+    keep = radii > 0
+    centers, radii, values = centers[keep], radii[keep], values[keep]
+    if centers.shape[0] == 0:
+        return im
+    # A 2D image is treated as a 3D image with a singleton 2nd axis, so the
+    # equatorial chords of the 3D templates give the disks
+    if im.ndim == 2:
+        im3d = im[:, np.newaxis, :]
+        centers = np.insert(centers, 1, 0, axis=1)
+    else:
+        im3d = im
+    # Gather the cached template for each unique radius into a single array
+    rads, inds = np.unique(radii, return_inverse=True)
+    templates = [_get_sphere_template(r, smooth) for r in rads]
+    ext = np.array([(t.shape[0] - 1)//2 for t in templates], dtype=np.int64)
+    offset = np.cumsum([0] + [t.size for t in templates])[:-1]
+    flat = np.concatenate([t.ravel() for t in templates]).astype(np.int64)
+    ext, offset = ext[inds], offset[inds].astype(np.int64)
+    # Find the spheres that intersect each slice along the first axis, in
+    # the order they were given
+    lo = np.clip(centers[:, 0] - ext, 0, im3d.shape[0])
+    hi = np.clip(centers[:, 0] + ext + 1, 0, im3d.shape[0])
+    counts = np.maximum(hi - lo, 0)
+    sph = np.repeat(np.arange(centers.shape[0]), counts)
+    rows = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts,
+                                               counts)
+    rows += np.repeat(lo, counts)
+    sph = sph[np.argsort(rows, kind='stable')]
+    indptr = np.zeros(im3d.shape[0] + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(rows, minlength=im3d.shape[0]))
+    _insert_spheres_kernel(im3d, centers.astype(np.int64), ext, offset, flat,
+                           np.ascontiguousarray(values), sph, indptr,
+                           overwrite)
+    return im
+
+
+@lru_cache(maxsize=256)
+def _get_sphere_template(r, smooth=True):
+    r"""
+    Returns the half-length of every chord along the last axis of a sphere
+
+    The template is a 2D array indexed by the offsets along the first two
+    axes, with -1 indicating that no chord exists at that location.  Since
+    the equatorial row gives the chords of a disk, the same template serves
+    both 2D and 3D images.
+    """
+    R = int(np.ceil(r))
+    x = np.arange(-R, R + 1)
+    rem = r**2 - (x[:, np.newaxis]**2 + x[np.newaxis, :]**2)
+    h = np.floor(np.sqrt(np.clip(rem, 0, None))).astype(np.int64)
+    # Guard against round-off in the square root
+    h[(h + 1)**2 <= rem] += 1
+    h[h**2 > rem] -= 1
+    if smooth:
+        h[h**2 >= rem] -= 1
+    h[rem < 0] = -1
+    h.flags.writeable = False
+    return h
+
+
+@njit(parallel=True)
+def _insert_spheres_kernel(im, centers, ext, offset, templates, values,
+                           sph, indptr, overwrite):  # pragma: no cover
+    Nx, Ny, Nz = im.shape
+    for x in prange(Nx):
+        for k in range(indptr[x], indptr[x + 1]):
+            n = sph[k]
+            R = ext[n]
+            row = offset[n] + (x - centers[n, 0] + R)*(2*R + 1)
+            for dy in range(-R, R + 1):
+                y = centers[n, 1] + dy
+                if (y < 0) or (y >= Ny):
+                    continue
+                h = templates[row + dy + R]
+                if h < 0:
+                    continue
+                z0 = max(centers[n, 2] - h, 0)
+                z1 = min(centers[n, 2] + h + 1, Nz)
+                for z in range(z0, z1):
+                    if overwrite or (im[x, y, z] == 0):
+                        im[x, y, z] = values[n]
+
+
 def insert_cylinder(im, xyz0, xyz1, r):
     r"""
     Inserts a cylinder of given radius onto a given image
@@ -1082,6 +1413,189 @@ def insert_cylinder(im, xyz0, xyz1, r):
     return im
 
 
+def insert_cylinders(im, xyz0, xyz1, r, v=True, overwrite=True, smooth=True,
+                     caps=True):
+    r"""
+    Inserts many cylinders (or capsules) into an image in a single pass
+
+    Parameters
+    ----------
+    im : ND-array
+        The 2D or 3D image into which the cylinders should be inserted.  The
+        image is modified in place.
+    xyz0, xyz1 : array_like
+        N-by-ndim arrays containing the coordinates of the two end points of
+        each cylinder, in voxels.  The end points do not need to be integers
+        and may lie outside the image, in which case only the portion of the
+        cylinder lying within the image is inserted.
+    r : scalar or array_like
+        The radius of each cylinder, or a single value to apply to all of them.
+    v : scalar or array_like
+        The value to put into the voxels of each cylinder, or a single value
+        to apply to all of them.  The default is ``True``.  The values are
+        cast to the ``dtype`` of ``im``.
+    overwrite : boolean
+        If ``True`` (default) then the cylinders overwrite whatever values are
+        present in ``im``.  If ``False`` then the values are only inserted into
+        locations that are 0 or ``False``.  Where cylinders overlap the one
+        appearing last takes precedence.
+    smooth : boolean
+        If ``True`` (default) voxels lying exactly ``r`` from the axis of the
+        cylinder are excluded, as in ``ps_round``.
+    caps : boolean
+        If ``True`` (default) each cylinder is capped by a hemisphere at both
+        ends (i.e. a capsule), which gives smooth joints between cylinders
+        sharing an end point.  If ``False`` the cylinders have flat ends.
+
+    Returns
+    -------
+    image : ND-array
+        The original image with the cylinders inserted.
+
+    Notes
+    -----
+    The image is divided into cubic tiles and each cylinder is assigned to
+    the tiles lying within ``r`` of its axis.  The tiles are then processed
+    in parallel by a ``numba`` kernel which tests each voxel against the
+    cylinders assigned to its tile, so the cost scales with the volume of the
+    cylinders rather than the number of cylinders times the image size.
+
+    Examples
+    --------
+    >>> import porespy as ps
+    >>> import numpy as np
+    >>> im = np.zeros([20, 20, 20], dtype=bool)
+    >>> im = ps.tools.insert_cylinders(im, xyz0=[[0, 10, 10]],
+    ...                                xyz1=[[19, 10, 10]], r=3, caps=False)
+    >>> im.sum() == 20*ps.tools.ps_disk(3).sum()
+    True
+    """
+    im = np.asarray(im)
+    if im.ndim not in [2, 3]:
+        raise Exception('Only 2D and 3D images are supported')
+    xyz0 = np.array(xyz0, dtype=float, ndmin=2)
+    xyz1 = np.array(xyz1, dtype=float, ndmin=2)
+    if (xyz0.shape != xyz1.shape) or (xyz0.shape[1] != im.ndim):
+        raise Exception('Coordinates do not match dimensionality of image')
+    N = xyz0.shape[0]
+    r = np.broadcast_to(np.array(r, dtype=float), (N, ))
+    v = np.broadcast_to(np.array(v).astype(im.dtype), (N, ))
+    # A 2D image is treated as a 3D image with a singleton last axis
+    if im.ndim == 2:
+        im3d = im[..., np.newaxis]
+        xyz0 = np.hstack((xyz0, np.zeros((N, 1))))
+        xyz1 = np.hstack((xyz1, np.zeros((N, 1))))
+    else:
+        im3d = im
+    shape = np.array(im3d.shape)
+    # Find the bounding box of each cylinder, clipped to the image
+    lo = np.floor(np.minimum(xyz0, xyz1) - r[:, np.newaxis]).astype(np.int64)
+    hi = np.ceil(np.maximum(xyz0, xyz1) + r[:, np.newaxis]).astype(np.int64)
+    lo = np.clip(lo, 0, shape)
+    hi = np.clip(hi + 1, 0, shape)
+    keep = np.where(np.all(hi > lo, axis=1) * (r >= 0))[0]
+    if keep.size == 0:
+        return im
+    tile = 16
+    ntiles = np.ceil(shape/tile).astype(np.int64)
+    tiles, segs = _find_cylinder_tiles(xyz0, xyz1, r, lo, hi, keep, tile,
+                                       ntiles)
+    # Group the cylinders by tile, preserving the order they were given
+    order = np.argsort(tiles, kind='stable')
+    tiles, segs = tiles[order], segs[order]
+    tiles, start = np.unique(tiles, return_index=True)
+    indptr = np.append(start, segs.size).astype(np.int64)
+    _insert_cylinders_kernel(im3d, xyz0, xyz1, r, np.ascontiguousarray(v),
+                             lo, hi, tiles, indptr, segs, tile, ntiles,
+                             overwrite, smooth, caps)
+    return im
+
+
+@njit
+def _segment_dist2(px, py, pz, a, b, caps):  # pragma: no cover
+    r"""
+    Returns the squared distance from a point to the segment between a and b
+    or -1 if caps is False and the point lies beyond the ends of the segment
+    """
+    abx, aby, abz = b[0] - a[0], b[1] - a[1], b[2] - a[2]
+    apx, apy, apz = px - a[0], py - a[1], pz - a[2]
+    L2 = abx*abx + aby*aby + abz*abz
+    t = 0.0
+    if L2 > 0:
+        t = (apx*abx + apy*aby + apz*abz)/L2
+    if not caps and ((t < 0) or (t > 1)):
+        return -1.0
+    t = min(max(t, 0.0), 1.0)
+    dx, dy, dz = apx - t*abx, apy - t*aby, apz - t*abz
+    return dx*dx + dy*dy + dz*dz
+
+
+@njit
+def _find_cylinder_tiles(a, b, r, lo, hi, keep, tile, ntiles):  # pragma: no cover
+    # The radius of the sphere enclosing a tile, to make the test conservative
+    e = (tile - 1)/2
+    pad = e*np.sqrt(3.0)
+    tiles = []
+    segs = []
+    for n in keep:
+        for tx in range(lo[n, 0]//tile, (hi[n, 0] - 1)//tile + 1):
+            for ty in range(lo[n, 1]//tile, (hi[n, 1] - 1)//tile + 1):
+                for tz in range(lo[n, 2]//tile, (hi[n, 2] - 1)//tile + 1):
+                    d2 = _segment_dist2(tx*tile + e, ty*tile + e, tz*tile + e,
+                                        a[n], b[n], True)
+                    if d2 <= (r[n] + pad)**2:
+                        tiles.append((tx*ntiles[1] + ty)*ntiles[2] + tz)
+                        segs.append(n)
+    return np.array(tiles, dtype=np.int64), np.array(segs, dtype=np.int64)
+
+
+@njit(parallel=True)
+def _insert_cylinders_kernel(im, a, b, r, values, lo, hi, tiles, indptr,
+                             segs, tile, ntiles, overwrite, smooth,
+                             caps):  # pragma: no cover
+    for k in prange(tiles.size):
+        tz = tiles[k] % ntiles[2]
+        ty = (tiles[k]//ntiles[2]) % ntiles[1]
+        tx = tiles[k]//(ntiles[1]*ntiles[2])
+        for j in range(indptr[k], indptr[k + 1]):
+            n = segs[j]
+            r2 = r[n]**2
+            # Unit vector along the axis, used to bound the range of z
+            u = b[n] - a[n]
+            L = np.sqrt(u[0]**2 + u[1]**2 + u[2]**2)
+            if L > 0:
+                u = u/L
+            for x in range(max(tx*tile, lo[n, 0]), min(tx*tile + tile, hi[n, 0])):
+                for y in range(max(ty*tile, lo[n, 1]),
+                               min(ty*tile + tile, hi[n, 1])):
+                    z0 = max(tz*tile, lo[n, 2])
+                    z1 = min(tz*tile + tile, hi[n, 2])
+                    if L > 0:
+                        # Every voxel within r of the segment is also within
+                        # r of the infinite line, which is a quadratic in z
+                        wx, wy, wz = x - a[n, 0], y - a[n, 1], -a[n, 2]
+                        wu = wx*u[0] + wy*u[1] + wz*u[2]
+                        A = 1 - u[2]**2
+                        B = 2*(wz - wu*u[2])
+                        C = wx**2 + wy**2 + wz**2 - wu**2 - r2
+                        if A > 1e-9:
+                            disc = B**2 - 4*A*C
+                            if disc < 0:
+                                continue
+                            disc = np.sqrt(disc)
+                            z0 = max(z0, int(np.floor((-B - disc)/(2*A))) - 1)
+                            z1 = min(z1, int(np.ceil((-B + disc)/(2*A))) + 2)
+                        elif C > 1e-9:
+                            continue
+                    for z in range(z0, z1):
+                        d2 = _segment_dist2(x, y, z, a[n], b[n], caps)
+                        if d2 < 0:
+                            continue
+                        if (d2 < r2) or ((not smooth) and (d2 == r2)):
+                            if overwrite or (im[x, y, z] == 0):
+                                im[x, y, z] = values[n]
+
+
 def pad_faces(im, faces):
     r"""
     Pads the input image at specified faces. This shape of image is
@@ -13,6 +13,7 @@ that do NOT return a modified version of the original image.
 
     porespy.tools.align_image_with_openpnm
     porespy.tools.bbox_to_slices
+    porespy.tools.box_sums
     porespy.tools.extend_slice
     porespy.tools.extract_subsection
     porespy.tools.extract_regions
@@ -23,9 +24,13 @@ that do NOT return a modified version of the original image.
     porespy.tools.get_border
     porespy.tools.get_planes
     porespy.tools.insert_cylinder
+    porespy.tools.insert_cylinders
     porespy.tools.insert_sphere
+    porespy.tools.insert_spheres
     porespy.tools.in_hull
+    porespy.tools.integral_image
     porespy.tools.make_contiguous
+    porespy.tools.map_labels
     porespy.tools.mesh_region
     porespy.tools.norm_to_uniform
     porespy.tools.overlay
@@ -35,6 +40,7 @@ that do NOT return a modified version of the original image.
     porespy.tools.ps_round
     porespy.tools.pad_faces
     porespy.tools.randomize_colors
+    porespy.tools.RegionAdjacencyGraph
     porespy.tools.seq_to_satn
     porespy.tools.size_to_seq
     porespy.tools.subdivide
@@ -42,6 +48,7 @@ that do NOT return a modified version of the original image.
 
 .. autofunction:: align_image_with_openpnm
 .. autofunction:: bbox_to_slices
+.. autofunction:: box_sums
 .. autofunction:: extend_slice
 .. autofunction:: extract_cylinder
 .. autofunction:: extract_regions
@@ -51,9 +58,13 @@ that do NOT return a modified version of the original image.
 .. autofunction:: get_border
 .. autofunction:: get_planes
 .. autofunction:: insert_cylinder
+.. autofunction:: insert_cylinders
 .. autofunction:: insert_sphere
+.. autofunction:: insert_spheres
 .. autofunction:: in_hull
+.. autofunction:: integral_image
 .. autofunction:: make_contiguous
+.. autofunction:: map_labels
 .. autofunction:: mesh_region
 .. autofunction:: norm_to_uniform
 .. autofunction:: overlay
@@ -63,6 +74,8 @@ that do NOT return a modified version of the original image.
 .. autofunction:: ps_round
 .. autofunction:: pad_faces
 .. autofunction:: randomize_colors
+.. autoclass:: RegionAdjacencyGraph
+   :members:
 .. autofunction:: seq_to_satn
 .. autofunction:: size_to_seq
 .. autofunction:: subdivide
@@ -73,6 +86,7 @@ that do NOT return a modified version of the original image.
 
 from .__funcs__ import align_image_with_openpnm
 from .__funcs__ import bbox_to_slices
+from .__funcs__ import box_sums
 from .__funcs__ import _create_alias_map
 from .__funcs__ import extend_slice
 from .__funcs__ import extract_cylinder
@@ -83,9 +97,13 @@ from .__funcs__ import find_outer_region
 from .__funcs__ import get_border
 from .__funcs__ import get_planes
 from .__funcs__ import insert_cylinder
+from .__funcs__ import insert_cylinders
 from .__funcs__ import insert_sphere
+from .__funcs__ import insert_spheres
 from .__funcs__ import in_hull
+from .__funcs__ import integral_image
 from .__funcs__ import make_contiguous
+from .__funcs__ import map_labels
 from .__funcs__ import mesh_region
 from .__funcs__ import norm_to_uniform
 from .__funcs__ import overlay
@@ -100,5 +118,7 @@ from .__funcs__ import size_to_seq
 from .__funcs__ import subdivide
 from .__funcs__ import zero_corners
 from .__funcs__ import sanitize_filename
+from .__rag__ import RegionAdjacencyGraph
 from .__utils__ import get_tqdm
+from .__utils__ import get_precision
 from .__utils__ import show_docstring
@@ -0,0 +1,257 @@
+import numpy as np
+import scipy.sparse as sprs
+from numba import njit, prange
+from .__utils__ import Settings
+settings = Settings()
+
+
+class RegionAdjacencyGraph():
+    r"""
+    The graph of which labeled regions of an image touch each other
+
+    The graph is found in a single pass over the image, in which each voxel
+    is compared with its face-sharing neighbors.  The voxels of region ``j``
+    which touch a region ``i < j`` form the interface between them.
+
+    Parameters
+    ----------
+    regions : ND-array
+        An image of labeled regions, with 0 indicating the background which
+        is not part of any region.
+    voxels : bool
+        If ``True`` the flat indices of the interface voxels of each pair of
+        regions are stored as well, which is needed by consumers that
+        measure the interfaces, such as ``regions_to_network``.  The default
+        is ``False``.
+
+    Attributes
+    ----------
+    shape : tuple
+        The shape of the image from which the graph was found.
+    num_regions : int
+        The number of regions, being the largest label in the image.
+    conns : ND-array
+        An N-by-2 array of the (0-based) indices of each pair of adjacent
+        regions, sorted by the first then the second column, so region
+        ``n`` has label ``n + 1``.  Each row is an edge of the graph.
+    counts : ND-array
+        The number of interface voxels of each edge.
+    indptr, indices, edges : ND-array
+        The graph in compressed sparse row form, so the neighbors of region
+        ``n`` are ``indices[indptr[n]:indptr[n+1]]`` and the edges joining
+        them to ``n`` are ``edges[indptr[n]:indptr[n+1]]``.  Each edge
+        appears in the rows of both its regions.
+    voxels : ND-array or None
+        The flat indices into the image of the interface voxels of all edges,
+        in edge order and ascending order within each edge, or ``None`` if
+        not requested.
+    voxel_ptr : ND-array or None
+        The interface voxels of edge ``e`` are
+        ``voxels[voxel_ptr[e]:voxel_ptr[e+1]]``.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> import porespy as ps
+    >>> im = np.array([[1, 1, 2],
+    ...                [1, 3, 2],
+    ...                [0, 3, 3]])
+    >>> rag = ps.tools.RegionAdjacencyGraph(im)
+    >>> print(rag.conns)
+    [[0 1]
+     [0 2]
+     [1 2]]
+    >>> print(rag.neighbors(2))
+    [0 1]
+
+    """
+
+    def __init__(self, regions, voxels=False):
+        conns, vox, starts = _adjacent_voxels(regions)
+        N = int(regions.max()) if regions.size > 0 else 0
+        self.shape = regions.shape
+        self.num_regions = N
+        self.conns = conns
+        ptr = np.append(starts, vox.size)
+        self.counts = np.diff(ptr)
+        self.voxels = vox if voxels else None
+        self.voxel_ptr = ptr if voxels else None
+        Ne = conns.shape[0]
+        i = np.concatenate((conns[:, 0], conns[:, 1]))
+        j = np.concatenate((conns[:, 1], conns[:, 0]))
+        order = np.lexsort((j, i))
+        self.indices = j[order]
+        self.edges = np.concatenate((np.arange(Ne), np.arange(Ne)))[order]
+        self.indptr = np.concatenate(([0], np.cumsum(np.bincount(i, minlength=N))))
+
+    @property
+    def num_edges(self):
+        r"""
+        The number of pairs of adjacent regions
+        """
+        return self.conns.shape[0]
+
+    def neighbors(self, n):
+        r"""
+        Returns the (0-based) indices of the regions adjacent to region ``n``
+        """
+        return self.indices[self.indptr[n]:self.indptr[n + 1]]
+
+    def edge_voxels(self, e):
+        r"""
+        Returns the flat indices of the interface voxels of edge ``e``
+        """
+        if self.voxels is None:
+            raise Exception('The graph was built without voxels=True')
+        return self.voxels[self.voxel_ptr[e]:self.voxel_ptr[e + 1]]
+
+    def to_sparse(self):
+        r"""
+        Returns the graph as a symmetric ``scipy.sparse.csr_matrix`` with the
+        number of interface voxels of each edge as its values
+        """
+        N = self.num_regions
+        return sprs.csr_matrix((self.counts[self.edges], self.indices,
+                                self.indptr), shape=(N, N))
+
+
+def _adjacent_voxels(im, lower=None, upper=None, nchunks=None):
+    r"""
+    Finds the voxels forming the interface between each pair of adjacent
+    regions
+
+    Each voxel is compared with its face-sharing neighbors, and the voxels of
+    region ``j`` which touch a region ``i < j`` form the interface between
+    them.
+
+    Parameters
+    ----------
+    im : ND-array
+        An image of the pore space partitioned into labeled regions, with 0
+        indicating the solid phase.
+    lower, upper : array_like, optional
+        The corners of the box of voxels to scan for throat voxels.  Their
+        neighbors outside the box are still consulted.  The default is to
+        scan the whole image.
+    nchunks : int, optional
+        The number of threads among which the box is divided.  The default
+        is ``porespy.settings.ncores``.
+
+    Returns
+    -------
+    conns : ND-array
+        An N-by-2 array of the (0-based) indices of each pair of adjacent
+        regions, sorted by the first then the second column.
+    voxels : ND-array
+        The flat indices into ``im`` of the interface voxels of all pairs, in
+        the order of ``conns`` and in ascending order within each pair.
+    starts : ND-array
+        The location in ``voxels`` at which the voxels of each pair start.
+
+    """
+    im3 = im.reshape(im.shape + (1, )*(3 - im.ndim))
+    lower, upper = _box_bounds(im3.shape, lower, upper)
+    if nchunks is None:
+        nchunks = max(1, min(settings.ncores, upper[0] - lower[0]))
+    counts = _adjacent_voxel_count(im3, lower, upper, nchunks)
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    voxels, lo, hi = _adjacent_voxel_fill(im3, lower, upper, nchunks, offsets)
+    order = np.lexsort((voxels, hi, lo))
+    voxels, lo, hi = voxels[order], lo[order], hi[order]
+    new = np.ones(voxels.size, dtype=bool)
+    new[1:] = (lo[1:] != lo[:-1]) | (hi[1:] != hi[:-1])
+    starts = np.flatnonzero(new)
+    conns = np.vstack((lo[starts], hi[starts])).T.astype(np.int64) - 1
+    return conns, voxels, starts
+
+
+def _box_bounds(shape, lower=None, upper=None):
+    r"""
+    Returns the corners of a box within an image of the given 3D shape as
+    arrays of length 3, defaulting to the whole image
+    """
+    lower = np.zeros(3, dtype=np.int64) if lower is None else lower
+    upper = np.array(shape) if upper is None else upper
+    lower = np.append(lower, [0]*(3 - len(lower))).astype(np.int64)
+    upper = np.append(upper, [1]*(3 - len(upper))).astype(np.int64)
+    return lower, upper
+
+
+@njit(parallel=True)
+def _adjacent_voxel_count(im, lower, upper, nchunks):  # pragma: no cover
+    x0, x1 = lower[0], upper[0]
+    counts = np.zeros(nchunks, dtype=np.int64)
+    for t in prange(nchunks):
+        nbrs = np.zeros(6, dtype=im.dtype)
+        n = 0
+        for x in range(x0 + t*(x1 - x0)//nchunks,
+                       x0 + (t + 1)*(x1 - x0)//nchunks):
+            for y in range(lower[1], upper[1]):
+                for z in range(lower[2], upper[2]):
+                    n += _lower_neighbors(im, x, y, z, nbrs)
+        counts[t] = n
+    return counts
+
+
+@njit(parallel=True)
+def _adjacent_voxel_fill(im, lower, upper, nchunks, offsets):  # pragma: no cover
+    X, Y, Z = im.shape
+    x0, x1 = lower[0], upper[0]
+    N = offsets[-1]
+    voxels = np.empty(N, dtype=np.int64)
+    lo = np.empty(N, dtype=im.dtype)
+    hi = np.empty(N, dtype=im.dtype)
+    for t in prange(nchunks):
+        nbrs = np.zeros(6, dtype=im.dtype)
+        k = offsets[t]
+        for x in range(x0 + t*(x1 - x0)//nchunks,
+                       x0 + (t + 1)*(x1 - x0)//nchunks):
+            for y in range(lower[1], upper[1]):
+                for z in range(lower[2], upper[2]):
+                    n = _lower_neighbors(im, x, y, z, nbrs)
+                    for m in range(n):
+                        voxels[k] = (x*Y + y)*Z + z
+                        lo[k] = nbrs[m]
+                        hi[k] = im[x, y, z]
+                        k += 1
+    return voxels, lo, hi
+
+
+@njit
+def _lower_neighbors(im, x, y, z, nbrs):  # pragma: no cover
+    r"""
+    Writes the distinct nonzero labels lower than that of voxel (x, y, z)
+    among its face-sharing neighbors into ``nbrs`` and returns their number
+    """
+    X, Y, Z = im.shape
+    v = im[x, y, z]
+    n = 0
+    if v == 0:
+        return n
+    for d in range(6):
+        i, j, k = x, y, z
+        if d == 0:
+            i -= 1
+        elif d == 1:
+            i += 1
+        elif d == 2:
+            j -= 1
+        elif d == 3:
+            j += 1
+        elif d == 4:
+            k -= 1
+        else:
+            k += 1
+        if (i < 0) or (i >= X) or (j < 0) or (j >= Y) or (k < 0) or (k >= Z):
+            continue
+        w = im[i, j, k]
+        if (w == 0) or (w >= v):
+            continue
+        seen = False
+        for m in range(n):
+            if nbrs[m] == w:
+                seen = True
+        if not seen:
+            nbrs[n] = w
+            n += 1
+    return n
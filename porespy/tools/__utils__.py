@@ -1,8 +1,33 @@
+import os
 import sys
+import numba
 import importlib
+import numpy as np
+from contextlib import contextmanager
 from dataclasses import dataclass
 
 
+def _cpu_count():
+    r"""
+    Returns the number of cores available to this process, which respects
+    any affinity mask (e.g. ``taskset`` or a cgroup cpuset) where supported.
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover
+        return os.cpu_count()
+
+
+def _set_num_threads(n):
+    r"""
+    Sets the number of threads used by ``numba`` in the calling thread,
+    limited to the size of its thread pool.  This setting is local to each
+    thread, so it must be applied within any worker thread that calls a
+    parallel ``numba`` function.
+    """
+    numba.set_num_threads(max(1, min(n, numba.config.NUMBA_NUM_THREADS)))
+
+
 @dataclass
 class Settings:
     r"""
@@ -25,6 +50,22 @@ class Settings:
         the most important is ``'disable'`` which when set to ``True`` will
         silence the progress bars.  It's also possible to adjust the formatting
         such as ``'colour'`` and ``'ncols'``, which controls width.
+    precision : str
+        The floating point precision used for the large intermediate arrays
+        created throughout PoreSpy, such as distance transforms, porosimetry
+        results and noise fields.  Options are ``'float64'`` (default) and
+        ``'float32'``.  Using ``'float32'`` halves the memory footprint and
+        bandwidth of these arrays at the cost of some numerical accuracy,
+        which is usually negligible for voxel-scale quantities.
+    ncores : int
+        The number of cores that PoreSpy is allowed to use.  This is passed
+        to ``edt`` as its ``parallel`` argument, sets the number of ``numba``
+        threads, the number of ``scipy.fft`` workers, the number of
+        ``cKDTree`` query workers, and is the default number of ``dask``
+        workers used by ``chunked_func``.  Defaults to the number of cores
+        available to the process.  Setting it to ``None`` restores the
+        default.  Use ``settings.override(ncores=...)`` to change it
+        temporarily.
 
     """
     __instance__ = None
@@ -34,30 +75,80 @@ class Settings:
             'ncols': None,
             'leave': False,
             'file': sys.stdout}
+    precision = 'float64'
+    _ncores = _cpu_count()
 
     def __new__(cls):
         if Settings.__instance__ is None:
             Settings.__instance__ = super().__new__(cls)
         return Settings.__instance__
 
+    @property
+    def ncores(self):
+        return self._ncores
+
+    @ncores.setter
+    def ncores(self, val):
+        if val is None:
+            val = _cpu_count()
+        val = int(val)
+        if val < 1:
+            raise Exception('ncores must be a positive integer')
+        Settings._ncores = val
+        _set_num_threads(val)
+
+    @contextmanager
+    def override(self, **kwargs):
+        r"""
+        Context manager for temporarily changing one or more settings
+
+        Parameters
+        ----------
+        **kwargs
+            The settings to change, such as ``ncores=1``.  The original
+            values are restored on exit, even if an exception is raised.
+
+        Examples
+        --------
+        >>> import porespy as ps
+        >>> with ps.settings.override(ncores=1):
+        ...     print(ps.settings.ncores)
+        1
+        """
+        old = {}
+        for k, v in kwargs.items():
+            if not hasattr(self, k):
+                raise Exception(f'{k} is not a valid setting')
+            old[k] = getattr(self, k)
+        try:
+            for k, v in kwargs.items():
+                setattr(self, k, v)
+            yield self
+        finally:
+            for k, v in old.items():
+                setattr(self, k, v)
+
     def __repr__(self):
+        items = [i for i in self.__dir__() if not i.startswith('_')
+                 and not callable(getattr(self, i))]
         indent = 0
-        for item in self.__dir__():
-            if not item.startswith('_'):
-                indent = max(indent, len(item) + 1)
-        print(indent)
+        for item in items:
+            indent = max(indent, len(item) + 1)
         s = ''
-        for item in self.__dir__():
-            if not item.startswith('_'):
-                s += ''.join((item, ':', ' '*(indent-len(item))))
-                attr = getattr(self, item)
-                temp = ''.join((attr.__repr__(), '\n'))
-                if isinstance(attr, dict):
-                    temp = temp.replace(',', '\n' + ' '*(indent + 1))
-                s += temp
+        for item in items:
+            s += ''.join((item, ':', ' '*(indent-len(item))))
+            attr = getattr(self, item)
+            temp = ''.join((attr.__repr__(), '\n'))
+            if isinstance(attr, dict):
+                temp = temp.replace(',', '\n' + ' '*(indent + 1))
+            s += temp
         return s
 
 
+# Apply the default number of cores to numba in the importing thread
+Settings().ncores = None
+
+
 def get_tqdm():
     r"""
     Fetches a version of the ``tqdm`` function that depends on the environment
@@ -78,6 +169,32 @@ def get_tqdm():
     return tqdm.tqdm
 
 
+def get_precision():
+    r"""
+    Fetches the floating point ``dtype`` specified in ``settings.precision``
+
+    Returns
+    -------
+    dtype : numpy dtype
+        Either ``np.float32`` or ``np.float64``, which should be used when
+        allocating or casting floating point arrays.
+
+    Notes
+    -----
+    An ``Exception`` is raised if ``settings.precision`` is not a 32 or 64 bit
+    floating point type.
+    """
+    s = Settings()
+    try:
+        dtype = np.dtype(s.precision)
+    except TypeError:
+        raise Exception(f'Unrecognized precision: {s.precision}')
+    if dtype not in [np.float32, np.float64]:
+        raise Exception('settings.precision must be either float32 or float64'
+                        f', received {s.precision}')
+    return dtype.type
+
+
 def show_docstring(func):
     r"""
     Fetches the docstring for a function and returns it in markdown format
@@ -49,6 +49,40 @@ class MetricsTest():
         t = 0.2
         phi1 = ps.metrics.porosity(im=self.im3D)
         assert np.sqrt((np.mean(tpcf_fft.probability[-5:]) - phi1)**2) < t
+        # The bin index of large images is not kept in the cache
+        from porespy.metrics.__funcs__ import _cached_radial_bin_index
+        _cached_radial_bin_index.cache_clear()
+        ps.metrics.two_point_correlation_fft(np.ones([130, 130, 130]))
+        assert _cached_radial_bin_index.cache_info().currsize == 0
+
+    def test_tpcf_fft_directional(self):
+        tpcf = ps.metrics.two_point_correlation_fft(self.im3D)
+        tpcf_dir = ps.metrics.two_point_correlation_fft(self.im3D,
+                                                        directional=True)
+        assert tpcf_dir.probability.shape == (3, tpcf.distance.size)
+        # The cubic lattice is identical along each axis
+        assert np.allclose(tpcf_dir.probability[0], tpcf_dir.probability[1])
+        assert np.allclose(tpcf_dir.probability[0], tpcf_dir.probability[2])
+        with ps.settings.override(precision='float32'):
+            tpcf32 = ps.metrics.two_point_correlation_fft(self.im3D)
+        assert np.allclose(tpcf32.probability, tpcf.probability, atol=1e-4)
+
+    def test_correlation_functions(self):
+        cf = ps.metrics.correlation_functions(self.blobs,
+                                              functions=['S2', 'Fsv', 'Fss'])
+        tpcf = ps.metrics.two_point_correlation_fft(self.blobs)
+        phi = self.blobs.sum() / self.blobs.size
+        assert np.allclose(cf.distance, tpcf.distance)
+        assert np.allclose(cf.S2[True] / phi, tpcf.probability)
+        assert cf.Fss[True].shape == cf.distance.shape
+        assert cf.cross is None
+        labels = self.blobs*1 + (np.random.rand(*self.blobs.shape) < 0.5)
+        cf = ps.metrics.correlation_functions(labels, functions='cross',
+                                              directional=True)
+        assert set(cf.cross.keys()) == {(0, 1), (0, 2), (1, 2)}
+        assert cf.cross[(0, 1)].shape == (3, cf.distance.size)
+        with pytest.raises(Exception):
+            ps.metrics.correlation_functions(self.blobs, functions=['S3'])
 
     def test_pore_size_distribution(self):
         mip = ps.filters.porosimetry(self.im3D)
@@ -65,23 +99,97 @@ class MetricsTest():
         with pytest.warns(UserWarning):
             _ = ps.metrics.two_point_correlation_bf(np.atleast_3d(self.im2D))
 
+    def test_two_point_correlation_bf_directional(self):
+        im = np.zeros([60, 60], dtype=bool)
+        im[:, 20:40] = True
+        tpcf = ps.metrics.two_point_correlation_bf(im, spacing=1,
+                                                   directional=True)
+        assert tpcf.probability.shape == (2, tpcf.distance.size)
+        # A band along axis 0 is more correlated in that direction
+        assert np.all(tpcf.probability[0, 1:] > tpcf.probability[1, 1:])
+        tpcf3D = ps.metrics.two_point_correlation_bf(self.im3D, spacing=3,
+                                                     directional=True)
+        assert tpcf3D.probability.shape[0] == 3
+
     def test_rev(self):
         rev = ps.metrics.representative_elementary_volume(self.blobs)
         assert (np.mean(rev.porosity) - 0.5)**2 < 0.05
+        ii = ps.tools.integral_image(self.blobs)
+        rev = ps.metrics.representative_elementary_volume(self.blobs,
+                                                          npoints=100,
+                                                          integral=ii)
+        assert rev.volume.size == 100
+        assert np.all((rev.porosity >= 0) * (rev.porosity <= 1))
 
     def test_radial_density(self):
         den = ps.metrics.radial_density_distribution(self.blobs)
         assert den.cdf.max() == 1
+        dt = spim.distance_transform_edt(self.blobs)
+        dt_copy = np.copy(dt)
+        ps.metrics.radial_density_distribution(dt)
+        assert np.all(dt == dt_copy)
+
+    def test_streaming_histogram(self):
+        x = np.random.rand(1000)
+        hist = ps.metrics.StreamingHistogram(bins=10, range=(0, 1))
+        other = ps.metrics.StreamingHistogram(bins=10, range=(0, 1))
+        hist.add(x[:400])
+        other.add(x[400:])
+        hist += other
+        ref = np.histogram(x, bins=10, range=(0, 1), density=True)
+        assert np.allclose(hist.histogram(density=True)[0], ref[0])
+        assert np.allclose(hist.edges, ref[1])
+        with pytest.raises(Exception):
+            ps.metrics.StreamingHistogram(bins=10)
+        with pytest.raises(Exception):
+            hist.merge(ps.metrics.StreamingHistogram(bins=5, range=(0, 1)))
+        # Size distributions are unchanged by streaming over slabs
+        im = spim.distance_transform_edt(self.blobs)
+        psd = ps.metrics.pore_size_distribution(im, bins=10, log=False)
+        ref = np.histogram(im[im > 0], bins=10, density=True)
+        assert np.allclose(psd.pdf, ref[0])
 
     def test_props_to_DataFrame(self):
         label = spim.label(self.im2D)[0]
         rp = ps.metrics.regionprops_3D(label)
         ps.metrics.props_to_DataFrame(rp)
 
+    def test_regionprops_3D_props(self):
+        label = spim.label(self.im3D)[0]
+        rp = ps.metrics.regionprops_3D(label)
+        assert rp[0].dt is rp[0].dt
+        rp2 = ps.metrics.regionprops_3D(label, props=['sphericity', 'centroid'],
+                                        cores=2)
+        assert 'sphericity' in rp2[0]._cache
+        assert np.allclose([r.sphericity for r in rp],
+                           [r.sphericity for r in rp2])
+        assert np.allclose([r.centroid for r in rp],
+                           [r.centroid for r in rp2])
+        df = ps.metrics.props_to_DataFrame(rp2, props=['volume', 'sphericity'])
+        assert list(df.columns) == ['volume', 'sphericity']
+
+    def test_regions_to_DataFrame(self):
+        label = spim.label(self.im3D)[0]
+        rp = ps.metrics.regionprops_3D(label)
+        df = ps.metrics.regions_to_DataFrame(label, props=['label', 'volume',
+                                                           'centroid',
+                                                           'extent'])
+        assert list(df.columns) == ['label', 'volume', 'centroid-0',
+                                    'centroid-1', 'centroid-2', 'extent']
+        assert np.all(df['volume'] == [r.volume for r in rp])
+        assert np.allclose(df[['centroid-0', 'centroid-1', 'centroid-2']],
+                           [r.centroid for r in rp])
+        assert np.allclose(df['extent'], [r.extent for r in rp])
+        df = ps.metrics.regions_to_DataFrame(np.zeros_like(label))
+        assert len(df) == 0
+
     def test_prop_to_image(self):
         label = spim.label(self.im2D)[0]
         rp = ps.metrics.regionprops_3D(label)
-        ps.metrics.prop_to_image(rp, self.im2D.shape, 'solidity')
+        im = ps.metrics.prop_to_image(rp, self.im2D.shape, 'solidity')
+        for r in rp[:10]:
+            assert np.all(im[label == r.label] == r.solidity)
+        assert np.all(im[label == 0] == 0)
 
     def test_porosity_profile(self):
         im = ps.generators.lattice_spheres(shape=[999, 999],
@@ -151,6 +259,69 @@ class MetricsTest():
             im2D = (np.random.rand(5, 5) * 10).astype(int)
             _ = ps.metrics.region_interface_areas(np.atleast_3d(im2D), areas)
 
+    def test_region_interface_areas_3D_bounding_box(self):
+        im = np.zeros([20, 20, 40], dtype=int)
+        im[5:15, 5:15, 2:10] = 1
+        im[5:15, 5:15, 10:18] = 2
+        im[2:8, 2:8, 25:35] = 3
+        areas = ps.metrics.region_surface_areas(im)
+        ia = ps.metrics.region_interface_areas(im, areas)
+        assert np.all(ia.conns == [[0, 1]])
+        mesh = ps.tools.mesh_region((im == 1) + (im == 2))
+        a12 = ps.metrics.mesh_surface_area(mesh)
+        assert np.allclose(ia.area, 0.5*(areas[0] + areas[1] - a12))
+
+    def test_region_areas(self):
+        regions = self.regions
+        areas = ps.metrics.region_areas(regions)
+        old = ps.metrics.region_surface_areas(regions)
+        assert np.allclose(areas.surface_area, old, rtol=1e-4)
+        assert np.all(areas.conns[:, 0] < areas.conns[:, 1])
+        assert np.all(areas.area > 0)
+        ia = ps.metrics.region_areas(regions, conns=areas.conns[:, ::-1])
+        assert np.allclose(ia.area, areas.area)
+        # Area of a ball should be close to that of a true sphere
+        ball = np.pad(ps.tools.ps_ball(10), 3).astype(int)
+        sa = ps.metrics.region_areas(ball).surface_area
+        assert np.abs(sa[0] - 4*np.pi*10**2) < 0.01*4*np.pi*10**2
+        # Perimeter of a square in 2D
+        im = np.zeros([20, 20], dtype=int)
+        im[5:15, 5:15] = 1
+        per = ps.metrics.region_areas(im, voxel_size=2).surface_area
+        assert 60 < per[0] < 80
+
+    def test_minkowski_functionals(self):
+        from skimage.measure import euler_number
+        r = 20
+        mf = ps.metrics.minkowski_functionals(ps.tools.ps_ball(r))
+        assert np.isclose(mf.volume, 4/3*np.pi*r**3, rtol=0.01)
+        assert np.isclose(mf.surface_area, 4*np.pi*r**2, rtol=0.01)
+        assert np.isclose(mf.mean_curvature, 4*np.pi*r, rtol=0.01)
+        assert mf.euler == 1
+        mf = ps.metrics.minkowski_functionals(ps.tools.ps_disk(r))
+        assert np.isclose(mf.surface_area, 2*np.pi*r, rtol=0.01)
+        assert mf.mean_curvature is None
+        im = np.random.rand(20, 20, 20) < 0.4
+        for conn, skconn in [(6, 1), (26, 3)]:
+            mf = ps.metrics.minkowski_functionals(im, connectivity=conn)
+            assert mf.euler == euler_number(im, connectivity=skconn)
+        # Histograms of overlapping slabs sum to that of the whole image
+        im = self.blobs
+        hist = ps.metrics.minkowski_histogram(im[:50], boundary=(True, False))
+        hist += ps.metrics.minkowski_histogram(im[49:], boundary=(False, True))
+        assert np.all(hist == ps.metrics.minkowski_histogram(im))
+        labels = spim.label(im)[0]
+        mf = ps.metrics.minkowski_functionals(labels)
+        assert np.all(mf.volume == np.bincount(labels.ravel())[1:])
+        with ps.settings.override(ncores=2):
+            hist = ps.metrics.minkowski_histogram(labels)
+            assert np.all(hist == ps.metrics.minkowski_histogram(
+                labels, nlabels=2**20)[:labels.max()])
+        with pytest.raises(Exception):
+            ps.metrics.minkowski_histogram(labels, nlabels=labels.max() - 1)
+        with pytest.raises(Exception):
+            ps.metrics.minkowski_histogram(-labels)
+
     def test_phase_fraction(self):
         im = np.reshape(np.random.randint(0, 10, 1000), [10, 10, 10])
         labels = np.unique(im, return_counts=True)[1]
@@ -166,6 +337,24 @@ class MetricsTest():
         assert counts[0] == (im == 0).sum() / im.size
         assert counts[1] == (im != 0).sum() / im.size
 
+    def test_phase_statistics(self):
+        im = np.random.randint(0, 4, [30, 40, 50])
+        stats = ps.metrics.phase_statistics(im, slab_thickness=7)
+        assert np.all(stats.counts == np.bincount(im.ravel()))
+        assert np.allclose(stats.fractions.sum(), 1)
+        for ax in range(3):
+            prof = np.moveaxis(im, ax, 0) == 2
+            assert np.allclose(stats.profiles[ax][:, 2],
+                               prof.mean(axis=(1, 2)))
+        counts = ps.metrics.phase_statistics(im.astype(np.uint64),
+                                             slab_thickness=7, profiles=False)
+        assert np.all(counts.counts == stats.counts)
+        assert counts.profiles is None
+        stats2D = ps.metrics.phase_statistics(self.im2D)
+        assert np.isclose(stats2D.fractions[1], ps.metrics.porosity(self.im2D))
+        with pytest.raises(Exception):
+            ps.metrics.phase_statistics(np.random.rand(10, 10))
+
     def test_representative_elementary_volume(self):
         im = ps.generators.lattice_spheres(shape=[999, 999],
                                            radius=15, offset=4)
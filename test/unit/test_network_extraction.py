@@ -25,6 +25,95 @@ class NetExtractTest():
                 found_nans = True
         assert found_nans is False
 
+    def test_regions_to_network_throats(self):
+        im = self.snow3d.regions*self.im3d
+        net = ps.networks.regions_to_network(im)
+        # Compare connections with pairs of touching labels found by shifting
+        pairs = []
+        for ax in range(im.ndim):
+            a = np.moveaxis(im, ax, 0)[:-1].ravel()
+            b = np.moveaxis(im, ax, 0)[1:].ravel()
+            keep = (a > 0) & (b > 0) & (a != b)
+            pairs.append(np.sort(np.vstack((a[keep], b[keep])).T, axis=1))
+        pairs = np.unique(np.vstack(pairs), axis=0) - 1
+        assert np.all(net['throat.conns'] == pairs)
+        # Throat voxels belong to the higher labeled region of each pair
+        i, j = net['throat.conns'][0] + 1
+        nbr = np.zeros_like(im, dtype=bool)
+        for ax in range(im.ndim):
+            for d in [-1, 1]:
+                nbr |= np.roll(np.pad(im == i, 1), d, axis=ax)[1:-1, 1:-1, 1:-1]
+        assert net['throat.area'][0] == np.sum(nbr & (im == j))
+
+    def test_regions_to_network_conduit_lengths(self):
+        import openpnm.models.geometry as op_gm
+        im = self.snow3d.regions*self.im3d
+        net = ps.networks.regions_to_network(im, voxel_size=2)
+        pn = op.network.GenericNetwork()
+        pn.update({k: net[k] for k in net.keys() if 'conduit' not in k
+                   and 'endpoints' not in k and k != 'pore.area'})
+        pn.add_model(propname='throat.endpoints',
+                     model=op_gm.throat_endpoints.spherical_pores,
+                     pore_diameter='pore.inscribed_diameter',
+                     throat_diameter='throat.inscribed_diameter')
+        pn.add_model(propname='throat.conduit_lengths',
+                     model=op_gm.throat_length.conduit_lengths)
+        pn.add_model(propname='pore.area', model=op_gm.pore_area.sphere)
+        for key in ['throat.endpoints.head', 'throat.endpoints.tail',
+                    'throat.conduit_lengths.pore1',
+                    'throat.conduit_lengths.pore2',
+                    'throat.conduit_lengths.throat', 'pore.area']:
+            assert_allclose(net[key], pn[key])
+        prj = pn.project
+        prj.clear()
+        op.Workspace().close_project(prj)
+
+    def test_snow_tiled(self):
+        np.random.seed(0)
+        im = ps.generators.blobs(shape=[300, 300], porosity=0.6, blobiness=1)
+        snow = ps.filters.snow_partitioning(im, return_all=True,
+                                            randomize=False)
+        net1 = ps.networks.regions_to_network(snow.regions*im, dt=snow.dt)
+        net2 = ps.networks.snow_tiled(im, tile_shape=100, halo=80)
+        assert net1.keys() == net2.keys()
+        assert net1['pore.all'].size == net2['pore.all'].size
+        assert net1['throat.all'].size == net2['throat.all'].size
+        assert net1['pore.volume'].sum() == net2['pore.volume'].sum()
+        assert np.all(np.sort(net1['pore.volume'])
+                      == np.sort(net2['pore.volume']))
+        net3 = ps.networks.snow_tiled(im, tile_shape=300)
+        for key in net1.keys():
+            if key != 'pore.label':
+                assert_allclose(net1[key], net3[key])
+
+    def test_pore_properties(self):
+        import scipy.ndimage as spim
+        im = self.snow3d.regions*self.im3d
+        dt = spim.distance_transform_edt(self.im3d)
+        pores = ps.networks.pore_properties(im, dt)
+        labels = np.arange(1, im.max() + 1)
+        assert np.all(pores.label == labels)
+        assert np.all(pores.volume == spim.sum(im > 0, im, labels))
+        assert np.allclose(pores.centroid,
+                           spim.center_of_mass(im > 0, im, labels))
+        assert np.allclose(pores.extended_diameter,
+                           2*spim.maximum(dt, im, labels))
+        pore = np.pad(im == 1, 1)
+        pore_dt = spim.distance_transform_edt(pore)
+        assert np.isclose(pores.inscribed_diameter[0],
+                          2*pore_dt.max() - np.sqrt(3))
+        assert pores.surface_area[0] == np.sum(pore_dt == 1)
+        # The results do not depend on the number of threads
+        with ps.settings.override(ncores=2):
+            pores2 = ps.networks.pore_properties(im, dt)
+        for a, b in zip(pores, pores2):
+            assert np.allclose(a, b)
+        # Fewer threads are used when there are very many pores
+        from porespy.networks.__getnet__ import _moment_chunks
+        with ps.settings.override(ncores=64):
+            assert _moment_chunks(10, 100) == 64
+            assert _moment_chunks(10**6, 100) == 2
+
     def test_snow_2D(self):
         a = np.unique(self.snow.peaks*self.im)
         b = np.unique(self.snow.regions*self.im)
@@ -110,6 +199,55 @@ class NetExtractTest():
         assert bd.shape[1] > regions.shape[1]
         assert bd.shape[2] > regions.shape[2]
 
+    def test_regions_to_network_boundary_faces(self):
+        from porespy.networks.__funcs__ import _boundary_region_areas
+        im, dt = self.im3d, self.snow3d.dt
+        regions = ps.tools.make_contiguous(self.snow3d.regions*im)
+        for f in [['left', 'right', 'front', 'back', 'top', 'bottom'],
+                  ['back', 'left']]:
+            padded = ps.networks.add_boundary_regions(regions, faces=f)
+            padded = ps.tools.make_contiguous(
+                padded*ps.tools.pad_faces(im, faces=f))
+            net1 = ps.networks.regions_to_network(
+                padded, dt=ps.tools.pad_faces(dt, faces=f))
+            net2 = ps.networks.regions_to_network(regions, dt=dt,
+                                                  boundary_faces=f)
+            shift = np.array([3*('left' in f), 3*('front' in f),
+                              3*('bottom' in f)])
+            assert net1.keys() == net2.keys()
+            for key in net1.keys():
+                if key in ['pore.coords', 'pore.centroid', 'throat.centroid',
+                           'throat.endpoints.head', 'throat.endpoints.tail']:
+                    assert_allclose(net1[key], net2[key] + shift, rtol=1e-6)
+                else:
+                    assert_allclose(net1[key], net2[key], rtol=1e-6)
+            areas1 = ps.metrics.region_areas(padded,
+                                             conns=net1['throat.conns'])
+            areas2 = _boundary_region_areas(regions, net2['throat.conns'],
+                                            faces=f)
+            assert_allclose(areas1.surface_area, areas2.surface_area,
+                            rtol=1e-6)
+            assert_allclose(areas1.area, areas2.area, rtol=1e-6)
+
+    def test_snow_update(self):
+        from edt import edt
+        f = ['top', 'bottom', 'left', 'right', 'front', 'back']
+        net = ps.networks.snow(self.im3d)
+        im = np.copy(self.im3d)
+        np.random.seed(0)
+        im[20:30, 15:25, 10:20] = np.random.rand(10, 10, 10) < 0.7
+        net = ps.networks.snow_update(net, im, lower=[20, 15, 10],
+                                      upper=[30, 25, 20])
+        assert np.all(net.dt == edt(im).astype(net.dt.dtype))
+        assert np.all(net.regions[im == 0] == 0)
+        assert np.unique(net.regions).size == net.regions.max() + 1
+        # The patched network matches one extracted from the new regions
+        ref = ps.networks.regions_to_network(net.regions, dt=net.dt,
+                                             boundary_faces=f)
+        assert net['pore.internal'].sum() == net.regions.max()
+        for key in ref.keys():
+            assert_allclose(ref[key], net[key], rtol=1e-6)
+
     def test_map_to_regions(self):
         im = self.im
         regions = ps.filters.snow_partitioning(im)
@@ -174,6 +312,20 @@ class NetExtractTest():
         assert_allclose(actual=porosity_actual, desired=porosity_desired,
                         rtol=0.05)
 
+    def test_generate_voxel_image_chunks(self):
+        net = op.network.Cubic(shape=[4, 4, 4])
+        op.geometry.StickAndBall(network=net, pores=net.Ps, throats=net.Ts)
+        for shape in ["sphere", "cube"]:
+            im1 = ps.networks.generate_voxel_image(network=net,
+                                                   pore_shape=shape,
+                                                   max_dim=50)
+            im2 = ps.networks.generate_voxel_image(network=net,
+                                                   pore_shape=shape,
+                                                   max_dim=50, chunks=16)
+            assert im1.shape == (50, 50, 50)
+            assert np.all(im1 == im2.compute())
+            assert np.all(np.unique(im1) == [0, 1, 2])
+
     def test_verify_no_unlabeled_regions(self):
         np.random.seed(1999)
         alias = {1: "void", 2: "solid"}
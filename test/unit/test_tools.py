@@ -1,5 +1,6 @@
 import porespy as ps
 import numpy as np
+import numba
 import scipy.spatial as sptl
 import scipy.ndimage as spim
 import matplotlib.pyplot as plt
@@ -287,6 +288,159 @@ class ToolsTest():
         c = ps.tools.ps_rect(w=3, ndim=3)
         assert c.sum() == 27
 
+    def test_insert_spheres(self):
+        im = np.zeros([41, 41, 41], dtype=bool)
+        im = ps.tools.insert_spheres(im, centers=[[20, 20, 20]], radii=7)
+        ball = ps.tools.ps_round(7, ndim=3, smooth=True)
+        assert np.all(im[13:28, 13:28, 13:28] == ball)
+        assert im.sum() == ball.sum()
+        # Clipped at the image boundaries, with later spheres taking priority
+        im = np.zeros([30, 30], dtype=int)
+        im = ps.tools.insert_spheres(im, centers=[[0, 0], [2, 2]],
+                                     radii=[5, 3], values=[1, 2],
+                                     smooth=False)
+        x, y = np.indices(im.shape)
+        d1 = np.sqrt(x**2 + y**2)
+        d2 = np.sqrt((x - 2)**2 + (y - 2)**2)
+        assert np.all((im == 1) == ((d1 <= 5) * (d2 > 3)))
+        assert np.all((im == 2) == (d2 <= 3))
+        # Without overwriting the existing values are preserved
+        im = ps.tools.insert_spheres(im, centers=[[2, 2]], radii=5, values=3,
+                                     overwrite=False)
+        assert im[2, 2] == 2
+        assert im[5, 5] == 3
+        assert im[3, 3] == 2
+        # insert_sphere uses the batched version
+        im = ps.tools.insert_sphere(np.zeros([21, 21], dtype=bool),
+                                    c=[10, 10], r=5)
+        assert im.sum() == ps.tools.ps_disk(5).sum()
+
+    def test_insert_cylinders(self):
+        im = np.zeros([40, 40, 40], dtype=bool)
+        xyz0 = np.array([[20, 20, -5], [0, 0, 0]])
+        xyz1 = np.array([[20, 20, 45], [39, 39, 39]])
+        im = ps.tools.insert_cylinders(im, xyz0=xyz0, xyz1=xyz1, r=[4, 2])
+        x, y, z = np.indices(im.shape)
+        d1 = np.sqrt((x - 20)**2 + (y - 20)**2)
+        assert np.all(im[d1 < 4])
+        # Compare with the distance to the diagonal segment
+        p = np.vstack((x.ravel(), y.ravel(), z.ravel())).T
+        t = np.clip(p.sum(axis=1)/(3*39), 0, 1)
+        d2 = np.sqrt(((p - 39*t[:, np.newaxis])**2).sum(axis=1))
+        d2 = d2.reshape(im.shape)
+        assert np.all(im == ((d1 < 4) + (d2 < 2)))
+        # Flat ended cylinder in 2D
+        im = np.zeros([20, 20], dtype=int)
+        im = ps.tools.insert_cylinders(im, xyz0=[5, 10], xyz1=[15, 10], r=3,
+                                       v=2, caps=False, smooth=False)
+        assert im.sum() == 2*11*7
+
+    def test_precision(self):
+        assert ps.tools.get_precision() == np.float64
+        ps.settings.precision = 'float32'
+        try:
+            assert ps.tools.get_precision() == np.float32
+            im = ps.tools.norm_to_uniform(np.random.rand(20, 20))
+            assert im.dtype == np.float32
+            b = ps.generators.blobs(shape=[50, 50], porosity=None)
+            assert b.dtype == np.float32
+            mio = ps.filters.porosimetry(self.im2D)
+            assert mio.dtype == np.float32
+            a = ps.tools.fftmorphology(self.im2D, ps.tools.ps_disk(3),
+                                       mode='erosion')
+            b = spim.binary_erosion(self.im2D, ps.tools.ps_disk(3))
+            assert np.all(a == b)
+            ps.settings.precision = 'int8'
+            with pytest.raises(Exception):
+                ps.tools.get_precision()
+        finally:
+            ps.settings.precision = 'float64'
+
+    def test_ncores(self):
+        n = ps.settings.ncores
+        assert n >= 1
+        with ps.settings.override(ncores=1, precision='float32'):
+            assert ps.settings.ncores == 1
+            assert ps.tools.get_precision() == np.float32
+            im = ps.tools.fftmorphology(self.im2D, ps.tools.ps_disk(2),
+                                        mode='dilation')
+            assert np.all(im == spim.binary_dilation(self.im2D,
+                                                     ps.tools.ps_disk(2)))
+        assert ps.settings.ncores == n
+        assert ps.settings.precision == 'float64'
+        with pytest.raises(Exception):
+            ps.settings.ncores = 0
+        with pytest.raises(Exception):
+            with ps.settings.override(not_a_setting=1):
+                pass
+        ps.settings.ncores = None
+        assert ps.settings.ncores == n
+        assert numba.get_num_threads() == min(n, numba.config.NUMBA_NUM_THREADS)
+
+    def test_ncores_in_chunked_func(self):
+        def func(im):
+            return np.full(im.shape, numba.get_num_threads())
+        with ps.settings.override(ncores=2):
+            im = ps.filters.chunked_func(func=func, im=self.im2D, divs=2,
+                                         overlap=1, cores=2)
+        assert np.all(im == 1)
+
+    def test_map_labels(self):
+        labels = np.random.randint(0, 10, [20, 30, 40])
+        values = np.random.rand(10)
+        im = ps.tools.map_labels(labels, values)
+        assert np.all(im == values[labels])
+        out = np.zeros(labels.shape, dtype=np.float32)
+        im = ps.tools.map_labels(labels, values, out=out)
+        assert im is out
+        assert np.allclose(out, values[labels])
+        im = ps.tools.map_labels(labels, values, dtype=int)
+        assert im.dtype == int
+        with pytest.raises(Exception):
+            ps.tools.map_labels(labels, values[:-1])
+
+    def test_integral_image_and_box_sums(self):
+        im = np.random.rand(20, 30, 40) < 0.5
+        ii = ps.tools.integral_image(im)
+        assert ii.shape == (21, 31, 41)
+        assert ii[-1, -1, -1] == im.sum()
+        lower = np.random.randint(0, 20, [50, 3])
+        upper = lower + np.random.randint(0, 20, [50, 3])
+        sums = ps.tools.box_sums(ii, lower, upper)
+        upper = np.minimum(upper, im.shape)
+        for n in range(50):
+            s = tuple(slice(a, b) for a, b in zip(lower[n], upper[n]))
+            assert sums[n] == im[s].sum()
+        im = np.random.rand(20, 30)
+        ii = ps.tools.integral_image(im)
+        assert np.allclose(ps.tools.box_sums(ii, [2, 3], [10, 20]),
+                           im[2:10, 3:20].sum())
+
+    def test_region_adjacency_graph(self):
+        np.random.seed(0)
+        im = np.random.randint(0, 6, [20, 25, 30])
+        rag = ps.tools.RegionAdjacencyGraph(im, voxels=True)
+        pairs = []
+        for ax in range(im.ndim):
+            a = np.moveaxis(im, ax, 0)
+            pairs.append(np.stack((a[1:].ravel(), a[:-1].ravel())))
+        pairs = np.hstack(pairs)
+        pairs = pairs[:, np.all(pairs > 0, axis=0) & (pairs[0] != pairs[1])]
+        pairs = np.unique(np.sort(pairs, axis=0).T - 1, axis=0)
+        assert np.all(rag.conns == pairs)
+        assert np.all(rag.counts == np.diff(rag.voxel_ptr))
+        for e, (i, j) in enumerate(rag.conns):
+            vox = rag.edge_voxels(e)
+            assert np.all(im.flat[vox] == j + 1)
+            assert j in rag.neighbors(i) and i in rag.neighbors(j)
+        A = rag.to_sparse()
+        assert (A - A.T).nnz == 0
+        assert A.sum() == 2*rag.counts.sum()
+        rag = ps.tools.RegionAdjacencyGraph(im)
+        assert rag.voxels is None
+        with pytest.raises(Exception):
+            rag.edge_voxels(0)
+
 
 if __name__ == '__main__':
     t = ToolsTest()